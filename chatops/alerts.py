@@ -0,0 +1,216 @@
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import httpx
+
+# Discord accepts at most 10 embeds per webhook message
+MAX_EMBEDS = 10
+
+# Queue items: (webhook url, embed), a flush marker, or None to stop the worker
+_Item = Union[Tuple[str, dict], threading.Event, None]
+
+
+def _retry_after(resp: httpx.Response) -> float:
+    """Seconds to wait after a 429, from the JSON body or the Retry-After header."""
+    try:
+        return max(float(resp.json().get("retry_after", 0)), 0.0)
+    except Exception:
+        pass
+    try:
+        return max(float(resp.headers.get("retry-after", "1")), 0.0)
+    except ValueError:
+        return 1.0
+
+
+class AlertDispatcher:
+    """Posts webhook alerts from a background thread over a pooled HTTP client.
+
+    ``send()`` only enqueues, so request handlers never wait on the webhook.
+    The worker groups queued alerts for the same URL into one message of up to
+    ``MAX_EMBEDS`` embeds, honours 429 ``retry_after`` and Discord's bucket
+    headers, and retries server errors with exponential backoff. Identical
+    alerts within ``dedupe_seconds`` are suppressed (counted in ``suppressed``).
+    The worker starts on first use and again after ``stop()``.
+    """
+
+    def __init__(
+        self,
+        max_queue: int = 1000,
+        dedupe_seconds: float = 60.0,
+        batch_wait: float = 0.5,
+        max_retries: int = 5,
+        timeout: float = 5.0,
+        client_factory: Optional[Callable[[], httpx.Client]] = None,
+    ) -> None:
+        self.dedupe_seconds = dedupe_seconds
+        self.batch_wait = batch_wait
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.dropped = 0
+        self.suppressed = 0
+        self.sent = 0
+        self._client_factory = client_factory or self._default_client
+        self._queue: "queue.Queue[_Item]" = queue.Queue(maxsize=max_queue)
+        self._recent: "OrderedDict[Tuple[str, str, str, int], float]" = OrderedDict()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._not_before = 0.0  # monotonic time the rate-limit bucket reopens
+
+    def _default_client(self) -> httpx.Client:
+        return httpx.Client(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=4, max_keepalive_connections=2),
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        with self._lock:
+            if self.running:
+                return
+            self._thread = threading.Thread(
+                target=self._loop, name="chatops-alerts", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Deliver what is queued (within ``timeout``) and stop the worker.
+
+        A worker still delivering after ``timeout`` stays registered, so
+        ``send()`` does not start a second one beside it.
+        """
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._queue.put(None)
+            thread.join(timeout)
+            if thread.is_alive():
+                logging.warning("alerts_stop_timeout: worker still delivering after %.1fs", timeout)
+            else:
+                self._thread = None
+
+    def send(
+        self, url: str, message: str, color: int = 0x00FF00, title: str = "ChatOps Audit"
+    ) -> bool:
+        """Queue an alert; False when it was deduplicated or the queue is full."""
+        if not url:
+            return False
+        key = (url, title, message, color)
+        now = time.monotonic()
+        with self._lock:
+            cutoff = now - self.dedupe_seconds
+            while self._recent and next(iter(self._recent.values())) <= cutoff:
+                self._recent.popitem(last=False)
+            if key in self._recent:
+                self.suppressed += 1
+                return False
+            self._recent[key] = now
+        self.start()
+        embed = {
+            "title": title,
+            "description": message,
+            "color": color,
+            # Delivery may be delayed by batching/backoff; keep the event time
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        }
+        try:
+            self._queue.put_nowait((url, embed))
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 100 == 0:
+                logging.warning("alert_queue_full: dropped %d alerts", self.dropped)
+            return False
+        return True
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until every queued alert has been attempted; False on timeout."""
+        if not self.running:
+            return True
+        marker = threading.Event()
+        self._queue.put(marker)
+        return marker.wait(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize(),
+            "sent": self.sent,
+            "suppressed": self.suppressed,
+            "dropped": self.dropped,
+        }
+
+    def _loop(self) -> None:
+        client = self._client_factory()
+        try:
+            stop = False
+            while not stop:
+                batch = [self._queue.get()]
+                # Give a burst (e.g. a brute-force attempt) a moment to coalesce
+                deadline = time.monotonic() + self.batch_wait
+                while len(batch) < MAX_EMBEDS * 4:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not isinstance(batch[-1], tuple):
+                        break  # deadline passed, or a flush/stop marker arrived
+                    try:
+                        batch.append(self._queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+                stop = None in batch
+                self._deliver(client, batch)
+        finally:
+            client.close()
+
+    def _deliver(self, client: httpx.Client, batch: List[_Item]) -> None:
+        by_url: Dict[str, List[dict]] = {}
+        markers: List[threading.Event] = []
+        for item in batch:
+            if isinstance(item, threading.Event):
+                markers.append(item)
+            elif item is not None:
+                by_url.setdefault(item[0], []).append(item[1])
+        for url, embeds in by_url.items():
+            for i in range(0, len(embeds), MAX_EMBEDS):
+                self._post(client, url, embeds[i:i + MAX_EMBEDS])
+        for marker in markers:
+            marker.set()
+
+    def _post(self, client: httpx.Client, url: str, embeds: List[dict]) -> None:
+        delay = 1.0
+        failures = 0
+        while True:
+            wait = self._not_before - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                resp = client.post(url, json={"embeds": embeds})
+            except httpx.HTTPError as e:
+                logging.warning("Failed to send Discord alert: %s", e)
+                resp = None
+            if resp is not None:
+                if resp.headers.get("x-ratelimit-remaining") == "0":
+                    reset = float(resp.headers.get("x-ratelimit-reset-after", "0") or 0)
+                    self._not_before = time.monotonic() + reset
+                if resp.status_code == 429:
+                    self._not_before = time.monotonic() + _retry_after(resp)
+                    continue  # rate limited: not a failure, max_retries is untouched
+                if resp.status_code < 500:
+                    if resp.status_code >= 400:
+                        logging.warning(
+                            "Discord alert rejected: %s %s", resp.status_code, resp.text[:200]
+                        )
+                    else:
+                        self.sent += len(embeds)
+                    return
+            if failures >= self.max_retries:
+                break
+            failures += 1
+            time.sleep(delay)
+            delay = min(delay * 2, 30.0)
+        logging.warning("Giving up on %d Discord alert(s) after retries", len(embeds))
@@ -0,0 +1,153 @@
+import ipaddress
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_right
+from typing import Any, FrozenSet, Iterable, List, Optional, Tuple
+
+
+def _merge(ranges: List[Tuple[int, int]]) -> Tuple[List[int], List[int]]:
+    """Sort and merge overlapping/adjacent ``[start, end]`` ranges."""
+    starts: List[int] = []
+    ends: List[int] = []
+    for start, end in sorted(ranges):
+        if ends and start <= ends[-1] + 1:
+            ends[-1] = max(ends[-1], end)
+        else:
+            starts.append(start)
+            ends.append(end)
+    return starts, ends
+
+
+class AllowList:
+    """Compiled client allowlist: sorted disjoint intervals per IP family.
+
+    Membership is a binary search (O(log n)) regardless of how many ranges
+    were loaded. Tokens that are not IPs or networks match the client string
+    exactly (e.g. ``testclient``); ``*`` allows everyone.
+    """
+
+    def __init__(self, tokens: Iterable[str]) -> None:
+        v4: List[Tuple[int, int]] = []
+        v6: List[Tuple[int, int]] = []
+        hosts = set()
+        self.allow_all = False
+        for token in tokens:
+            token = token.strip()
+            if not token:
+                continue
+            if token == "*":
+                self.allow_all = True
+                continue
+            try:
+                net = ipaddress.ip_network(token, strict=False)
+            except ValueError:
+                hosts.add(token)
+                continue
+            span = (int(net.network_address), int(net.broadcast_address))
+            (v4 if net.version == 4 else v6).append(span)
+        self._v4 = _merge(v4)
+        self._v6 = _merge(v6)
+        self.hosts: FrozenSet[str] = frozenset(hosts)
+        self.size = len(self._v4[0]) + len(self._v6[0]) + len(self.hosts)
+
+    def __bool__(self) -> bool:
+        return self.allow_all or self.size > 0
+
+    def __contains__(self, client: str) -> bool:
+        if self.allow_all or client in self.hosts:
+            return True
+        try:
+            ip = ipaddress.ip_address(client)
+        except ValueError:
+            return False
+        if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+            ip = ip.ipv4_mapped
+        starts, ends = self._v4 if ip.version == 4 else self._v6
+        n = int(ip)
+        i = bisect_right(starts, n) - 1
+        return i >= 0 and n <= ends[i]
+
+
+def _collect_networks(data: Any, out: List[str]) -> None:
+    if isinstance(data, str):
+        try:
+            ipaddress.ip_network(data, strict=False)
+        except ValueError:
+            return
+        out.append(data)
+    elif isinstance(data, list):
+        for item in data:
+            _collect_networks(item, out)
+    elif isinstance(data, dict):
+        for item in data.values():
+            _collect_networks(item, out)
+
+
+def load_allowlist_file(path: str) -> List[str]:
+    """Read allowlist entries from a file.
+
+    JSON files contribute every IP/CIDR string found anywhere in the document,
+    so GitHub ``/meta`` payloads and the policies written by
+    ``scripts/github_tailscale_acl.py`` load directly. Other files hold one
+    entry per line (commas also separate; ``#`` starts a comment).
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if text.lstrip().startswith(("{", "[")):
+        networks: List[str] = []
+        _collect_networks(json.loads(text), networks)
+        return networks
+    tokens: List[str] = []
+    for line in text.splitlines():
+        line = line.split("#", 1)[0]
+        tokens.extend(t.strip() for t in line.split(",") if t.strip())
+    return tokens
+
+
+class AllowListSource:
+    """Caches the compiled allowlist for an env value plus an optional file.
+
+    The env string is compared on every call (cheap); the file is stat'ed at
+    most once per ``recheck_seconds`` and recompiled only when it changed.
+    """
+
+    def __init__(self, recheck_seconds: float = 2.0) -> None:
+        self.recheck_seconds = recheck_seconds
+        self._lock = threading.Lock()
+        self._key: Optional[Tuple[str, str, Tuple[int, int]]] = None
+        self._checked_at = 0.0
+        self._compiled = AllowList([])
+
+    def get(self, env_value: str, file_path: str = "") -> AllowList:
+        now = time.monotonic()
+        key = self._key
+        if (
+            key is not None
+            and key[0] == env_value
+            and key[1] == file_path
+            and (not file_path or now - self._checked_at < self.recheck_seconds)
+        ):
+            return self._compiled
+        with self._lock:
+            signature = (0, 0)
+            if file_path:
+                try:
+                    st = os.stat(file_path)
+                    signature = (st.st_mtime_ns, st.st_size)
+                except OSError:
+                    signature = (-1, -1)
+            self._checked_at = now
+            new_key = (env_value, file_path, signature)
+            if new_key != self._key:
+                tokens = env_value.split(",")
+                if file_path and signature != (-1, -1):
+                    try:
+                        tokens.extend(load_allowlist_file(file_path))
+                    except (OSError, ValueError) as e:
+                        logging.warning("Failed to load allowlist file %s: %s", file_path, e)
+                self._compiled = AllowList(tokens)
+                self._key = new_key
+            return self._compiled
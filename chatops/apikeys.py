@@ -0,0 +1,150 @@
+import base64
+import hashlib
+import hmac
+import importlib
+import secrets
+import sys
+import threading
+import time
+from collections import OrderedDict
+from importlib import util as _importlib_util
+from typing import Optional
+
+HAVE_ARGON2 = _importlib_util.find_spec("argon2") is not None
+
+PBKDF2_ITERATIONS = 600_000
+SCRYPT_N, SCRYPT_R, SCRYPT_P = 2**14, 8, 1
+
+
+def _b64(raw: bytes) -> str:
+    return base64.b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def hash_key(key: str, scheme: str = "scrypt", iterations: int = PBKDF2_ITERATIONS) -> str:
+    """Encode a salted hash of ``key`` for the RBAC file or ``CHATOPS_API_KEY_HASH``.
+
+    Formats: ``scrypt$n$r$p$salt$hash``, ``pbkdf2_sha256$iterations$salt$hash``
+    or an argon2 PHC string (``$argon2id$...``, needs ``argon2-cffi``).
+    """
+    salt = secrets.token_bytes(16)
+    if scheme == "scrypt":
+        dk = hashlib.scrypt(
+            key.encode("utf-8"), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, dklen=32
+        )
+        return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(dk)}"
+    if scheme == "pbkdf2_sha256":
+        dk = hashlib.pbkdf2_hmac("sha256", key.encode("utf-8"), salt, iterations)
+        return f"pbkdf2_sha256${iterations}${_b64(salt)}${_b64(dk)}"
+    if scheme == "argon2":
+        if not HAVE_ARGON2:
+            raise RuntimeError("argon2-cffi not installed")
+        return importlib.import_module("argon2").PasswordHasher().hash(key)
+    raise ValueError(f"Unknown key hash scheme: {scheme}")
+
+
+def verify_key_hash(encoded: str, key: str) -> bool:
+    """Check ``key`` against an encoded hash (slow by design); ValueError if malformed."""
+    if encoded.startswith("$argon2"):
+        if not HAVE_ARGON2:
+            raise ValueError("argon2 hash configured but argon2-cffi not installed")
+        argon2 = importlib.import_module("argon2")
+        try:
+            return bool(argon2.PasswordHasher().verify(encoded, key))
+        except argon2.exceptions.VerificationError:
+            return False
+    parts = encoded.split("$")
+    try:
+        if parts[0] == "scrypt" and len(parts) == 6:
+            n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+            expected = _unb64(parts[5])
+            dk = hashlib.scrypt(
+                key.encode("utf-8"), salt=_unb64(parts[4]), n=n, r=r, p=p,
+                maxmem=256 * n * r + 1024 * 1024, dklen=len(expected),
+            )
+        elif parts[0] == "pbkdf2_sha256" and len(parts) == 4:
+            expected = _unb64(parts[3])
+            dk = hashlib.pbkdf2_hmac(
+                "sha256", key.encode("utf-8"), _unb64(parts[2]), int(parts[1]), len(expected)
+            )
+        else:
+            raise ValueError(f"Unsupported key hash format: {parts[0]}")
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Malformed key hash: {e}") from e
+    return hmac.compare_digest(dk, expected)
+
+
+class VerificationCache:
+    """Bounded LRU of KDF verification outcomes.
+
+    Entries are keyed by an HMAC (per-process random secret) of the stored
+    hash and the presented key, so the plaintext key is never retained and the
+    expensive KDF runs at most once per key per ``ttl`` seconds. Failed
+    verifications are cached too, in a separate LRU of ``max_failures``
+    entries, so repeating a wrong key stays cheap and a stream of wrong keys
+    never evicts a valid one.
+    """
+
+    def __init__(
+        self, max_entries: int = 1024, ttl: float = 300.0, max_failures: int = 256
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_failures = max_failures
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._secret = secrets.token_bytes(32)
+        self._entries: "OrderedDict[bytes, float]" = OrderedDict()
+        self._failures: "OrderedDict[bytes, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _tag(self, encoded: str, key: str) -> bytes:
+        return hmac.new(
+            self._secret, encoded.encode("utf-8") + b"\0" + key.encode("utf-8"), hashlib.sha256
+        ).digest()
+
+    def _lookup(self, tag: bytes, now: float) -> Optional[bool]:
+        for ok, entries in ((True, self._entries), (False, self._failures)):
+            expires = entries.get(tag)
+            if expires is not None and expires > now:
+                entries.move_to_end(tag)
+                return ok
+        return None
+
+    def cached(self, encoded: str, key: str) -> Optional[bool]:
+        """The cached outcome for ``key``, or None; never runs the KDF."""
+        if not key:
+            return False
+        with self._lock:
+            return self._lookup(self._tag(encoded, key), time.monotonic())
+
+    def verify(self, encoded: str, key: str) -> bool:
+        if not key:
+            return False
+        tag = self._tag(encoded, key)
+        now = time.monotonic()
+        with self._lock:
+            hit = self._lookup(tag, now)
+            if hit is not None:
+                self.hits += 1
+                return hit
+            self.misses += 1
+        ok = verify_key_hash(encoded, key)
+        entries, limit = (self._entries, self.max_entries) if ok else (
+            self._failures, self.max_failures
+        )
+        with self._lock:
+            entries[tag] = now + self.ttl
+            entries.move_to_end(tag)
+            while len(entries) > limit:
+                entries.popitem(last=False)
+        return ok
+
+
+if __name__ == "__main__":
+    # python -m chatops.apikeys [scrypt|pbkdf2_sha256|argon2]  (reads the key from stdin)
+    scheme = sys.argv[1] if len(sys.argv) > 1 else "scrypt"
+    print(hash_key(sys.stdin.readline().rstrip("\n"), scheme))
@@ -0,0 +1,423 @@
+import glob
+import gzip
+import importlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from importlib import util as _importlib_util
+from typing import IO, Any, Dict, Iterator, List, Literal, Optional, Tuple, Union
+
+HAVE_ZSTD = _importlib_util.find_spec("zstandard") is not None
+
+OverflowPolicy = Literal["block", "drop"]
+Compression = Literal["gzip", "zstd", "none"]
+
+_INDEX_SUFFIX = ".idx.json"
+_COMPRESSED_SUFFIXES = (".gz", ".zst")
+
+# Upper bound on simultaneously open audit files (the path may change at runtime)
+_MAX_HANDLES = 4
+
+# Queue items: an event line, a flush marker, or None to stop the worker
+_Item = Union[Tuple[str, str], threading.Event, None]
+
+
+def write_lines(path: str, lines: List[str], fsync: bool = False) -> None:
+    """Append lines to ``path`` with a single open/write (synchronous fallback)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("".join(line + "\n" for line in lines))
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _open_text(path: str) -> IO[str]:
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    if path.endswith(".zst"):
+        zstd = importlib.import_module("zstandard")
+        return zstd.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def _first_ts(path: str) -> Optional[float]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return float(json.loads(f.readline())["ts"])
+    except Exception:
+        return None
+
+
+class SegmentIndex:
+    """Summary of one closed segment, stored next to it as ``<segment>.idx.json``."""
+
+    def __init__(self) -> None:
+        self.start_ts: Optional[float] = None
+        self.end_ts: Optional[float] = None
+        self.count = 0
+        self.intents: set = set()
+        self.stacks: set = set()
+        self.events: set = set()
+
+    def add(self, event: dict) -> None:
+        ts = event.get("ts")
+        if isinstance(ts, (int, float)):
+            self.start_ts = ts if self.start_ts is None else min(self.start_ts, ts)
+            self.end_ts = ts if self.end_ts is None else max(self.end_ts, ts)
+        self.count += 1
+        for attr, key in (("intents", "intent"), ("stacks", "stack"), ("events", "event")):
+            value = event.get(key)
+            if value is not None:
+                getattr(self, attr).add(str(value))
+
+    def may_match(
+        self,
+        stack: Optional[str] = None,
+        intent: Optional[str] = None,
+        event: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+    ) -> bool:
+        if since is not None and self.end_ts is not None and self.end_ts < since:
+            return False
+        if until is not None and self.start_ts is not None and self.start_ts > until:
+            return False
+        return (
+            (stack is None or stack in self.stacks)
+            and (intent is None or intent in self.intents)
+            and (event is None or event in self.events)
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "start_ts": self.start_ts,
+            "end_ts": self.end_ts,
+            "count": self.count,
+            "intents": sorted(self.intents),
+            "stacks": sorted(self.stacks),
+            "events": sorted(self.events),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SegmentIndex":
+        idx = cls()
+        idx.start_ts = data.get("start_ts")
+        idx.end_ts = data.get("end_ts")
+        idx.count = int(data.get("count", 0))
+        idx.intents = set(data.get("intents", []))
+        idx.stacks = set(data.get("stacks", []))
+        idx.events = set(data.get("events", []))
+        return idx
+
+
+def rotate_file(path: str) -> Optional[str]:
+    """Rename the active log to a timestamped segment; returns the segment path."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    stamp = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+    base = f"{path}.{stamp}"
+    segment, n = base, 0
+    while glob.glob(glob.escape(segment) + "*"):
+        n += 1
+        segment = f"{base}-{n:04d}"
+    os.replace(path, segment)
+    return segment
+
+
+def seal_segment(segment: str, compression: Compression = "gzip") -> str:
+    """Index and compress a rotated segment in one pass; returns the final path.
+
+    The index is written before the compressed file appears, and the raw
+    segment is removed last, so a reader never sees a segment without data.
+    """
+    if compression == "zstd" and not HAVE_ZSTD:
+        logging.warning("audit_zstd_unavailable: falling back to gzip")
+        compression = "gzip"
+    index = SegmentIndex()
+    target = segment + {"gzip": ".gz", "zstd": ".zst"}.get(compression, "")
+    tmp = target + ".tmp"
+    with open(segment, "rb") as src:
+        out: Any = None  # GzipFile or a zstandard stream writer
+        if compression == "gzip":
+            out = gzip.open(tmp, "wb", compresslevel=6)
+        elif compression == "zstd":
+            zstd = importlib.import_module("zstandard")
+            out = zstd.open(tmp, "wb")
+        try:
+            for raw in src:
+                if out is not None:
+                    out.write(raw)
+                try:
+                    index.add(json.loads(raw))
+                except ValueError:
+                    continue
+        finally:
+            if out is not None:
+                out.close()
+    idx_tmp = segment + _INDEX_SUFFIX + ".tmp"
+    with open(idx_tmp, "w", encoding="utf-8") as f:
+        json.dump(index.to_dict(), f, separators=(",", ":"))
+    os.replace(idx_tmp, segment + _INDEX_SUFFIX)
+    if out is not None:
+        os.replace(tmp, target)
+        os.remove(segment)
+    return target
+
+
+def list_segments(path: str) -> List[Tuple[str, Optional[SegmentIndex]]]:
+    """Closed segments of ``path`` oldest first, with their index when sealed."""
+    files: Dict[str, str] = {}
+    for name in glob.glob(glob.escape(path) + ".*"):
+        if name.endswith(".tmp") or name.endswith(_INDEX_SUFFIX):
+            continue
+        base = name
+        for suffix in _COMPRESSED_SUFFIXES:
+            if name.endswith(suffix):
+                base = name[: -len(suffix)]
+        # A raw segment still being compressed wins until it is removed
+        if base not in files or base == name:
+            files[base] = name
+    segments: List[Tuple[str, Optional[SegmentIndex]]] = []
+    for base in sorted(files):
+        index: Optional[SegmentIndex] = None
+        try:
+            with open(base + _INDEX_SUFFIX, "r", encoding="utf-8") as f:
+                index = SegmentIndex.from_dict(json.load(f))
+        except (OSError, ValueError):
+            pass
+        segments.append((files[base], index))
+    return segments
+
+
+def query(
+    path: str,
+    stack: Optional[str] = None,
+    intent: Optional[str] = None,
+    event: Optional[str] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    limit: Optional[int] = None,
+) -> Iterator[dict]:
+    """Yield matching events oldest first across closed segments and the active file.
+
+    Segments whose index rules out a match are never opened.
+    """
+    want = {"stack": stack, "intent": intent, "event": event}
+    files = [
+        seg for seg, index in list_segments(path)
+        if index is None or index.may_match(stack, intent, event, since, until)
+    ]
+    files.append(path)
+    found = 0
+    for name in files:
+        try:
+            f = _open_text(name)
+        except OSError:
+            continue  # rotated or sealed since listing
+        with f:
+            for line in f:
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    continue
+                if any(v is not None and str(item.get(k)) != v for k, v in want.items()):
+                    continue
+                ts = item.get("ts")
+                if since is not None and (not isinstance(ts, (int, float)) or ts < since):
+                    continue
+                if until is not None and (not isinstance(ts, (int, float)) or ts > until):
+                    continue
+                yield item
+                found += 1
+                if limit is not None and found >= limit:
+                    return
+
+
+class AuditWriter:
+    """Background JSONL writer with batched group commit.
+
+    Events are queued by the request path and drained by one thread that keeps
+    the file open, writes up to ``batch_size`` lines at once and fsyncs once per
+    batch. When the queue is full, ``overflow="block"`` makes callers wait and
+    ``"drop"`` discards the event (counted in ``dropped``). Before ``start()``
+    (and after ``stop()``) writes go straight to disk.
+
+    The active file is rotated once it reaches ``max_bytes`` or its first event
+    is ``rotate_seconds`` old (0 disables either); closed segments are indexed
+    and compressed off the writer thread.
+    """
+
+    def __init__(
+        self,
+        max_queue: int = 10000,
+        batch_size: int = 256,
+        overflow: OverflowPolicy = "block",
+        fsync: bool = True,
+        max_bytes: int = 0,
+        rotate_seconds: float = 0,
+        compression: Compression = "gzip",
+    ) -> None:
+        self.batch_size = batch_size
+        self.overflow = overflow
+        self.fsync = fsync
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.compression = compression
+        self.dropped = 0
+        self._queue: "queue.Queue[_Item]" = queue.Queue(maxsize=max_queue)
+        self._handles: Dict[str, IO[str]] = {}
+        self._opened_at: Dict[str, float] = {}
+        self._sealers: List[threading.Thread] = []
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        with self._lock:
+            if self.running:
+                return
+            self._thread = threading.Thread(
+                target=self._loop, name="chatops-audit", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Flush everything queued, close files and stop the worker.
+
+        A worker still flushing after ``timeout`` keeps receiving writes.
+        """
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._queue.put(None)
+            thread.join(timeout)
+            if thread.is_alive():
+                # Still flushing: keep routing writes through the queue it drains
+                logging.warning("audit_stop_timeout: writer still flushing after %.1fs", timeout)
+            else:
+                self._thread = None
+            for sealer in self._sealers:
+                sealer.join(timeout)
+            self._sealers = []
+
+    def write(self, path: str, line: str) -> None:
+        if not self.running:
+            write_lines(path, [line])
+            return
+        if self.overflow == "drop":
+            try:
+                self._queue.put_nowait((path, line))
+            except queue.Full:
+                self.dropped += 1
+                if self.dropped == 1 or self.dropped % 1000 == 0:
+                    logging.warning("audit_queue_full: dropped %d events", self.dropped)
+        else:
+            self._queue.put((path, line))
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until every queued event is on disk; False on timeout."""
+        if not self.running:
+            return True
+        marker = threading.Event()
+        self._queue.put(marker)
+        return marker.wait(timeout)
+
+    def _loop(self) -> None:
+        stop = False
+        while not stop:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            self._write_batch(batch)
+        # Late writers that raced with stop(): drain them before closing
+        leftover: List[_Item] = []
+        while True:
+            try:
+                leftover.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        self._write_batch(leftover)
+        self._close_handles()
+
+    def _write_batch(self, batch: List[_Item]) -> None:
+        by_path: Dict[str, List[str]] = {}
+        markers: List[threading.Event] = []
+        for item in batch:
+            if isinstance(item, threading.Event):
+                markers.append(item)
+            elif item is not None:
+                by_path.setdefault(item[0], []).append(item[1])
+        for path, lines in by_path.items():
+            try:
+                f = self._handle(path)
+                f.write("".join(line + "\n" for line in lines))
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+                self._maybe_rotate(path, f)
+            except Exception as e:
+                logging.debug("audit_write_failed: %s", e)
+                self._close_handle(path)
+        for marker in markers:
+            marker.set()
+
+    def _handle(self, path: str) -> IO[str]:
+        f = self._handles.get(path)
+        if f is None:
+            if len(self._handles) >= _MAX_HANDLES:
+                self._close_handles()
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            f = self._handles[path] = open(path, "a", encoding="utf-8")
+            if path not in self._opened_at:
+                self._opened_at[path] = _first_ts(path) or time.time()
+        return f
+
+    def _maybe_rotate(self, path: str, f: IO[str]) -> None:
+        size = os.fstat(f.fileno()).st_size
+        too_big = self.max_bytes > 0 and size >= self.max_bytes
+        too_old = (
+            self.rotate_seconds > 0
+            and time.time() - self._opened_at.get(path, time.time()) >= self.rotate_seconds
+        )
+        if not (too_big or too_old):
+            return
+        self._close_handle(path)
+        self._opened_at.pop(path, None)
+        segment = rotate_file(path)
+        if segment is None:
+            return
+        sealer = threading.Thread(
+            target=self._seal, args=(segment,), name="chatops-audit-seal", daemon=True
+        )
+        self._sealers = [t for t in self._sealers if t.is_alive()] + [sealer]
+        sealer.start()
+
+    def _seal(self, segment: str) -> None:
+        try:
+            seal_segment(segment, self.compression)
+        except Exception as e:
+            logging.warning("audit_seal_failed: %s: %s", segment, e)
+
+    def _close_handle(self, path: str) -> None:
+        f = self._handles.pop(path, None)
+        if f is not None:
+            try:
+                f.close()
+            except Exception:
+                pass
+
+    def _close_handles(self) -> None:
+        for path in list(self._handles):
+            self._close_handle(path)
@@ -0,0 +1,297 @@
+import json
+import logging
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .state_store import StateStore
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS backups (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    intent TEXT NOT NULL,
+    backup_type TEXT NOT NULL,
+    stack TEXT,
+    path TEXT NOT NULL,
+    size INTEGER,
+    sha256 TEXT,
+    created_at REAL NOT NULL,
+    deleted_at REAL,
+    meta TEXT
+);
+CREATE INDEX IF NOT EXISTS backups_live
+    ON backups (intent, created_at) WHERE deleted_at IS NULL;
+CREATE TABLE IF NOT EXISTS backup_manifests (
+    backup_id INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER,
+    sha256 TEXT NOT NULL,
+    PRIMARY KEY (backup_id, path)
+) WITHOUT ROWID;
+"""
+
+_COLUMNS = "id, intent, backup_type, stack, path, size, sha256, created_at, deleted_at, meta"
+
+
+class RetentionPolicy:
+    """GFS retention: an artifact survives if any rule keeps it.
+
+    ``keep_last`` newest artifacts, everything younger than ``keep_within_days``,
+    and the newest artifact of each of the last ``keep_daily`` days,
+    ``keep_weekly`` ISO weeks and ``keep_monthly`` months (UTC). The newest
+    artifact is always kept, so a time-only rule never removes every restore point.
+    """
+
+    __slots__ = ("keep_last", "keep_within_days", "keep_daily", "keep_weekly", "keep_monthly")
+
+    def __init__(
+        self,
+        keep_last: Optional[int] = None,
+        keep_within_days: Optional[float] = None,
+        keep_daily: Optional[int] = None,
+        keep_weekly: Optional[int] = None,
+        keep_monthly: Optional[int] = None,
+    ) -> None:
+        self.keep_last = keep_last
+        self.keep_within_days = keep_within_days
+        self.keep_daily = keep_daily
+        self.keep_weekly = keep_weekly
+        self.keep_monthly = keep_monthly
+
+    def __bool__(self) -> bool:
+        return any(getattr(self, k) is not None for k in self.__slots__)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {k: getattr(self, k) for k in self.__slots__ if getattr(self, k) is not None}
+
+    def select_expired(self, entries: List[dict], now: Optional[float] = None) -> List[dict]:
+        """Entries no rule keeps; an empty policy keeps everything."""
+        if not self:
+            return []
+        now = time.time() if now is None else now
+        ordered = sorted(entries, key=lambda e: e["created_at"], reverse=True)
+        keep: Set[int] = {ordered[0]["id"]} if ordered else set()
+        if self.keep_last:
+            keep.update(e["id"] for e in ordered[: self.keep_last])
+        if self.keep_within_days is not None:
+            cutoff = now - self.keep_within_days * 86400
+            keep.update(e["id"] for e in ordered if e["created_at"] >= cutoff)
+        for count, fmt in (
+            (self.keep_daily, "%Y-%m-%d"),
+            (self.keep_weekly, "%G-W%V"),
+            (self.keep_monthly, "%Y-%m"),
+        ):
+            if not count:
+                continue
+            seen: List[str] = []
+            for e in ordered:
+                bucket = datetime.fromtimestamp(e["created_at"], timezone.utc).strftime(fmt)
+                if bucket in seen:
+                    continue
+                if len(seen) == count:
+                    break
+                seen.append(bucket)
+                keep.add(e["id"])
+        return [e for e in ordered if e["id"] not in keep]
+
+
+def remove_local(entry: dict) -> bool:
+    """Delete an artifact and its ``.sha256`` file; False if it is not on this host."""
+    path = entry["path"]
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    elif os.path.lexists(path):
+        os.remove(path)
+    else:
+        return False
+    if os.path.lexists(path + ".sha256"):
+        os.remove(path + ".sha256")
+    return True
+
+
+class BackupCatalog:
+    """Every backup artifact (any type) recorded in the state database.
+
+    Pruning reads only the live rows of one intent through a partial index, so
+    its cost follows the number of retained plus expired artifacts, never the
+    size of the destination directories.
+    """
+
+    def __init__(self, store: StateStore) -> None:
+        self.store = store
+        self.store.connection().executescript(_SCHEMA)
+
+    def record(
+        self,
+        intent: str,
+        backup_type: str,
+        path: str,
+        stack: Optional[str] = None,
+        size: Optional[int] = None,
+        sha256: Optional[str] = None,
+        created_at: Optional[float] = None,
+        meta: Optional[dict] = None,
+    ) -> int:
+        with self.store.transaction() as conn:
+            cur = conn.execute(
+                "INSERT INTO backups "
+                "(intent, backup_type, stack, path, size, sha256, created_at, meta) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    intent, backup_type, stack, path, size, sha256,
+                    time.time() if created_at is None else created_at,
+                    json.dumps(meta) if meta else None,
+                ),
+            )
+            return int(cur.lastrowid or 0)
+
+    def update_meta(self, backup_id: int, **fields: Any) -> None:
+        """Merge ``fields`` into an artifact's JSON metadata."""
+        with self.store.transaction() as conn:
+            row = conn.execute("SELECT meta FROM backups WHERE id = ?", (backup_id,)).fetchone()
+            if row is None:
+                return
+            meta = {**json.loads(row[0] or "{}"), **fields}
+            conn.execute(
+                "UPDATE backups SET meta = ? WHERE id = ?", (json.dumps(meta), backup_id)
+            )
+
+    def set_manifest(self, backup_id: int, manifest: Dict[str, Tuple[int, str]]) -> None:
+        """Replace an artifact's per-file ``(size, sha256)`` manifest."""
+        with self.store.transaction() as conn:
+            conn.execute("DELETE FROM backup_manifests WHERE backup_id = ?", (backup_id,))
+            conn.executemany(
+                "INSERT INTO backup_manifests (backup_id, path, size, sha256) VALUES (?, ?, ?, ?)",
+                [(backup_id, path, size, digest) for path, (size, digest) in manifest.items()],
+            )
+
+    def manifest(self, backup_id: int) -> Dict[str, Tuple[int, str]]:
+        rows = self.store.connection().execute(
+            "SELECT path, size, sha256 FROM backup_manifests WHERE backup_id = ? ORDER BY path",
+            (backup_id,),
+        ).fetchall()
+        return {path: (size, digest) for path, size, digest in rows}
+
+    @staticmethod
+    def _row(row: Iterable[Any]) -> dict:
+        entry = dict(zip(_COLUMNS.split(", "), row, strict=True))
+        entry["meta"] = json.loads(entry["meta"]) if entry["meta"] else {}
+        return entry
+
+    def get(self, backup_id: int) -> Optional[dict]:
+        row = self.store.connection().execute(
+            f"SELECT {_COLUMNS} FROM backups WHERE id = ?", (backup_id,)
+        ).fetchone()
+        return self._row(row) if row else None
+
+    def list(
+        self,
+        intent: Optional[str] = None,
+        backup_type: Optional[str] = None,
+        include_deleted: bool = False,
+        limit: int = 100,
+    ) -> List[dict]:
+        """Newest first."""
+        where: List[str] = []
+        params: List[Any] = []
+        if intent:
+            where.append("intent = ?")
+            params.append(intent)
+        if backup_type:
+            where.append("backup_type = ?")
+            params.append(backup_type)
+        if not include_deleted:
+            where.append("deleted_at IS NULL")
+        sql = f"SELECT {_COLUMNS} FROM backups"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        rows = self.store.connection().execute(sql, (*params, limit)).fetchall()
+        return [self._row(r) for r in rows]
+
+    def intents(self) -> List[str]:
+        rows = self.store.connection().execute(
+            "SELECT DISTINCT intent FROM backups WHERE deleted_at IS NULL"
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def prune(
+        self,
+        intent: str,
+        policy: RetentionPolicy,
+        now: Optional[float] = None,
+        remove: Callable[[dict], bool] = remove_local,
+    ) -> Dict[str, Any]:
+        """Delete the artifacts of ``intent`` that ``policy`` no longer keeps.
+
+        ``remove`` deletes one artifact and returns True once it is confirmed
+        gone; only those rows are marked deleted, in one batch. Artifacts it
+        cannot find stay cataloged and are reported as ``missing``. Mirror
+        artifacts (``meta["mirror"]``, the live rsync destination rewritten by
+        every run) and paths still used by a kept artifact only have their rows
+        marked deleted.
+        """
+        if not policy:
+            return {"intent": intent, "expired": 0, "deleted": [], "missing": [], "errors": []}
+        live = self.list(intent=intent, limit=-1)
+        expired = policy.select_expired(live, now)
+        expired_ids = {e["id"] for e in expired}
+        kept_paths = {e["path"] for e in live if e["id"] not in expired_ids}
+        removed: List[int] = []
+        deleted: List[str] = []
+        missing: List[str] = []
+        errors: List[str] = []
+        for entry in expired:
+            try:
+                if entry["path"] in kept_paths or entry["meta"].get("mirror"):
+                    removed.append(entry["id"])
+                elif remove(entry):
+                    deleted.append(entry["path"])
+                    removed.append(entry["id"])
+                else:
+                    missing.append(entry["path"])
+            except OSError as e:
+                logging.warning("Failed to prune backup %s: %s", entry["path"], e)
+                errors.append(f"{entry['path']}: {e}")
+        if removed:
+            stamp = time.time() if now is None else now
+            with self.store.transaction() as conn:
+                conn.executemany(
+                    "UPDATE backups SET deleted_at = ? WHERE id = ?",
+                    [(stamp, backup_id) for backup_id in removed],
+                )
+                conn.executemany(
+                    "DELETE FROM backup_manifests WHERE backup_id = ?",
+                    [(backup_id,) for backup_id in removed],
+                )
+        return {
+            "intent": intent,
+            "expired": len(expired),
+            "deleted": deleted,
+            "missing": missing,
+            "errors": errors,
+        }
+
+    def import_existing(
+        self, intent: str, backup_type: str, directory: str, prefix: str, stack: Optional[str]
+    ) -> int:
+        """Catalog artifacts written before the catalog existed (once per intent)."""
+        flag = f"imported:{intent}"
+        if self.store.get("catalog", flag) or not os.path.isdir(directory):
+            return 0
+        known = {e["path"] for e in self.list(intent=intent, include_deleted=True, limit=-1)}
+        count = 0
+        for entry in os.scandir(directory):
+            if entry.path in known or entry.name.endswith(".sha256"):
+                continue
+            if entry.name.startswith(prefix):
+                st = entry.stat()
+                self.record(
+                    intent, backup_type, entry.path, stack=stack,
+                    size=st.st_size, created_at=st.st_mtime,
+                )
+                count += 1
+        self.store.set("catalog", flag, True)
+        return count
@@ -0,0 +1,139 @@
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Literal, Optional, Set
+
+# stop: start nothing new after the first failure
+# block_dependents: skip (transitive) dependents of a failed node, keep running the rest
+# continue: run everything regardless of failures
+FailurePolicy = Literal["stop", "block_dependents", "continue"]
+
+
+class CycleError(ValueError):
+    def __init__(self, cycle: List[str]) -> None:
+        self.cycle = cycle
+        super().__init__("Dependency cycle: " + " -> ".join(cycle))
+
+
+def _dependents(graph: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    out: Dict[str, List[str]] = {n: [] for n in graph}
+    for node, deps in graph.items():
+        for dep in deps:
+            if dep not in graph:
+                raise KeyError(f"Unknown dependency {dep!r} of {node!r}")
+            if node not in out[dep]:
+                out[dep].append(node)
+    return out
+
+
+def _find_cycle(graph: Dict[str, List[str]], candidates: Set[str]) -> List[str]:
+    """Walk dependency edges inside the unsorted remainder until a node repeats."""
+    node = min(candidates)
+    path: List[str] = []
+    seen: Dict[str, int] = {}
+    while node not in seen:
+        seen[node] = len(path)
+        path.append(node)
+        node = next(d for d in graph[node] if d in candidates)
+    cycle = path[seen[node]:] + [node]
+    cycle.reverse()  # report in execution direction (dependency first)
+    return cycle
+
+
+def topological_order(graph: Dict[str, List[str]]) -> List[str]:
+    """Kahn's algorithm over ``node -> [dependencies]``; ties keep insertion order."""
+    dependents = _dependents(graph)
+    indegree = {n: len(set(deps)) for n, deps in graph.items()}
+    ready = deque(n for n in graph if indegree[n] == 0)
+    order: List[str] = []
+    while ready:
+        node = ready.popleft()
+        order.append(node)
+        for m in dependents[node]:
+            indegree[m] -= 1
+            if indegree[m] == 0:
+                ready.append(m)
+    if len(order) != len(graph):
+        raise CycleError(_find_cycle(graph, set(graph) - set(order)))
+    return order
+
+
+class DagExecutor:
+    """Run ``fn(node)`` for every node once all of its dependencies have finished.
+
+    Ready nodes run concurrently on up to ``max_parallel`` threads. Nodes that
+    share an exclusive key (e.g. a stack name) never run at the same time.
+    ``fn`` returns a result dict whose ``ok`` flag drives the failure policy.
+    """
+
+    def __init__(self, max_parallel: int = 1, on_failure: FailurePolicy = "stop") -> None:
+        self.max_parallel = max(1, max_parallel)
+        self.on_failure = on_failure
+
+    def run(
+        self,
+        graph: Dict[str, List[str]],
+        fn: Callable[[str], dict],
+        keys: Optional[Callable[[str], Iterable[str]]] = None,
+    ) -> Dict[str, dict]:
+        order = topological_order(graph)
+        dependents = _dependents(graph)
+        waiting_on = {n: set(graph[n]) for n in graph}
+        node_keys = {n: set(keys(n)) if keys else set() for n in graph}
+        pending: List[str] = list(order)
+        running: Dict[Future, str] = {}
+        busy: Set[str] = set()
+        results: Dict[str, dict] = {}
+        stopped = False
+
+        def block(failed: str) -> None:
+            queue = deque([failed])
+            while queue:
+                dep = queue.popleft()
+                for m in dependents[dep]:
+                    if m in pending:
+                        pending.remove(m)
+                        results[m] = {
+                            "ok": False,
+                            "skipped": True,
+                            "error": f"Dependency failed: {dep}",
+                            "failed_dependency": dep,
+                        }
+                        queue.append(m)
+
+        with ThreadPoolExecutor(max_workers=self.max_parallel) as pool:
+            while pending or running:
+                if not stopped:
+                    for node in list(pending):
+                        if len(running) >= self.max_parallel:
+                            break
+                        if waiting_on[node] or node_keys[node] & busy:
+                            continue
+                        pending.remove(node)
+                        busy |= node_keys[node]
+                        running[pool.submit(fn, node)] = node
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    node = running.pop(fut)
+                    busy -= node_keys[node]
+                    try:
+                        res = fut.result()
+                    except Exception as e:
+                        res = {"ok": False, "error": str(e)}
+                    results[node] = res
+                    if not res.get("ok", False):
+                        if self.on_failure == "stop":
+                            stopped = True
+                        if self.on_failure != "continue":
+                            block(node)
+                    for m in dependents[node]:
+                        waiting_on[m].discard(node)
+
+        for node in pending:
+            results[node] = {
+                "ok": False,
+                "skipped": True,
+                "error": "Not started: stopped after an earlier failure",
+            }
+        return results
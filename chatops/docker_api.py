@@ -0,0 +1,115 @@
+import json
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+import httpx
+
+DEFAULT_SOCKET = "/var/run/docker.sock"
+PROJECT_LABEL = "com.docker.compose.project"
+SERVICE_LABEL = "com.docker.compose.service"
+CONFIG_HASH_LABEL = "com.docker.compose.config-hash"
+
+
+class DockerAPIError(RuntimeError):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(f"Docker API {status}: {message}")
+        self.status = status
+
+
+def socket_path(docker_host: str = "") -> str:
+    """Socket for ``DOCKER_HOST`` (``unix:///path``) or the default socket."""
+    if docker_host.startswith("unix://"):
+        return docker_host[len("unix://"):]
+    return DEFAULT_SOCKET
+
+
+class DockerEngine:
+    """Docker Engine API over the Unix socket on one pooled keep-alive client.
+
+    Covers what the CLI was forked for besides compose itself: container and
+    image inspection and archive (``docker cp``) streaming. Responses are the
+    Engine's JSON, not scraped stdout.
+    """
+
+    def __init__(
+        self,
+        socket: str = DEFAULT_SOCKET,
+        timeout: float = 30.0,
+        max_connections: int = 8,
+        api_version: str = "",
+    ) -> None:
+        self.socket = socket
+        self.prefix = f"/{api_version}" if api_version else ""
+        self._client = httpx.Client(
+            transport=httpx.HTTPTransport(
+                uds=socket,
+                limits=httpx.Limits(
+                    max_connections=max_connections, max_keepalive_connections=max_connections
+                ),
+            ),
+            base_url="http://docker",
+            timeout=timeout,
+        )
+
+    def _get(self, path: str, **params) -> httpx.Response:
+        r = self._client.get(self.prefix + path, params=params or None)
+        if r.status_code >= 400:
+            raise DockerAPIError(r.status_code, _message(r))
+        return r
+
+    def ping(self) -> bool:
+        try:
+            return self._get("/_ping").text == "OK"
+        except (httpx.HTTPError, DockerAPIError):
+            return False
+
+    def version(self) -> dict:
+        return self._get("/version").json()
+
+    def inspect_container(self, container: str) -> dict:
+        return self._get(f"/containers/{quote(container, safe='')}/json").json()
+
+    def containers(self, labels: Optional[Dict[str, str]] = None, all: bool = True) -> List[dict]:
+        filters = {"label": [f"{k}={v}" for k, v in (labels or {}).items()]}
+        return self._get(
+            "/containers/json", all=str(all).lower(), filters=json.dumps(filters)
+        ).json()
+
+    def image_id(self, ref: str) -> str:
+        """Local image ID for ``ref``; DockerAPIError(404) when it is not present."""
+        return self._get(f"/images/{quote(ref, safe='/:@')}/json").json()["Id"]
+
+    def compose_containers(self, project: str) -> Dict[str, List[Tuple[str, str, bool]]]:
+        """``(config_hash, image_id, running)`` of a compose project's containers by service."""
+        out: Dict[str, List[Tuple[str, str, bool]]] = {}
+        for c in self.containers({PROJECT_LABEL: project}):
+            labels = c.get("Labels") or {}
+            out.setdefault(labels.get(SERVICE_LABEL, ""), []).append(
+                (
+                    labels.get(CONFIG_HASH_LABEL, ""),
+                    c.get("ImageID", ""),
+                    c.get("State") == "running",
+                )
+            )
+        return out
+
+    def get_archive(
+        self, container: str, path: str, chunk_size: int = 1024 * 1024
+    ) -> Iterator[bytes]:
+        """Stream ``path`` out of ``container`` as an uncompressed tar (``docker cp src -``)."""
+        url = f"{self.prefix}/containers/{quote(container, safe='')}/archive"
+        with self._client.stream("GET", url, params={"path": path}) as r:
+            if r.status_code >= 400:
+                r.read()
+                raise DockerAPIError(r.status_code, _message(r))
+            yield from r.iter_bytes(chunk_size)
+
+    def close(self) -> None:
+        self._client.close()
+
+
+def _message(r: httpx.Response) -> str:
+    try:
+        return r.json().get("message", r.text)
+    except ValueError:
+        return r.text
@@ -0,0 +1,194 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .docker_api import CONFIG_HASH_LABEL, SERVICE_LABEL
+
+# Runs an argv and returns its stdout; raises CalledProcessError on failure
+Runner = Callable[[List[str]], str]
+
+
+def compose_images(run: Runner, compose_file: str) -> List[str]:
+    """Image references of every service, as resolved by ``docker compose config``."""
+    out = run(["docker", "compose", "-f", compose_file, "config", "--images"])
+    return sorted({line.strip() for line in out.splitlines() if line.strip()})
+
+
+def local_image_ids(run: Runner, refs: List[str], engine: Any = None) -> Dict[str, str]:
+    """Content-addressed ID (``sha256:...``) of each locally present image.
+
+    ``docker image inspect`` fails if any reference is missing, so an error
+    (CalledProcessError, DockerAPIError 404, or ValueError on short output)
+    means something still needs pulling. ``engine`` (a ``DockerEngine``)
+    replaces the CLI when given.
+    """
+    if not refs:
+        return {}
+    if engine is not None:
+        return {ref: engine.image_id(ref) for ref in refs}
+    out = run(["docker", "image", "inspect", "--format", "{{.Id}}", *refs])
+    ids = [line.strip() for line in out.splitlines() if line.strip()]
+    return dict(zip(refs, ids, strict=True))
+
+
+def prefetch_record(compose_file: str, images: Dict[str, str]) -> dict:
+    return {"compose": compose_file, "images": images, "pulled_at": time.time()}
+
+
+def prefetch_matches(
+    record: Optional[dict],
+    compose_file: str,
+    current: Dict[str, str],
+    max_age: float,
+    now: Optional[float] = None,
+) -> bool:
+    """True when a prefetch already pulled exactly the images the compose spec wants.
+
+    The image list must be unchanged, every image must still resolve to the
+    recorded ID and the prefetch must be younger than ``max_age`` seconds.
+    """
+    if not record or record.get("compose") != compose_file or not current:
+        return False
+    now = time.time() if now is None else now
+    if now - float(record.get("pulled_at", 0)) > max_age:
+        return False
+    return record.get("images") == current
+
+
+_INSPECT_FORMAT = (
+    f'{{{{index .Config.Labels "{SERVICE_LABEL}"}}}} '
+    f'{{{{index .Config.Labels "{CONFIG_HASH_LABEL}"}}}} '
+    "{{.Image}} {{.State.Running}}"
+)
+
+
+class ServiceSpec:
+    __slots__ = ("config_hash", "image", "replicas")
+
+    def __init__(self, config_hash: str, image: str, replicas: int) -> None:
+        self.config_hash = config_hash
+        self.image = image
+        self.replicas = replicas
+
+
+class ComposeSpec:
+    __slots__ = ("project", "services")
+
+    def __init__(self, project: str, services: Dict[str, ServiceSpec]) -> None:
+        self.project = project
+        self.services = services
+
+
+def resolve_spec(run: Runner, compose_file: str) -> ComposeSpec:
+    """Project name plus per-service config hash (as compose labels containers),
+    image and replica count."""
+    hashes: Dict[str, str] = {}
+    out = run(["docker", "compose", "-f", compose_file, "config", "--hash", "*"])
+    for line in out.splitlines():
+        if not line.strip():
+            continue
+        service, config_hash = line.split()
+        hashes[service] = config_hash
+    config = json.loads(
+        run(["docker", "compose", "-f", compose_file, "config", "--format", "json"])
+    )
+    specs: Dict[str, ServiceSpec] = {}
+    for service, config_hash in hashes.items():
+        svc = (config.get("services") or {}).get(service) or {}
+        replicas = svc.get("scale")
+        if replicas is None:
+            replicas = (svc.get("deploy") or {}).get("replicas")
+        specs[service] = ServiceSpec(
+            config_hash, svc.get("image", ""), 1 if replicas is None else int(replicas)
+        )
+    return ComposeSpec(config.get("name", ""), specs)
+
+
+def _signature(compose_file: str) -> Tuple[Tuple[int, int], ...]:
+    """Stat of the compose file and its ``.env`` (both feed the resolved spec)."""
+    sig = []
+    for path in (compose_file, os.path.join(os.path.dirname(compose_file), ".env")):
+        try:
+            st = os.stat(path)
+            sig.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            sig.append((-1, -1))
+    return tuple(sig)
+
+
+class ComposeSpecCache:
+    """Resolved specs per compose file, re-resolved only when the file or ``.env`` changes."""
+
+    def __init__(self, max_entries: int = 64) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[tuple, ComposeSpec]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, run: Runner, compose_file: str) -> ComposeSpec:
+        sig = _signature(compose_file)
+        with self._lock:
+            hit = self._entries.get(compose_file)
+            if hit is not None and hit[0] == sig:
+                self._entries.move_to_end(compose_file)
+                return hit[1]
+        specs = resolve_spec(run, compose_file)
+        with self._lock:
+            self._entries[compose_file] = (sig, specs)
+            self._entries.move_to_end(compose_file)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return specs
+
+    def invalidate(self, compose_file: Optional[str] = None) -> None:
+        with self._lock:
+            if compose_file is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(compose_file, None)
+
+
+def running_containers(run: Runner, compose_file: str) -> Dict[str, List[Tuple[str, str, bool]]]:
+    """``(config_hash, image_id, running)`` of each container, grouped by service."""
+    ids = run(["docker", "compose", "-f", compose_file, "ps", "-a", "-q"]).split()
+    if not ids:
+        return {}
+    containers: Dict[str, List[Tuple[str, str, bool]]] = {}
+    out = run(["docker", "inspect", "--format", _INSPECT_FORMAT, *ids])
+    for line in out.splitlines():
+        if not line.strip():
+            continue
+        service, config_hash, image_id, running = line.split()
+        containers.setdefault(service, []).append((config_hash, image_id, running == "true"))
+    return containers
+
+
+def changed_services(
+    run: Runner, spec: ComposeSpec, compose_file: str, engine: Any = None
+) -> List[str]:
+    """Services ``up -d`` would create, recreate, start or rescale; empty means a no-op.
+
+    A container differs when its config-hash label or image ID no longer
+    matches the resolved spec, or it is stopped. With ``engine`` the
+    containers and images are read from the Engine API instead of the CLI.
+    """
+    if engine is not None and spec.project:
+        containers = engine.compose_containers(spec.project)
+    else:
+        containers = running_containers(run, compose_file)
+    refs = sorted({s.image for s in spec.services.values() if s.image})
+    image_ids = local_image_ids(run, refs, engine)
+    changed = []
+    for service, svc in sorted(spec.services.items()):
+        current = containers.get(service, [])
+        want_image = image_ids.get(svc.image)
+        if len(current) != svc.replicas or any(
+            config_hash != svc.config_hash
+            or not running
+            or (want_image is not None and image_id != want_image)
+            for config_hash, image_id, running in current
+        ):
+            changed.append(service)
+    return changed
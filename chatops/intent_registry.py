@@ -0,0 +1,135 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import yaml
+
+
+class IntentEntry:
+    """Parsed state of a single intent file, keyed by its stat signature."""
+
+    __slots__ = ("name", "path", "signature", "description", "intents", "error")
+
+    def __init__(
+        self,
+        name: str,
+        path: str,
+        signature: tuple,
+        description: Optional[str],
+        intents: List[Any],
+        error: Optional[Exception],
+    ) -> None:
+        self.name = name
+        self.path = path
+        self.signature = signature
+        self.description = description
+        self.intents = intents
+        self.error = error
+
+    @property
+    def is_bundle(self) -> bool:
+        return len(self.intents) > 1
+
+    @property
+    def intent(self) -> Any:
+        if self.error is not None:
+            raise self.error
+        if self.is_bundle:
+            raise ValueError(
+                f"Intent {self.name} is a bundle of {len(self.intents)} documents"
+            )
+        return self.intents[0]
+
+
+def _first_line_description(text: str) -> Optional[str]:
+    first_line = text.split("\n", 1)[0].strip()
+    if first_line.startswith("#"):
+        return first_line[1:].strip()
+    return None
+
+
+class IntentRegistry:
+    """Process-wide cache of validated intents from ``<dir>/*.yaml``.
+
+    Files are parsed once and re-parsed only when their (mtime, size) changes.
+    The directory is re-scanned at most once every ``recheck_seconds`` so the
+    request path is a dict lookup; edits still land without a restart.
+    """
+
+    def __init__(
+        self,
+        intents_dir: str,
+        parse: Callable[[dict], Any],
+        recheck_seconds: float = 2.0,
+    ) -> None:
+        self.intents_dir = intents_dir
+        self._parse = parse
+        self.recheck_seconds = recheck_seconds
+        self._lock = threading.Lock()
+        self._entries: Dict[str, IntentEntry] = {}
+        self._next_check = 0.0
+
+    def refresh(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return
+        with self._lock:
+            if not force and now < self._next_check:
+                return
+            self._scan()
+            self._next_check = time.monotonic() + self.recheck_seconds
+
+    def _scan(self) -> None:
+        seen = set()
+        try:
+            it = os.scandir(self.intents_dir)
+        except FileNotFoundError:
+            self._entries = {}
+            return
+        entries = dict(self._entries)
+        with it:
+            for de in it:
+                if not de.name.endswith(".yaml") or not de.is_file():
+                    continue
+                name = de.name[:-5]
+                seen.add(name)
+                try:
+                    st = de.stat()
+                except OSError:
+                    continue
+                signature = (st.st_mtime_ns, st.st_size)
+                current = entries.get(name)
+                if current is not None and current.signature == signature:
+                    continue
+                entries[name] = self._load(name, de.path, signature)
+        for name in set(entries) - seen:
+            del entries[name]
+        self._entries = entries
+
+    def _load(self, name: str, path: str, signature: tuple) -> IntentEntry:
+        description = None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+            description = _first_line_description(text)
+            # Multi-document files ("---" separated) expand into an intent bundle
+            intents = [self._parse(raw) for raw in yaml.safe_load_all(text) if raw is not None]
+            if not intents:
+                raise ValueError("Empty intent file")
+        except Exception as e:
+            logging.error("Intent validation failed for %s: %s", name, e)
+            return IntentEntry(name, path, signature, description, [], e)
+        return IntentEntry(name, path, signature, description, intents, None)
+
+    def get(self, name: str) -> IntentEntry:
+        self.refresh()
+        entry = self._entries.get(name)
+        if entry is None:
+            raise FileNotFoundError(os.path.join(self.intents_dir, f"{name}.yaml"))
+        return entry
+
+    def entries(self) -> List[IntentEntry]:
+        self.refresh()
+        return [self._entries[k] for k in sorted(self._entries)]
@@ -0,0 +1,151 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+
+class JobQueueFull(RuntimeError):
+    pass
+
+
+class Job:
+    """A unit of work on the job pool with incremental output and a final result."""
+
+    def __init__(self, job_id: str, name: str, max_output_lines: int) -> None:
+        self.id = job_id
+        self.name = name
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.status_code: Optional[int] = None
+        self.future: Future = Future()
+        self._lines: Deque[str] = deque(maxlen=max_output_lines)
+        self._dropped = 0  # lines evicted from the front of the bounded buffer
+        self._lock = threading.Lock()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def append_output(self, text: str) -> None:
+        lines = text.splitlines()
+        if not lines:
+            return
+        with self._lock:
+            overflow = len(self._lines) + len(lines) - (self._lines.maxlen or 0)
+            if overflow > 0:
+                self._dropped += overflow
+            self._lines.extend(lines)
+
+    def output_since(self, cursor: int) -> Tuple[List[str], int]:
+        """Return lines after ``cursor`` (absolute line number) and the new cursor."""
+        with self._lock:
+            start = max(cursor - self._dropped, 0)
+            lines = list(self._lines)[start:]
+            return lines, self._dropped + len(self._lines)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "intent": self.name,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+            "status_code": self.status_code,
+        }
+
+
+class JobManager:
+    """Bounded worker pool for long-running intent executions.
+
+    At most ``max_workers`` jobs run at once and at most ``max_pending`` are
+    queued or running; finished jobs are kept (newest ``history`` only) so their
+    status and output remain queryable.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        max_pending: int = 100,
+        history: int = 200,
+        max_output_lines: int = 2000,
+    ) -> None:
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.history = history
+        self.max_output_lines = max_output_lines
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, name: str, fn: Callable[[Job], Any]) -> Job:
+        with self._lock:
+            active = sum(1 for j in self._jobs.values() if not j.done)
+            if active >= self.max_pending:
+                raise JobQueueFull(f"{active} jobs pending")
+            job = Job(secrets.token_hex(8), name, self.max_output_lines)
+            self._jobs[job.id] = job
+            self._evict()
+            if self._pool is None:
+                # Created lazily so the manager can be restarted after shutdown()
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="chatops-job"
+                )
+            pool = self._pool
+        pool.submit(self._run, job, fn)
+        return job
+
+    def _evict(self) -> None:
+        finished = [jid for jid, j in self._jobs.items() if j.done]
+        for jid in finished[: max(0, len(self._jobs) - self.history)]:
+            del self._jobs[jid]
+
+    def _run(self, job: Job, fn: Callable[[Job], Any]) -> None:
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            result = fn(job)
+        except Exception as e:
+            job.error = e.detail if isinstance(e, HTTPException) else str(e)
+            job.status_code = e.status_code if isinstance(e, HTTPException) else 500
+            job.finished_at = time.time()
+            job.status = "failed"
+            job.future.set_exception(e)
+            return
+        job.result = result
+        ok = not isinstance(result, dict) or result.get("ok", True)
+        job.status_code = 200
+        job.finished_at = time.time()
+        job.status = "succeeded" if ok else "failed"
+        job.future.set_result(result)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def recent(self) -> List[Job]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def stats(self) -> Dict[str, int]:
+        jobs = self.recent()
+        return {
+            "queued": sum(1 for j in jobs if j.status == "queued"),
+            "running": sum(1 for j in jobs if j.status == "running"),
+            "workers": self.max_workers,
+        }
+
+    def shutdown(self, wait: bool = False) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
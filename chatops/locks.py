@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, Hashable, Tuple
+
+
+class _Ticket:
+    __slots__ = ("dedupe_key", "future", "started", "waiters")
+
+    def __init__(self, dedupe_key: Hashable) -> None:
+        self.dedupe_key = dedupe_key
+        self.future: Future = Future()
+        self.started = False
+        self.waiters = 1
+
+
+class _KeyQueue:
+    __slots__ = ("tickets", "cond")
+
+    def __init__(self, lock: threading.Lock) -> None:
+        self.tickets: Deque[_Ticket] = deque()
+        self.cond = threading.Condition(lock)
+
+
+class StackLockManager:
+    """Serializes work per key (e.g. stack + compose file) in FIFO order.
+
+    A request whose ``dedupe_key`` matches a ticket that is queued but not yet
+    started joins that ticket instead of enqueuing another run; every joined
+    caller receives the same result (or exception). A run already in progress
+    is never joined, so a new request after it still sees fresh state.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._queues: Dict[str, _KeyQueue] = {}
+
+    def run(self, key: str, dedupe_key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, dict]:
+        """Execute ``fn`` holding ``key``; returns ``(result, info)``.
+
+        ``info`` has ``coalesced`` (joined an identical pending run),
+        ``queued_behind`` (tickets ahead at arrival) and ``wait_seconds``.
+        """
+        start = time.monotonic()
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue is None:
+                queue = self._queues[key] = _KeyQueue(self._lock)
+            ahead = len(queue.tickets)
+            joined = next(
+                (t for t in queue.tickets if not t.started and t.dedupe_key == dedupe_key),
+                None,
+            )
+            if joined is not None:
+                joined.waiters += 1
+            else:
+                ticket = _Ticket(dedupe_key)
+                queue.tickets.append(ticket)
+
+        if joined is not None:
+            result = joined.future.result()
+            return result, {
+                "coalesced": True,
+                "queued_behind": ahead,
+                "wait_seconds": time.monotonic() - start,
+            }
+
+        with self._lock:
+            while queue.tickets[0] is not ticket:
+                queue.cond.wait()
+            ticket.started = True
+        info = {
+            "coalesced": False,
+            "queued_behind": ahead,
+            "wait_seconds": time.monotonic() - start,
+        }
+        try:
+            result = fn()
+        except BaseException as e:
+            ticket.future.set_exception(e)
+            raise
+        else:
+            ticket.future.set_result(result)
+        finally:
+            with self._lock:
+                queue.tickets.popleft()
+                if queue.tickets:
+                    queue.cond.notify_all()
+                else:
+                    del self._queues[key]
+        return result, info
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Current queue depth per key (for status/debugging)."""
+        with self._lock:
+            return {
+                key: {
+                    "running": bool(q.tickets and q.tickets[0].started),
+                    "pending": sum(1 for t in q.tickets if not t.started),
+                    "waiters": sum(t.waiters for t in q.tickets),
+                }
+                for key, q in self._queues.items()
+            }
@@ -1,7 +1,8 @@
+import asyncio
+import functools
 import hashlib
 import hmac
 import importlib
-import ipaddress
 import json
 import logging
 import os
@@ -9,9 +10,12 @@ import re
 import secrets
 import subprocess
 import sys
-import tempfile
+import threading
 import time
-from typing import TYPE_CHECKING, Any, List, Literal, Optional, cast
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Literal, Optional, Tuple
 
 # Optional APScheduler import (lazy to avoid unresolved import errors when not installed)
 try:
@@ -40,14 +44,75 @@ else:
 import httpx
 import yaml
 from fastapi import Depends, FastAPI, Header, HTTPException, Request
-from fastapi.responses import PlainTextResponse
-from prometheus_client import Counter, Histogram, generate_latest
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.errors import RateLimitExceeded
-from slowapi.util import get_remote_address
 
+from .alerts import AlertDispatcher
+from .allowlist import AllowListSource
+from .apikeys import VerificationCache
+from .audit import AuditWriter
+from .audit import query as audit_query
+from .backup_stream import SUFFIXES as BACKUP_SUFFIXES
+from .backup_stream import pick_compression, write_checksum_file, write_compressed
+from .catalog import BackupCatalog, RetentionPolicy, remove_local
+from .dag import CycleError, DagExecutor
+from .docker_api import DockerAPIError, DockerEngine, socket_path
+from .images import (
+    ComposeSpecCache,
+    changed_services,
+    compose_images,
+    local_image_ids,
+    prefetch_matches,
+    prefetch_record,
+)
+from .intent_registry import IntentRegistry
+from .jobs import Job, JobManager, JobQueueFull
+from .locks import StackLockManager
 from .logging_setup import setup_logging
+from .metrics import (
+    AUTH_FAILURES,
+    INTENT_DURATION,
+    INTENT_FAILURES,
+    INTENT_REQUESTS,
+    PhaseTimer,
+    command_verb,
+    phase,
+    phase_timing,
+    render_latest,
+)
+from .proxmox import (
+    VZDUMP_ARCHIVE,
+    ProxmoxAPIError,
+    ProxmoxClient,
+    StorageSlots,
+    resolve_guests,
+    run_backups,
+    wait_task,
+)
+from .ratelimit import (
+    Rate,
+    RateLimiter,
+    parse_endpoint_rates,
+    retry_after_header,
+    storage_from_uri,
+)
+from .rbac import RBACSource, RBACTable, key_digest
+from .state_store import StateStore
+from .streaming import CommandResult, run_streaming, stream_stdout
+from .verify import Manifest, verify_archive, verify_tree, verify_vzdump
+from .volume_backup import (
+    ROOT_SHARD,
+    discard_partial,
+    finish_snapshot,
+    is_remote,
+    list_volumes,
+    order_shards,
+    parse_rsync_stats,
+    partial_path,
+    previous_snapshot,
+    shard_excludes,
+    snapshot_name,
+)
 
 VERSION = "1.0.0"
 SERVICE_START_TIME = time.time()
@@ -64,6 +129,46 @@ AUDIT_LOG_FILE = os.getenv(
     "CHATOPS_AUDIT_LOG_FILE",
     os.path.join(os.path.dirname(__file__), ".state", "audit.log"),
 )
+INTENTS_DIR = os.path.join(os.path.dirname(__file__), "intents")
+INTENTS_RECHECK_SECONDS = float(os.getenv("CHATOPS_INTENTS_RECHECK_SECONDS", "2"))
+MAX_PARALLEL = max(1, int(os.getenv("CHATOPS_MAX_PARALLEL", "3")))
+JOB_WORKERS = max(1, int(os.getenv("CHATOPS_JOB_WORKERS", "4")))
+JOB_MAX_PENDING = max(1, int(os.getenv("CHATOPS_JOB_MAX_PENDING", "100")))
+VERIFY_WORKERS = max(1, int(os.getenv("CHATOPS_VERIFY_WORKERS", "1")))
+VERIFY_MAX_PENDING = max(1, int(os.getenv("CHATOPS_VERIFY_MAX_PENDING", "20")))
+OUTPUT_TAIL_BYTES = int(os.getenv("CHATOPS_OUTPUT_TAIL_BYTES", str(64 * 1024)))
+SPOOL_LOGS = os.getenv("CHATOPS_SPOOL_LOGS", "false").lower() in {"1", "true", "yes"}
+AUDIT_QUEUE_SIZE = int(os.getenv("CHATOPS_AUDIT_QUEUE_SIZE", "10000"))
+AUDIT_OVERFLOW = os.getenv("CHATOPS_AUDIT_OVERFLOW", "block").lower()
+AUDIT_FSYNC = os.getenv("CHATOPS_AUDIT_FSYNC", "true").lower() in {"1", "true", "yes"}
+AUDIT_MAX_BYTES = int(os.getenv("CHATOPS_AUDIT_MAX_BYTES", str(64 * 1024 * 1024)))
+AUDIT_ROTATE_SECONDS = float(os.getenv("CHATOPS_AUDIT_ROTATE_SECONDS", "86400"))
+AUDIT_COMPRESSION = os.getenv("CHATOPS_AUDIT_COMPRESSION", "gzip").lower()
+ALLOWLIST_RECHECK_SECONDS = float(os.getenv("CHATOPS_IP_ALLOWLIST_RECHECK_SECONDS", "5"))
+RATE_LIMIT = os.getenv("CHATOPS_RATE_LIMIT", "10/minute")
+RATE_LIMIT_ENDPOINTS = os.getenv("CHATOPS_RATE_LIMIT_ENDPOINTS", "")
+RATE_LIMIT_STORAGE = os.getenv("CHATOPS_RATE_LIMIT_STORAGE", "memory")
+RATE_LIMIT_ENABLED = os.getenv("CHATOPS_RATE_LIMIT_ENABLED", "true").lower() in {"1", "true", "yes"}
+RBAC_RECHECK_SECONDS = float(os.getenv("CHATOPS_RBAC_RECHECK_SECONDS", "5"))
+KEY_CACHE_SIZE = int(os.getenv("CHATOPS_KEY_CACHE_SIZE", "1024"))
+KEY_CACHE_TTL = float(os.getenv("CHATOPS_KEY_CACHE_TTL", "300"))
+KEY_CACHE_FAILURES = int(os.getenv("CHATOPS_KEY_CACHE_FAILURES", "256"))
+ALERT_DEDUPE_SECONDS = float(os.getenv("CHATOPS_ALERT_DEDUPE_SECONDS", "60"))
+STATE_HISTORY_LIMIT = int(os.getenv("CHATOPS_STATE_HISTORY_LIMIT", "100"))
+PREFETCH_MAX_AGE = float(os.getenv("CHATOPS_PREFETCH_MAX_AGE", "21600"))
+BACKUP_THREADS = int(os.getenv("CHATOPS_BACKUP_THREADS", "0"))  # 0: all cores
+BACKUP_MAX_SHARDS = max(1, int(os.getenv("CHATOPS_BACKUP_MAX_SHARDS", "8")))
+VERIFY_SAMPLE_FILES = int(os.getenv("CHATOPS_VERIFY_SAMPLE_FILES", "100"))
+# Proxmox API backend for vm_proxmox backups (local vzdump when unset)
+PROXMOX_URL = os.getenv("CHATOPS_PROXMOX_URL", "")
+PROXMOX_TOKEN_ID = os.getenv("CHATOPS_PROXMOX_TOKEN_ID", "")
+PROXMOX_TOKEN_SECRET = os.getenv("CHATOPS_PROXMOX_TOKEN_SECRET", "")
+PROXMOX_VERIFY_TLS = os.getenv("CHATOPS_PROXMOX_VERIFY_TLS", "true").lower() in {"1", "true", "yes"}
+PROXMOX_STORAGE_CONCURRENCY = int(os.getenv("CHATOPS_PROXMOX_STORAGE_CONCURRENCY", "2"))
+PROXMOX_POLL_SECONDS = float(os.getenv("CHATOPS_PROXMOX_POLL_SECONDS", "5"))
+PROXMOX_TASK_TIMEOUT = float(os.getenv("CHATOPS_PROXMOX_TASK_TIMEOUT", "14400"))
+DOCKER_BACKEND = os.getenv("CHATOPS_DOCKER_BACKEND", "cli").lower()  # cli | api | auto
+WEBHOOK_PREFETCH = os.getenv("CHATOPS_WEBHOOK_PREFETCH", "false").lower() in {"1", "true", "yes"}
 
 def _apscheduler_classes():
     """Lazily import APScheduler classes when available/enabled."""
@@ -78,36 +183,54 @@ DISCORD_WEBHOOK_URL = os.getenv("DISCORD_WEBHOOK_URL", "")
 
 setup_logging()
 
-# Rate limiter: 10 requests per minute per IP
-limiter = Limiter(key_func=get_remote_address, default_limits=["10/minute"])
-
-# Prometheus metrics
-INTENT_REQUESTS = Counter(
-    "chatops_intent_requests_total",
-    "Total intent execution requests",
-    ["intent_name", "action", "stack", "dry_run"],
+# Intent executions run here instead of on Starlette's request threadpool
+JOBS = JobManager(max_workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING)
+# Backup verification gets its own pool so long hashes never hold up /run
+VERIFY_JOBS = JobManager(max_workers=VERIFY_WORKERS, max_pending=VERIFY_MAX_PENDING)
+# One execution at a time per stack/compose file; identical queued intents coalesce
+STACK_LOCKS = StackLockManager()
+# Rollback message the lock owner attaches to a failed run's exception
+ROLLBACK_ATTR = "chatops_rollback"
+# Outcomes of slow salted-hash key checks (CHATOPS_API_KEY_HASH, RBAC key_hash)
+KEY_CACHE = VerificationCache(
+    max_entries=KEY_CACHE_SIZE, ttl=KEY_CACHE_TTL, max_failures=KEY_CACHE_FAILURES
 )
-INTENT_FAILURES = Counter(
-    "chatops_intent_failures_total",
-    "Failed intent executions",
-    ["intent_name", "action", "stack", "reason"],
+# Compiled RBAC table, keyed by API key digest
+RBAC = RBACSource(recheck_seconds=RBAC_RECHECK_SECONDS, cache=KEY_CACHE)
+# Compiled IP allowlist (CHATOPS_IP_ALLOWLIST plus CHATOPS_IP_ALLOWLIST_FILE)
+ALLOWLIST = AllowListSource(recheck_seconds=ALLOWLIST_RECHECK_SECONDS)
+
+# Token-bucket rate limiter; shared across workers with sqlite/redis storage
+limiter = RateLimiter(
+    storage_from_uri(RATE_LIMIT_STORAGE, os.path.join(STATE_DIR, "ratelimit.db")),
+    default=Rate.parse(RATE_LIMIT),
+    endpoints=parse_endpoint_rates(RATE_LIMIT_ENDPOINTS),
+    enabled=RATE_LIMIT_ENABLED,
 )
-INTENT_DURATION = Histogram(
-    "chatops_intent_duration_seconds",
-    "Intent execution duration",
-    ["intent_name", "action"],
-)
-AUTH_FAILURES = Counter(
-    "chatops_auth_failures_total", "Authentication failures", ["reason"]
+
+
+
+# Background group-commit writer; started with the app, synchronous until then
+AUDIT_WRITER = AuditWriter(
+    max_queue=AUDIT_QUEUE_SIZE,
+    overflow="drop" if AUDIT_OVERFLOW == "drop" else "block",
+    fsync=AUDIT_FSYNC,
+    max_bytes=AUDIT_MAX_BYTES,
+    rotate_seconds=AUDIT_ROTATE_SECONDS,
+    compression="zstd" if AUDIT_COMPRESSION == "zstd" else (
+        "none" if AUDIT_COMPRESSION == "none" else "gzip"
+    ),
 )
 
 
+# Webhook alerts are posted by a background worker (started on first alert)
+ALERTS = AlertDispatcher(dedupe_seconds=ALERT_DEDUPE_SECONDS)
+
+
 def _audit_write_line(line: str) -> None:
     try:
         path = os.getenv("CHATOPS_AUDIT_LOG_FILE", AUDIT_LOG_FILE)
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, "a", encoding="utf-8") as f:
-            f.write(line + "\n")
+        AUDIT_WRITER.write(path, line)
     except Exception as e:
         logging.debug("audit_write_failed: %s", e)
 
@@ -119,44 +242,39 @@ def audit_log(event: dict) -> None:
             "ts": int(time.time()),
             **event,
         }
-        _audit_write_line(json.dumps(payload, separators=(",", ":")))
+        with phase("audit"):
+            _audit_write_line(json.dumps(payload, separators=(",", ":")))
     except Exception as e:
         logging.debug("audit_log_failed: %s", e)
 
 
 
 def send_discord_alert(message: str, color: int = 0x00FF00) -> None:
-    """Send audit alert to Discord webhook (non-blocking, best-effort)."""
+    """Queue an audit alert for the Discord webhook (non-blocking, best-effort)."""
     if not DISCORD_WEBHOOK_URL:
         return
     try:
-        payload = {
-            "embeds": [
-                {
-                    "title": "ChatOps Audit",
-                    "description": message,
-                    "color": color,
-                    "timestamp": None,  # Discord will use current time
-                }
-            ]
-        }
-        httpx.post(DISCORD_WEBHOOK_URL, json=payload, timeout=5.0)
+        with phase("notify"):
+            ALERTS.send(DISCORD_WEBHOOK_URL, message, color=color)
     except Exception as e:
-        logging.warning("Failed to send Discord alert: %s", e)
+        logging.warning("Failed to queue Discord alert: %s", e)
 
 
 class IntentRequest(BaseModel):
     name: str
     dry_run: bool = False  # Preview mode: show what would be executed without running
     rollback_on_failure: bool = True  # Attempt rollback if execution fails
+    prefetch: bool = False  # Rollout only: pull images now, restart nothing
+    force: bool = False  # Rollout only: run `up -d` even if nothing changed
 
 
 class MultiStackRequest(BaseModel):
-    """Execute multiple intents in sequence."""
+    """Execute multiple intents as a dependency graph."""
     intents: List[str]  # List of intent names to execute
     dry_run: bool = False
     stop_on_failure: bool = True  # Stop execution if any intent fails
     rollback_on_failure: bool = True
+    max_parallel: Optional[int] = None  # Lower the concurrency cap (CHATOPS_MAX_PARALLEL)
 
 
 class Intent(BaseModel):
@@ -180,13 +298,28 @@ class Intent(BaseModel):
     destination_path: Optional[str] = None  # Path inside destination container
     exclude: Optional[List[str]] = None  # Patterns to exclude from backup
     options: Optional[List[str]] = None  # Additional backup options
+    snapshot: bool = False  # docker_volumes: hard-linked point-in-time snapshots
+    parallel: Optional[int] = None  # docker_volumes: rsync workers, one volume per shard
+    verify: Optional[Literal["sample", "full"]] = None  # Verify the backup in the background
     vm_id: Optional[int] = None  # For Proxmox VM backups
-    retention_days: Optional[int] = None  # Backup retention policy
+    vm_ids: Optional[List[int]] = None  # Several guests (Proxmox API backend)
+    pool: Optional[str] = None  # Every guest of a Proxmox pool (Proxmox API backend)
+    retention_days: Optional[int] = None  # Backup retention policy (keep everything newer)
+    keep_last: Optional[int] = None  # GFS retention: newest N backups
+    keep_daily: Optional[int] = None  # newest backup of each of the last N days
+    keep_weekly: Optional[int] = None  # ... of the last N ISO weeks
+    keep_monthly: Optional[int] = None  # ... of the last N months
     storage: Optional[str] = None  # Storage destination name
     compress: Optional[str] = None  # Compression type (e.g., "zstd", "gzip")
     notes: Optional[str] = None  # Backup notes/description
 
 
+# Parsed once, re-validated only when a file's mtime/size changes
+INTENT_REGISTRY = IntentRegistry(
+    INTENTS_DIR, lambda raw: Intent(**raw), recheck_seconds=INTENTS_RECHECK_SECONDS
+)
+
+
 def _ensure_state_dir() -> None:
     try:
         os.makedirs(STATE_DIR, exist_ok=True)
@@ -198,52 +331,481 @@ def _state_path() -> str:
     return os.path.join(STATE_DIR, "state.json")
 
 
-def _state_read() -> dict:
+_STATE_STORES: Dict[str, StateStore] = {}
+_STATE_STORES_LOCK = threading.Lock()
+
+
+def _state_store() -> StateStore:
+    """SQLite state store under ``STATE_DIR`` (imports a legacy state.json once)."""
+    path = os.path.join(STATE_DIR, "state.db")
+    store = _STATE_STORES.get(path)
+    if store is None:
+        with _STATE_STORES_LOCK:
+            store = _STATE_STORES.get(path)
+            if store is None:
+                _ensure_state_dir()
+                store = StateStore(path, history_limit=STATE_HISTORY_LIMIT)
+                if store.import_legacy_json(_state_path()):
+                    logging.info("Imported legacy state from %s", _state_path())
+                _STATE_STORES[path] = store
+    return store
+
+
+_CATALOGS: Dict[str, BackupCatalog] = {}
+
+
+def _catalog() -> BackupCatalog:
+    """Backup catalog kept in the state database."""
+    store = _state_store()
+    catalog = _CATALOGS.get(store.path)
+    if catalog is None:
+        with _STATE_STORES_LOCK:
+            catalog = _CATALOGS.get(store.path)
+            if catalog is None:
+                catalog = _CATALOGS[store.path] = BackupCatalog(store)
+    return catalog
+
+
+def _retention_policy(intent: Intent) -> RetentionPolicy:
+    return RetentionPolicy(
+        keep_last=intent.keep_last,
+        keep_within_days=intent.retention_days,
+        keep_daily=intent.keep_daily,
+        keep_weekly=intent.keep_weekly,
+        keep_monthly=intent.keep_monthly,
+    )
+
+
+# The catalog is the only pruning authority for vzdump archives too; keep-all
+# stops the storage's own prune-backups setting from deleting behind its back
+VZDUMP_KEEP_ALL = "keep-all=1"
+
+
+def _remove_backup(entry: dict) -> bool:
+    """Delete one expired artifact where it lives; True once it is confirmed gone.
+
+    Archives on Proxmox storage (``meta["volid"]``) go through the storage
+    content API, everything else is removed from this host.
+    """
+    meta = entry["meta"]
+    if not meta.get("volid"):
+        return remove_local(entry)
+    if not PROXMOX_URL:
+        return False
+    client = _proxmox_client()
     try:
-        _ensure_state_dir()
-        path = _state_path()
-        if not os.path.exists(path):
-            return {}
-        with open(path, "r") as f:
-            return json.load(f)
-    except Exception as e:
-        logging.warning("Failed to read state: %s", e)
-        return {}
+        upid = client.delete_volume(meta["node"], meta["storage"], meta["volid"])
+        if upid:
+            wait_task(client, meta["node"], upid, poll_interval=PROXMOX_POLL_SECONDS)
+    except (ProxmoxAPIError, httpx.HTTPError) as e:
+        raise OSError(f"Proxmox API error: {e}") from e
+    return True
 
 
-def _state_write(data: dict) -> None:
+def _prune_backups(intent_name: Optional[str] = None) -> List[dict]:
+    """Pruning pass over one intent's artifacts, or every cataloged intent.
+
+    Uses the policy stored when the intent last recorded a backup.
+    """
+    catalog = _catalog()
+    results = []
+    for name in [intent_name] if intent_name else catalog.intents():
+        policy = RetentionPolicy(**(catalog.store.get("retention", name) or {}))
+        with phase("prune"):
+            results.append(catalog.prune(name, policy, remove=_remove_backup))
+    return results
+
+
+def _record_backup(
+    req: "IntentRequest", intent: Intent, path: str, **fields: Any
+) -> Optional[int]:
+    """Catalog a finished backup and queue a pruning pass for its intent."""
+    backup_type = intent.backup_type or intent.database_type or "unknown"
+    policy = _retention_policy(intent)
     try:
-        _ensure_state_dir()
-        tmp_path = _state_path() + ".tmp"
-        with open(tmp_path, "w") as f:
-            json.dump(data, f)
-        os.replace(tmp_path, _state_path())
+        with phase("state"):
+            catalog = _catalog()
+            catalog.store.set("retention", req.name, policy.to_dict())
+            backup_id = catalog.record(req.name, backup_type, path, stack=intent.stack, **fields)
     except Exception as e:
-        logging.warning("Failed to write state: %s", e)
+        logging.warning("Failed to catalog backup %s: %s", path, e)
+        return None
+    if policy:
+        try:
+            JOBS.submit(f"prune:{req.name}", lambda job: _prune_backups(req.name))
+        except JobQueueFull:
+            logging.warning("Backup prune not queued (job queue full): %s", req.name)
+    return backup_id
+
+
+def _verify_backup(
+    intent_name: str, backup_id: int, check: Callable[[], Tuple[dict, Manifest]]
+) -> dict:
+    """Run a verification and store its result and manifest on the catalog entry."""
+    result, manifest = check()
+    catalog = _catalog()
+    if manifest:
+        catalog.set_manifest(backup_id, manifest)
+    catalog.update_meta(backup_id, verify=result)
+    audit_log({
+        "event": "backup_verified",
+        "intent": intent_name,
+        "backup_id": backup_id,
+        "ok": result["ok"],
+        "errors": result["errors"][:3],
+    })
+    if not result["ok"]:
+        send_discord_alert(
+            f"Backup verification failed: {intent_name} (#{backup_id}): "
+            + "; ".join(result["errors"][:3]),
+            color=0xFF0000,
+        )
+    return result
+
+
+def _queue_verify(
+    intent_name: str, backup_id: Optional[int], check: Callable[[], Tuple[dict, Manifest]]
+) -> Optional[str]:
+    """Verify on the verify pool so the backup itself returns without waiting."""
+    if backup_id is None:
+        return None
+    try:
+        job = VERIFY_JOBS.submit(
+            f"verify:{intent_name}", lambda job: _verify_backup(intent_name, backup_id, check)
+        )
+    except JobQueueFull:
+        logging.warning("Backup verification not queued (verify queue full): %s", intent_name)
+        return None
+    return job.id
+
+
+_PROXMOX: Optional[ProxmoxClient] = None
+_PROXMOX_LOCK = threading.Lock()
+PROXMOX_SLOTS = StorageSlots(PROXMOX_STORAGE_CONCURRENCY)
+
+
+def _proxmox_client() -> ProxmoxClient:
+    global _PROXMOX
+    with _PROXMOX_LOCK:
+        if _PROXMOX is None:
+            _PROXMOX = ProxmoxClient(
+                PROXMOX_URL, PROXMOX_TOKEN_ID, PROXMOX_TOKEN_SECRET, verify_tls=PROXMOX_VERIFY_TLS
+            )
+        return _PROXMOX
+
+
+def _proxmox_backup(
+    req: "IntentRequest", intent: Intent, on_output: Optional[Callable[[str], None]]
+) -> Tuple[str, dict]:
+    """vzdump through the Proxmox API: every guest of the intent, capped per storage."""
+    client = _proxmox_client()
+    vm_ids = [*([intent.vm_id] if intent.vm_id else []), *(intent.vm_ids or [])]
+    try:
+        guests = resolve_guests(client, vm_ids, intent.pool)
+    except ValueError as e:
+        raise HTTPException(400, str(e)) from e
+    except (ProxmoxAPIError, httpx.HTTPError) as e:
+        raise HTTPException(502, f"Proxmox API error: {e}") from e
+    if req.dry_run:
+        preview = "[DRY-RUN] Would submit vzdump via the Proxmox API for " + ", ".join(
+            f"{g.vmid}@{g.node}" for g in guests
+        )
+        if on_output:
+            on_output(preview)
+        return preview, {"guests": [g.vmid for g in guests]}
+
+    options = {
+        "compress": intent.compress,
+        "notes-template": intent.notes,
+        "prune-backups": VZDUMP_KEEP_ALL if _retention_policy(intent) else None,
+    }
+    with phase("exec", "vzdump"):
+        tasks = run_backups(
+            client,
+            guests,
+            PROXMOX_SLOTS,
+            storage=intent.storage,
+            options=options,
+            poll_interval=PROXMOX_POLL_SECONDS,
+            timeout=PROXMOX_TASK_TIMEOUT,
+            on_output=on_output,
+        )
+    for task in tasks:
+        if not task["ok"]:
+            continue
+        archive = task["archive"] or f"vzdump:{task['vmid']}"
+        meta = {"vm_id": task["vmid"], "node": task["node"], "storage": intent.storage}
+        if task["archive"] and intent.storage:
+            # The archive path is on the node; pruning deletes it by volume id
+            meta["volid"] = f"{intent.storage}:backup/{os.path.basename(task['archive'])}"
+        task["backup_id"] = _record_backup(req, intent, archive, meta=meta)
+        if not intent.verify:
+            continue
+        if os.path.isfile(archive):
+            task["verify_job"] = _queue_verify(
+                req.name, task["backup_id"], functools.partial(verify_vzdump, archive)
+            )
+        else:
+            task["verify"] = "skipped: remote archive"
+    failed = [t for t in tasks if not t["ok"]]
+    if failed:
+        audit_log({
+            "event": "intent_failed",
+            "intent": req.name,
+            "action": intent.action,
+            "stack": intent.stack,
+            "failed_vm_ids": [t["vmid"] for t in failed],
+        })
+        raise HTTPException(
+            500,
+            f"{len(failed)} of {len(tasks)} vzdump tasks failed: "
+            + "; ".join(f"{t['vmid']}: {t['error']}" for t in failed),
+        )
+    stdout = "".join(
+        f"vzdump {t['vmid']}@{t['node']}: {t['archive'] or t['upid']}\n" for t in tasks
+    )
+    return stdout, {"tasks": tasks}
+
+
+def _rsync_argv(
+    intent: Intent,
+    excludes: List[str],
+    source: str,
+    target: str,
+    link_dest: Optional[str] = None,
+    extra: Tuple[str, ...] = (),
+) -> List[str]:
+    argv = ["rsync", "-av"]
+    for pattern in excludes:
+        argv.extend(["--exclude", pattern])
+    if intent.options:
+        argv.extend(intent.options)
+    argv.extend(extra)
+    if link_dest:
+        argv.append(f"--link-dest={link_dest}")
+    argv.extend([source + "/", target + "/"])
+    return argv
+
+
+def _sharded_rsync(
+    intent_name: str,
+    intent: Intent,
+    run_argv: Callable[[List[str]], str],
+    source: str,
+    target: str,
+    link_dest: Optional[str],
+    dry_run: bool,
+) -> Tuple[str, dict]:
+    """One rsync per top-level volume on ``intent.parallel`` workers.
+
+    Shards start largest-first by the size each volume had on the last run,
+    failures are collected rather than cancelling the other shards, and
+    ``--stats`` counters are summed into one result.
+    """
+    try:
+        volumes = list_volumes(source)
+    except OSError as e:
+        raise HTTPException(400, f"Cannot list volumes in {source}: {e}") from e
+    sizes: Dict[str, int] = _state_store().get("volume_sizes", intent_name) or {}
+    # Shards write one level below the target; on a first remote run rsync
+    # must create the missing parents itself
+    extra = ("--stats", "--mkpath") if is_remote(target) else ("--stats",)
+    shards: List[Tuple[str, List[str]]] = []
+    skipped: List[str] = []
+    for volume in order_shards(volumes, sizes):
+        excludes = shard_excludes(intent.exclude or [], volume)
+        if excludes is None:
+            skipped.append(volume)
+            continue
+        shards.append((volume, _rsync_argv(
+            intent,
+            excludes,
+            os.path.join(source, volume),
+            os.path.join(target, volume),
+            os.path.join(link_dest, volume) if link_dest else None,
+            extra,
+        )))
+    # Files directly under the source. Every live volume belongs to its own
+    # shard and is excluded here by name, so a volume removed at the source is
+    # not excluded and ``--delete`` removes it from the target.
+    shards.append((ROOT_SHARD, _rsync_argv(
+        intent,
+        [*(intent.exclude or []), *(f"/{volume}/" for volume in volumes)],
+        source,
+        target,
+        link_dest,
+        extra,
+    )))
+
+    workers = min(intent.parallel or 1, BACKUP_MAX_SHARDS, len(shards))
+    outputs: Dict[str, str] = {}
+    failed: List[str] = []
+    with phase("exec", "rsync"), ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="rsync-shard"
+    ) as pool:
+        futures = [(volume, pool.submit(run_argv, argv)) for volume, argv in shards]
+        for volume, future in futures:
+            try:
+                outputs[volume] = future.result()
+            except HTTPException as e:
+                failed.append(f"{volume}: {e.detail}")
+
+    totals: Dict[str, int] = {}
+    for volume, out in outputs.items():
+        stats = parse_rsync_stats(out)
+        for key, value in stats.items():
+            totals[key] = totals.get(key, 0) + value
+        if "total_size" in stats and volume != ROOT_SHARD:
+            sizes[volume] = stats["total_size"]
+    if not dry_run:
+        try:
+            _state_store().set(
+                "volume_sizes", intent_name, {v: n for v, n in sizes.items() if v in volumes}
+            )
+        except Exception as e:
+            logging.warning("Failed to store volume sizes: %s", e)
+    if failed:
+        raise HTTPException(
+            500, f"{len(failed)} of {len(shards)} rsync shards failed: " + "; ".join(failed)
+        )
+    stdout = "".join(f"== {volume} ==\n{outputs[volume]}\n" for volume, _ in shards)
+    return stdout, {
+        "shards": len(shards),
+        "workers": workers,
+        "skipped": skipped,
+        "stats": totals,
+    }
+
+
+def _spool_path(intent_name: str, argv: List[str]) -> Optional[str]:
+    """Compressed full-output log location under the state dir (when enabled)."""
+    if not SPOOL_LOGS:
+        return None
+    safe = re.sub(r"[^A-Za-z0-9_.-]", "_", intent_name)
+    stamp = time.strftime("%Y%m%d_%H%M%S")
+    name = f"{safe}-{stamp}-{os.path.basename(argv[0])}-{secrets.token_hex(3)}.log.gz"
+    return os.path.join(STATE_DIR, "logs", name)
+
+
+def _run_command(
+    argv: List[str],
+    intent_name: str,
+    on_output: Optional[Callable[[str], None]] = None,
+) -> CommandResult:
+    """Run a command through the streaming executor with bounded memory."""
+    return run_streaming(
+        argv,
+        on_line=on_output,
+        max_tail_bytes=OUTPUT_TAIL_BYTES,
+        spool_path=_spool_path(intent_name, argv),
+    )
 
 
 def _record_scale_transition(stack: str, service: str, new_replicas: int) -> None:
-    state = _state_read()
-    scale_state = state.setdefault("scale", {})
-    stack_state = scale_state.setdefault(stack, {})
-    svc_state = stack_state.setdefault(service, {})
-    # Shift last desired to previous, update last desired
-    prev = svc_state.get("last_desired")
-    if prev is not None:
-        svc_state["previous_desired"] = prev
-    svc_state["last_desired"] = new_replicas
-    svc_state["updated_at"] = int(time.time())
-    _state_write(state)
+    try:
+        with phase("state"):
+            _state_store().record_replicas(stack, service, new_replicas)
+    except Exception as e:
+        logging.warning("Failed to write state: %s", e)
 
 
 def _get_previous_desired(stack: str, service: str) -> Optional[int]:
-    state = _state_read()
     try:
-        return state["scale"][stack][service].get("previous_desired")
-    except Exception:
+        return _state_store().previous_replicas(stack, service)
+    except Exception as e:
+        logging.warning("Failed to read state: %s", e)
         return None
 
 
+def _image_query(argv: List[str]) -> str:
+    return _run_command(argv, "images").stdout
+
+
+# Resolved compose specs, re-resolved when the compose file or its .env changes
+COMPOSE_SPECS = ComposeSpecCache()
+
+_DOCKER_ENGINE: Optional[DockerEngine] = None
+_DOCKER_ENGINE_LOCK = threading.Lock()
+_docker_engine_ping = (0.0, False)
+
+
+def _docker_engine() -> Optional[DockerEngine]:
+    """Engine API client for ``CHATOPS_DOCKER_BACKEND`` (api/auto), or None for the CLI.
+
+    ``auto`` uses the socket only while it answers ``/_ping`` (re-checked every 30s).
+    """
+    global _DOCKER_ENGINE, _docker_engine_ping
+    if DOCKER_BACKEND not in ("api", "auto"):
+        return None
+    with _DOCKER_ENGINE_LOCK:
+        if _DOCKER_ENGINE is None:
+            _DOCKER_ENGINE = DockerEngine(socket_path(os.getenv("DOCKER_HOST", "")))
+        engine = _DOCKER_ENGINE
+    if DOCKER_BACKEND == "auto":
+        checked, ok = _docker_engine_ping
+        if time.monotonic() - checked > 30:
+            ok = engine.ping()
+            _docker_engine_ping = (time.monotonic(), ok)
+        if not ok:
+            return None
+    return engine
+
+
+def _with_engine(fn: Callable[[Optional[DockerEngine]], Any]) -> Any:
+    """``fn(engine)``, or ``fn(None)`` (CLI) when the socket is off or unreachable."""
+    engine = _docker_engine()
+    if engine is not None:
+        try:
+            return fn(engine)
+        except httpx.TransportError as e:
+            logging.warning("Docker API unreachable, falling back to the CLI: %s", e)
+    return fn(None)
+
+
+def _stack_changes(compose_file: str) -> Optional[List[str]]:
+    """Services that differ from the compose spec, or None if that cannot be determined."""
+    try:
+        with phase("detect"):
+            spec = COMPOSE_SPECS.get(_image_query, compose_file)
+            return _with_engine(
+                lambda engine: changed_services(_image_query, spec, compose_file, engine)
+            )
+    except Exception as e:
+        logging.info("Change detection failed for %s, assuming changed: %s", compose_file, e)
+        return None
+
+
+def _record_prefetch(stack: str, compose_file: str) -> Dict[str, str]:
+    """Store the IDs of the images a prefetch just pulled; returns them."""
+    try:
+        with phase("images"):
+            refs = compose_images(_image_query, compose_file)
+            images = _with_engine(lambda engine: local_image_ids(_image_query, refs, engine))
+        with phase("state"):
+            _state_store().set(
+                "prefetch", f"{stack}:{compose_file}", prefetch_record(compose_file, images)
+            )
+        return images
+    except Exception as e:
+        logging.warning("Failed to record prefetched images for %s: %s", stack, e)
+        return {}
+
+
+def _prefetched(stack: str, compose_file: str) -> bool:
+    """True if a recent prefetch left exactly the images the compose file wants."""
+    try:
+        record = _state_store().get("prefetch", f"{stack}:{compose_file}")
+        if not record:
+            return False
+        with phase("images"):
+            refs = compose_images(_image_query, compose_file)
+            current = _with_engine(lambda engine: local_image_ids(_image_query, refs, engine))
+    except Exception as e:
+        logging.info("Prefetch check failed for %s, pulling: %s", stack, e)
+        return False
+    return prefetch_matches(record, compose_file, current, PREFETCH_MAX_AGE)
+
+
 def _attempt_rollback(intent: Intent, request: Request) -> Optional[str]:
     """Best-effort rollback for supported actions. Returns message or None."""
     try:
@@ -264,7 +826,7 @@ def _attempt_rollback(intent: Intent, request: Request) -> Optional[str]:
                 "--scale",
                 f"{intent.service}={prev}",
             ]
-            res = subprocess.run(argv, check=True, capture_output=True, text=True)
+            res = _run_command(argv, f"rollback_{intent.stack}")
             logging.info(
                 "rollback_scale",
                 extra={
@@ -284,9 +846,18 @@ def _attempt_rollback(intent: Intent, request: Request) -> Optional[str]:
             })
             return "Scaled back to previous desired replicas"
         elif intent.action == "rollout":
+            if _stack_changes(compose_file) == []:
+                audit_log({
+                    "event": "intent_rollback",
+                    "action": "rollout",
+                    "stack": intent.stack,
+                    "ok": True,
+                    "noop": True,
+                })
+                return "Services already match the compose spec (nothing to roll back)"
             # Soft rollback: restart without pulling latest
             argv = ["docker", "compose", "-f", compose_file, "up", "-d"]
-            res = subprocess.run(argv, check=True, capture_output=True, text=True)
+            res = _run_command(argv, f"rollback_{intent.stack}")
             logging.info(
                 "rollback_rollout_restart",
                 extra={"stack": intent.stack, "stdout": res.stdout},
@@ -327,16 +898,50 @@ def _attempt_rollback(intent: Intent, request: Request) -> Optional[str]:
 
 
 app = FastAPI()
-app.state.limiter = limiter
-app.add_exception_handler(
-    RateLimitExceeded, cast(Any, _rate_limit_exceeded_handler)
-)
 
 # Scheduler state
 app.state.scheduler = None
 app.state.schedules_loaded = []
 
 
+def _internal_request() -> Request:
+    """Request for runs chatops starts itself (scheduler, webhooks); it carries no API key."""
+    return Request(scope={"type": "http", "headers": []})
+
+
+def _run_scheduled(intent_name: str, dry_run: bool, prefetch: bool) -> dict:
+    """Run one scheduled intent; a raised error or an ``ok: False`` result is a failure."""
+    try:
+        bundle = load_intent_bundle(intent_name)
+        if prefetch:
+            result = _prefetch_sync(intent_name)
+        elif bundle is not None:
+            # Scheduled runs are trusted like single intents: no per-key RBAC
+            result = _execute_bundle(
+                intent_name, bundle, _internal_request(), dry_run,
+                rollback_on_failure=True, endpoint="schedules_run_now", trusted=True,
+            )
+        else:
+            intent = load_intent(intent_name)
+            req = IntentRequest(name=intent_name, dry_run=dry_run, rollback_on_failure=False)
+            result = _execute_single_intent(req, _internal_request(), intent)
+    except Exception as e:
+        result = {"ok": False, "error": str(e)}
+    if result.get("ok", False):
+        logging.info(
+            "schedule_run",
+            extra={"intent": intent_name, "dry_run": dry_run, "prefetch": prefetch},
+        )
+        return result
+    failed = [r["intent"] for r in result.get("results", []) if not r.get("ok", False)]
+    error = result.get("error") or f"failed: {', '.join(failed)}"
+    logging.error("schedule_run_failed", extra={"intent": intent_name, "error": error})
+    send_discord_alert(
+        f"❌ **SCHEDULED RUN FAILED**: `{intent_name}`: {error}", color=0xFF0000
+    )
+    return result
+
+
 def _scheduler_load_jobs(app: FastAPI) -> None:
     app.state.schedules_loaded = []
     if not (ENABLE_SCHEDULER and HAVE_APSCHEDULER):
@@ -349,7 +954,8 @@ def _scheduler_load_jobs(app: FastAPI) -> None:
     except Exception as e:
         logging.warning("Failed to load schedules file: %s", e)
         return
-    # Data format: {"schedules": [{name, intent, cron, interval_seconds, dry_run, enabled}]}
+    # Data format:
+    # {"schedules": [{name, intent, cron, interval_seconds, dry_run, prefetch, enabled}]}
     schedules = data.get("schedules", [])
     for s in schedules:
         if not s.get("enabled", False):
@@ -357,16 +963,11 @@ def _scheduler_load_jobs(app: FastAPI) -> None:
         name = s.get("name")
         intent_name = s.get("intent")
         dry_run = bool(s.get("dry_run", False))
+        prefetch = bool(s.get("prefetch", False))
         if not name or not intent_name:
             continue
-        def _job_runner(intent_name=intent_name, dry_run=dry_run):  # bind defaults
-            try:
-                intent = load_intent(intent_name)
-                req = IntentRequest(name=intent_name, dry_run=dry_run)
-                _execute_single_intent(req, Request(scope={"type": "http"}), intent)
-                logging.info("schedule_run", extra={"intent": intent_name, "dry_run": dry_run})
-            except Exception as e:
-                logging.error("schedule_run_failed", extra={"intent": intent_name, "error": str(e)})
+        def _job_runner(intent_name=intent_name, dry_run=dry_run, prefetch=prefetch):
+            _run_scheduled(intent_name, dry_run, prefetch)
         if s.get("cron"):
             try:
                 # Lazily import CronTrigger only when needed
@@ -382,6 +983,7 @@ def _scheduler_load_jobs(app: FastAPI) -> None:
                         "type": "cron",
                         "cron": s["cron"],
                         "dry_run": dry_run,
+                        "prefetch": prefetch,
                     }
                 )
             except Exception as e:
@@ -398,10 +1000,32 @@ def _scheduler_load_jobs(app: FastAPI) -> None:
                     "type": "interval",
                     "seconds": seconds,
                     "dry_run": dry_run,
+                    "prefetch": prefetch,
                 }
             )
 
 
+@app.on_event("startup")
+def _startup_audit() -> None:
+    AUDIT_WRITER.start()
+
+
+@app.on_event("shutdown")
+def _shutdown_audit() -> None:
+    AUDIT_WRITER.stop()
+
+
+@app.on_event("shutdown")
+def _shutdown_alerts() -> None:
+    ALERTS.stop()
+
+
+@app.on_event("startup")
+def _startup_intents() -> None:
+    INTENT_REGISTRY.refresh(force=True)
+    logging.info("intents_loaded", extra={"count": len(INTENT_REGISTRY.entries())})
+
+
 @app.on_event("startup")
 def _startup_scheduler() -> None:
     if ENABLE_SCHEDULER and HAVE_APSCHEDULER:
@@ -422,30 +1046,37 @@ def _startup_scheduler() -> None:
 
 
 def load_intent(name: str) -> Intent:
-    path = os.path.join(os.path.dirname(__file__), "intents", f"{name}.yaml")
-    if not os.path.exists(path):
-        raise FileNotFoundError(path)
-    with open(path, "r") as f:
-        raw = yaml.safe_load(f)
+    """Return the validated intent from the in-memory registry."""
+    return INTENT_REGISTRY.get(name).intent
+
+
+def load_intent_bundle(name: str) -> Optional[List[Intent]]:
+    """Return all documents of a multi-document intent file, or None if not a bundle."""
     try:
-        return Intent(**raw)
-    except Exception as e:
-        logging.error("Intent validation failed for %s: %s", name, e)
-        raise
+        entry = INTENT_REGISTRY.get(name)
+    except FileNotFoundError:
+        return None
+    return list(entry.intents) if entry.is_bundle else None
 
 
 def get_api_key(x_api_key: Optional[str] = Header(default=None)) -> str:
     required = os.getenv("CHATOPS_API_KEY")
+    required_hash = os.getenv("CHATOPS_API_KEY_HASH", "").strip()
     # Accept either global API key or RBAC-defined key when RBAC is configured
-    rbac = _rbac_config()
+    rbac = _rbac_table()
     valid = False
-    if rbac:
-        valid = bool(x_api_key) and x_api_key in rbac.get("keys", {})
+    if rbac is not None:
+        valid = rbac.policy(x_api_key) is not None
     if not valid and required:
         valid = bool(x_api_key) and secrets.compare_digest(x_api_key, required)
+    if not valid and required_hash and x_api_key:
+        try:
+            valid = KEY_CACHE.verify(required_hash, x_api_key)
+        except ValueError as e:
+            logging.warning("Invalid CHATOPS_API_KEY_HASH: %s", e)
     if not valid:
         # If neither RBAC nor global key is configured, return 503
-        if not rbac and not required:
+        if rbac is None and not required and not required_hash:
             logging.warning("No API key configured (CHATOPS_API_KEY) and RBAC not set")
             raise HTTPException(503, "Server not configured with API key")
         AUTH_FAILURES.labels(reason="invalid_key").inc()
@@ -454,67 +1085,44 @@ def get_api_key(x_api_key: Optional[str] = Header(default=None)) -> str:
     return x_api_key or ""
 
 
-def _rbac_config() -> Optional[dict]:
-    """Load RBAC configuration from env JSON or file.
-    Caches but refreshes when environment values change (safe for tests).
-    """
-    if not hasattr(_rbac_config, "_cache_data"):
-        _rbac_config._cache_data = None  # type: ignore[attr-defined]
-        _rbac_config._cache_key = ("", "", 0.0)  # type: ignore[attr-defined]
-
-    cfg_json = os.getenv("CHATOPS_RBAC_JSON", "").strip()
-    cfg_file = os.getenv("CHATOPS_RBAC_FILE", "").strip()
-    file_mtime = 0.0
-    if cfg_file and os.path.exists(cfg_file):
-        try:
-            file_mtime = os.path.getmtime(cfg_file)
-        except OSError:
-            file_mtime = 0.0
+def _rbac_table() -> Optional[RBACTable]:
+    """Compiled RBAC from ``CHATOPS_RBAC_JSON`` or ``CHATOPS_RBAC_FILE`` (None when unset)."""
+    return RBAC.get(
+        os.getenv("CHATOPS_RBAC_JSON", "").strip(), os.getenv("CHATOPS_RBAC_FILE", "").strip()
+    )
 
-    key = (cfg_json, cfg_file, file_mtime)
-    # Safe attribute access with type ignore for dynamic attributes
-    if _rbac_config._cache_key == key:  # type: ignore[attr-defined]
-        return _rbac_config._cache_data  # type: ignore[attr-defined]
 
-    data: Optional[dict] = None
-    try:
-        if cfg_json:
-            data = json.loads(cfg_json)
-        elif cfg_file and os.path.exists(cfg_file):
-            with open(cfg_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-    except Exception as e:
-        logging.warning("Failed to load RBAC config: %s", e)
-        data = None
+def _rbac_allowed(api_key: str, endpoint: str, action: Optional[str], stack: Optional[str]) -> bool:
+    table = _rbac_table()
+    if table is None:
+        return True  # No RBAC configured → allow
+    return table.allowed(api_key, endpoint, action, stack)
 
-    _rbac_config._cache_key = key  # type: ignore[attr-defined]
-    _rbac_config._cache_data = data  # type: ignore[attr-defined]
-    return data
 
+def _rate_limit(endpoint: str) -> Callable[[Request], None]:
+    """Dependency enforcing the endpoint's token bucket (runs before auth).
 
-def _rbac_allowed(api_key: str, endpoint: str, action: Optional[str], stack: Optional[str]) -> bool:
-    cfg = _rbac_config()
-    if not cfg:
-        return True  # No RBAC configured → allow
-    keys = cfg.get("keys", {})
-    entry = keys.get(api_key)
-    if not entry:
-        return False
-    # Endpoints
-    allowed_endpoints = entry.get("endpoints")
-    if allowed_endpoints and endpoint not in allowed_endpoints and "*" not in allowed_endpoints:
-        return False
-    # Actions
-    if action is not None:
-        allowed_actions = entry.get("actions")
-        if allowed_actions and action not in allowed_actions and "*" not in allowed_actions:
-            return False
-    # Stacks
-    if stack is not None:
-        allowed_stacks = entry.get("stacks")
-        if allowed_stacks and stack not in allowed_stacks and "*" not in allowed_stacks:
-            return False
-    return True
+    Only a digest lookup or an already cached verification places a caller in
+    its key's bucket; everyone else shares their IP's bucket, so unverified
+    keys never reach the KDF before being rate limited.
+    """
+
+    def dependency(request: Request) -> None:
+        api_key = request.headers.get("x-api-key", "")
+        table = _rbac_table()
+        policy = table.policy(api_key, verify=False) if table is not None else None
+        if policy is not None:
+            caller = "key:" + key_digest(api_key)
+        else:
+            caller = "ip:" + (request.client.host if request.client else "127.0.0.1")
+        rate = limiter.rate_for(endpoint, policy.rate_limit if policy else None)
+        allowed, retry_after = limiter.hit(endpoint, caller, rate)
+        if not allowed:
+            raise HTTPException(
+                429, f"Rate limit exceeded: {rate}", headers=retry_after_header(retry_after)
+            )
+
+    return dependency
 
 
 def get_client_ip(request: Request) -> str:
@@ -527,44 +1135,28 @@ def get_client_ip(request: Request) -> str:
 
 def check_client_allowed(request: Request) -> None:
     allow = os.getenv("CHATOPS_IP_ALLOWLIST", "").strip()
-    if not allow:
+    allow_file = os.getenv("CHATOPS_IP_ALLOWLIST_FILE", "").strip()
+    if not allow and not allow_file:
         return  # no restriction
+    # Compiled once per env value / file version; CIDR, exact IP, host string or "*"
     client = get_client_ip(request)
-    if allow == "*":
+    if client in ALLOWLIST.get(allow, allow_file):
         return
-    # Allow comma-separated tokens; support CIDR, exact IP, or exact host string
-    tokens = [t.strip() for t in allow.split(",") if t.strip()]
-    for t in tokens:
-        try:
-            # CIDR or IP match
-            if "/" in t:
-                net = ipaddress.ip_network(t, strict=False)
-                ip = ipaddress.ip_address(client)
-                if ip in net:
-                    return
-            else:
-                # exact IP literal
-                ip = ipaddress.ip_address(t)
-                if client == str(ip):
-                    return
-        except ValueError:
-            # Not an IP/CIDR → allow exact host string match
-            if client == t:
-                return
     send_discord_alert(
         f"🚨 **IP BLOCKED**: Client `{client}` not in allowlist", color=0xFF0000
     )
     raise HTTPException(403, "Client IP not allowed")
+
+
 @app.get("/healthz")
 def healthz():
     return {"status": "ok"}
 
 
 @app.get("/metrics", response_class=PlainTextResponse)
-@limiter.exempt  # Don't rate-limit metrics scraping
 def metrics():
-    """Prometheus metrics endpoint."""
-    return generate_latest()
+    """Prometheus metrics endpoint (aggregated across workers in multiprocess mode)."""
+    return render_latest()
 
 
 @app.get("/status")
@@ -573,27 +1165,29 @@ def status():
     uptime_seconds = time.time() - SERVICE_START_TIME
     
     # Count loaded intents
-    intents_dir = os.path.join(os.path.dirname(__file__), "intents")
-    intent_count = 0
-    if os.path.exists(intents_dir):
-        intent_count = len([
-            f for f in os.listdir(intents_dir)
-            if f.endswith(".yaml")
-        ])
-    
+    intent_count = len(INTENT_REGISTRY.entries())
+
     return {
         "status": "healthy",
         "version": VERSION,
         "uptime_seconds": int(uptime_seconds),
         "intents_loaded": intent_count,
         "approved_label": APPROVED_LABEL,
-        "rate_limit": "10/minute",
+        "rate_limit": str(limiter.default),
+        "rate_limits": limiter.describe(),
+        "docker_backend": DOCKER_BACKEND,
+        "proxmox_backend": "api" if PROXMOX_URL else "vzdump",
         "features": {
             "dry_run": True,
             "prometheus_metrics": True,
             "discord_alerts": bool(DISCORD_WEBHOOK_URL),
-            "ip_allowlist": bool(os.getenv("CHATOPS_IP_ALLOWLIST")),
+            "ip_allowlist": bool(
+                os.getenv("CHATOPS_IP_ALLOWLIST") or os.getenv("CHATOPS_IP_ALLOWLIST_FILE")
+            ),
         },
+        "jobs": JOBS.stats(),
+        "verify_jobs": VERIFY_JOBS.stats(),
+        "alerts": ALERTS.stats(),
         "environment": {
             "python_version": (
                 f"{sys.version_info.major}.{sys.version_info.minor}"
@@ -607,39 +1201,36 @@ def status():
 @app.get("/intents")
 def list_intents():
     """List all available intents with metadata."""
-    intents_dir = os.path.join(os.path.dirname(__file__), "intents")
-    if not os.path.exists(intents_dir):
-        return {"intents": []}
-    
     intents = []
-    for yaml_file in sorted(os.listdir(intents_dir)):
-        if not yaml_file.endswith(".yaml"):
+    for entry in INTENT_REGISTRY.entries():
+        if entry.error is not None:
+            logging.warning("Failed to load intent %s: %s", entry.name, entry.error)
             continue
-        
-        try:
-            intent_name = yaml_file[:-5]  # Remove .yaml extension
-            intent = load_intent(intent_name)
-            
-            # Extract description from YAML comment if present
-            yaml_path = os.path.join(intents_dir, yaml_file)
-            description = None
-            with open(yaml_path) as f:
-                first_line = f.readline().strip()
-                if first_line.startswith("#"):
-                    description = first_line[1:].strip()
-            
+        if entry.is_bundle:
+            actions = {i.action for i in entry.intents}
             intents.append({
-                "name": intent_name,
-                "action": intent.action,
-                "stack": intent.stack,
-                "service": intent.service,
-                "description": description,
-                "label_required": intent.label_required,
+                "name": entry.name,
+                "action": actions.pop() if len(actions) == 1 else "mixed",
+                "stack": None,
+                "stacks": [i.stack for i in entry.intents],
+                "service": None,
+                "description": entry.description,
+                "label_required": entry.intents[0].label_required,
+                "bundle": True,
+                "size": len(entry.intents),
             })
-        except Exception as e:
-            logging.warning("Failed to load intent %s: %s", yaml_file, e)
             continue
-    
+        intent = entry.intent
+        intents.append({
+            "name": entry.name,
+            "action": intent.action,
+            "stack": intent.stack,
+            "service": intent.service,
+            "description": entry.description,
+            "label_required": intent.label_required,
+            "bundle": False,
+        })
+
     return {"intents": intents, "count": len(intents)}
 
 
@@ -652,13 +1243,31 @@ class ValidateRequest(BaseModel):
 def validate_intent(req: ValidateRequest):
     """Validate intent YAML without executing it."""
     try:
-        # Parse YAML
-        raw = yaml.safe_load(req.yaml_content)
-        if not raw:
+        # Parse YAML (multi-document content is validated as an intent bundle)
+        docs = [d for d in yaml.safe_load_all(req.yaml_content) if d]
+        if not docs:
             return {
                 "valid": False,
                 "errors": ["Empty YAML content"],
             }
+        if len(docs) > 1:
+            reports = [
+                validate_intent(ValidateRequest(yaml_content=yaml.safe_dump(d))) for d in docs
+            ]
+            return {
+                "valid": all(r["valid"] for r in reports),
+                "errors": [
+                    f"document {i}: {e}" for i, r in enumerate(reports) for e in r["errors"]
+                ],
+                "warnings": [
+                    f"document {i}: {w}"
+                    for i, r in enumerate(reports)
+                    for w in r.get("warnings", [])
+                ],
+                "bundle": True,
+                "intents": [r.get("intent") for r in reports],
+            }
+        raw = docs[0]
         
         # Validate against Intent schema
         intent = Intent(**raw)
@@ -727,6 +1336,21 @@ def list_schedules(
     }
 
 
+@app.post("/rbac/reload")
+def reload_rbac(
+    request: Request,
+    _: str = Depends(get_api_key),
+    __: None = Depends(check_client_allowed),
+):
+    """Recompile RBAC now instead of waiting for the next file re-check."""
+    api_key = request.headers.get("x-api-key", "")
+    if not _rbac_allowed(api_key, endpoint="rbac_reload", action=None, stack=None):
+        raise HTTPException(403, "RBAC: rbac reload not permitted")
+    RBAC.invalidate()
+    table = _rbac_table()
+    return {"ok": True, "enabled": table is not None, "keys": len(table) if table else 0}
+
+
 @app.post("/schedules/reload")
 def reload_schedules(
     request: Request,
@@ -745,13 +1369,36 @@ def reload_schedules(
         return {"ok": False, "error": str(e)}
 
 
+async def _run_on_job_pool(name: str, fn: Callable[[Job], Any]) -> Any:
+    """Run ``fn`` on the job pool and await it without holding an HTTP worker thread."""
+    try:
+        job = JOBS.submit(name, fn)
+    except JobQueueFull as e:
+        raise HTTPException(503, "Job queue full, retry later") from e
+    return await asyncio.wrap_future(job.future)
+
+
 @app.post("/schedules/run_now")
-def run_now(
+async def run_now(
     req: RunNowRequest,
     request: Request,
     _: str = Depends(get_api_key),
     __: None = Depends(check_client_allowed),
 ):
+    return await _run_on_job_pool(
+        req.intent, lambda job: _run_now_sync(req, request, job.append_output)
+    )
+
+
+def _run_now_sync(
+    req: RunNowRequest, request: Request, on_output: Optional[Callable[[str], None]] = None
+) -> dict:
+    bundle = load_intent_bundle(req.intent)
+    if bundle is not None:
+        return _execute_bundle(
+            req.intent, bundle, request, req.dry_run,
+            rollback_on_failure=True, endpoint="schedules_run_now", on_output=on_output,
+        )
     intent = load_intent(req.intent)
     api_key = request.headers.get("x-api-key", "")
     if not _rbac_allowed(
@@ -762,66 +1409,153 @@ def run_now(
     ):
         raise HTTPException(403, "RBAC: run_now not permitted for intent")
     result = _execute_single_intent(
-        IntentRequest(name=req.intent, dry_run=req.dry_run), request, intent
+        IntentRequest(name=req.intent, dry_run=req.dry_run, rollback_on_failure=False),
+        request,
+        intent,
+        on_output,
     )
     return result
 
 
-@app.post("/orchestrate")
-@limiter.limit("10/minute")  # Rate limit: 10 requests per minute per IP
-def orchestrate_multi_stack(
+@app.post("/orchestrate", dependencies=[Depends(_rate_limit("orchestrate"))])
+async def orchestrate_multi_stack(
     req: MultiStackRequest,
     request: Request,
     _: str = Depends(get_api_key),
     __: None = Depends(check_client_allowed),
 ):
-    """Execute multiple intents in sequence with dependency resolution."""
-    results = []
-    executed = set()
-    
-    def resolve_and_execute(intent_name: str, depth: int = 0) -> dict:
-        """Recursively execute intent with dependency resolution."""
-        if depth > 10:
-            raise HTTPException(500, f"Dependency depth too deep for {intent_name}")
-        
-        if intent_name in executed:
-            return {"skipped": True, "reason": "already_executed"}
-        
-        # Load intent
+    """Execute intents as a DAG: independent intents run concurrently, each at most once."""
+    return await _run_on_job_pool(
+        ",".join(req.intents), lambda job: _orchestrate_sync(req, request, job.append_output)
+    )
+
+
+def _orchestrate_sync(
+    req: MultiStackRequest,
+    request: Request,
+    on_output: Optional[Callable[[str], None]] = None,
+) -> dict:
+    # Discover every intent reachable through depends_on
+    graph: Dict[str, List[str]] = {}
+    members: Dict[str, List[Intent]] = {}
+    load_errors: Dict[str, str] = {}
+    queue = list(req.intents)
+    while queue:
+        name = queue.pop(0)
+        if name in graph:
+            continue
+        graph[name] = []
         try:
-            intent = load_intent(intent_name)
+            bundle = load_intent_bundle(name)
+            members[name] = bundle if bundle is not None else [load_intent(name)]
         except FileNotFoundError:
-            return {
-                "intent": intent_name,
-                "ok": False,
-                "error": f"Intent not found: {intent_name}",
-            }
-        
-        # Execute dependencies first
-        if intent.depends_on:
-            for dep in intent.depends_on:
-                dep_result = resolve_and_execute(dep, depth + 1)
-                if not dep_result.get("ok", False) and not dep_result.get("skipped", False):
-                    if req.stop_on_failure:
-                        return {
-                            "intent": intent_name,
-                            "ok": False,
-                            "error": f"Dependency failed: {dep}",
-                            "dependency_result": dep_result,
-                        }
-        
-        # Execute this intent
-        executed.add(intent_name)
-        
-        # Create IntentRequest and execute via run_intent logic
-        intent_req = IntentRequest(name=intent_name, dry_run=req.dry_run)
-        
+            load_errors[name] = f"Intent not found: {name}"
+            continue
+        except Exception as e:
+            load_errors[name] = f"Invalid intent {name}: {e}"
+            continue
+        for member in members[name]:
+            for dep in member.depends_on or []:
+                if dep not in graph[name]:
+                    graph[name].append(dep)
+                    queue.append(dep)
+
+    max_parallel = min(req.max_parallel or MAX_PARALLEL, MAX_PARALLEL)
+    # Shared by bundle members too, so nested executors stay within the cap
+    slots = threading.BoundedSemaphore(max_parallel)
+
+    def run_node(name: str) -> dict:
+        if name in load_errors:
+            return {"intent": name, "ok": False, "error": load_errors[name]}
+        bundle = members[name] if len(members[name]) > 1 else None
+        if bundle is not None:
+            result = _execute_bundle(
+                name, bundle, request, req.dry_run,
+                req.rollback_on_failure, endpoint="orchestrate", on_output=on_output,
+                max_parallel=max_parallel, slots=slots,
+            )
+            return {"intent": name, **result}
+        return _run_orchestrated_intent(
+            name, members[name][0], request, req.dry_run,
+            req.rollback_on_failure, endpoint="orchestrate", on_output=on_output, slots=slots,
+        )
+
+    executor = DagExecutor(
+        max_parallel=max_parallel,
+        on_failure="stop" if req.stop_on_failure else "continue",
+    )
+    try:
+        node_results = executor.run(
+            graph, run_node, keys=lambda n: {m.stack for m in members.get(n, [])}
+        )
+    except CycleError as e:
+        raise HTTPException(400, str(e)) from e
+
+    results = []
+    for intent_name in req.intents:
+        result = {"intent": intent_name, **node_results[intent_name]}
+        dep = result.pop("failed_dependency", None)
+        if dep is not None:
+            result["dependency_result"] = node_results[dep]
+        results.append(result)
+
+    failed = [r["intent"] for r in results if not r.get("ok", False)]
+    if failed and req.stop_on_failure:
+        send_discord_alert(
+            f"❌ **ORCHESTRATION FAILED**: Stopped at intent `{failed[0]}`",
+            color=0xFF0000,
+        )
+
+    success_count = sum(1 for r in results if r.get("ok", False))
+    total_count = len(results)
+    
+    if success_count == total_count:
+        send_discord_alert(
+            f"✅ **ORCHESTRATION SUCCESS**: {success_count}/{total_count} intents completed",
+            color=0x00FF00,
+        )
+    
+    return {
+        "ok": success_count == total_count,
+        "results": results,
+        "summary": {
+            "total": total_count,
+            "success": success_count,
+            "failed": total_count - success_count,
+        },
+    }
+
+
+def _run_orchestrated_intent(
+    intent_name: str,
+    intent: Intent,
+    request: Request,
+    dry_run: bool,
+    rollback_on_failure: bool,
+    endpoint: str,
+    on_output: Optional[Callable[[str], None]] = None,
+    prefetch: bool = False,
+    force: bool = False,
+    trusted: bool = False,
+    slots: Optional[threading.Semaphore] = None,
+) -> dict:
+    """Authorize and execute one intent, converting failures into a result entry.
+
+    ``trusted`` runs (started by chatops itself) skip the per-key RBAC check.
+    ``slots`` caps concurrent executions across nested DAGs.
+    Executed entries carry the document's own phase ``timings``.
+    """
+    intent_req = IntentRequest(
+        name=intent_name, dry_run=dry_run, rollback_on_failure=rollback_on_failure,
+        prefetch=prefetch, force=force,
+    )
+    # Runs on a DAG worker thread, so this is the document's own timer
+    with phase_timing(intent.action) as timer:
         try:
-            # Reuse execution logic
             api_key = request.headers.get("x-api-key", "")
-            if not _rbac_allowed(
+            if not trusted and not _rbac_allowed(
                 api_key,
-                endpoint="orchestrate",
+                endpoint=endpoint,
                 action=intent.action,
                 stack=intent.stack,
             ):
@@ -830,60 +1564,110 @@ def orchestrate_multi_stack(
                     "ok": False,
                     "error": "RBAC: action not permitted",
                 }
-            result = _execute_single_intent(intent_req, request, intent)
+            with slots if slots is not None else nullcontext():
+                result = _execute_single_intent(intent_req, request, intent, on_output)
             return {
                 "intent": intent_name,
                 "ok": result.get("ok", False),
                 "action": intent.action,
                 "stack": intent.stack,
-                "dry_run": req.dry_run,
+                "dry_run": dry_run,
                 "stdout": result.get("stdout", ""),
+                **{k: result[k] for k in ("pull_skipped", "noop") if k in result},
+                "timings": timer.breakdown(),
             }
         except Exception as e:
-            rollback_msg = None
-            if req.rollback_on_failure and not req.dry_run:
-                rollback_msg = _attempt_rollback(intent, request)
             return {
                 "intent": intent_name,
                 "ok": False,
                 "error": str(e),
-                "rollback": rollback_msg,
+                "rollback": getattr(e, ROLLBACK_ATTR, None),
+                "timings": timer.breakdown(),
             }
-    
-    # Execute all requested intents
-    for intent_name in req.intents:
-        result = resolve_and_execute(intent_name)
-        results.append(result)
-        
-        if not result.get("ok", False) and req.stop_on_failure:
-            send_discord_alert(
-                f"❌ **ORCHESTRATION FAILED**: Stopped at intent `{intent_name}`",
-                color=0xFF0000,
-            )
-            break
-    
-    success_count = sum(1 for r in results if r.get("ok", False))
-    total_count = len(results)
-    
-    if success_count == total_count:
-        send_discord_alert(
-            f"✅ **ORCHESTRATION SUCCESS**: {success_count}/{total_count} intents completed",
-            color=0x00FF00,
-        )
-    
+
+
+def _execute_bundle(
+    name: str,
+    intents: List[Intent],
+    request: Request,
+    dry_run: bool,
+    rollback_on_failure: bool,
+    endpoint: str,
+    on_output: Optional[Callable[[str], None]] = None,
+    prefetch: bool = False,
+    force: bool = False,
+    trusted: bool = False,
+    max_parallel: Optional[int] = None,
+    slots: Optional[threading.Semaphore] = None,
+) -> dict:
+    """Run a multi-document intent file as one unit.
+
+    Documents targeting different stacks run concurrently (up to ``max_parallel``,
+    default MAX_PARALLEL, sharing the caller's ``slots`` when nested);
+    documents on the same stack keep file order and stop after a failure.
+    """
+    graph: Dict[str, List[str]] = {}
+    stacks: Dict[str, str] = {}
+    last_on_stack: Dict[str, str] = {}
+    for i, intent in enumerate(intents):
+        node = f"{name}[{i}]"
+        prev = last_on_stack.get(intent.stack)
+        graph[node] = [prev] if prev else []
+        stacks[node] = intent.stack
+        last_on_stack[intent.stack] = node
+    by_node = {f"{name}[{i}]": intent for i, intent in enumerate(intents)}
+
+    executor = DagExecutor(max_parallel or MAX_PARALLEL, on_failure="block_dependents")
+    node_results = executor.run(
+        graph,
+        lambda node: _run_orchestrated_intent(
+            node, by_node[node], request, dry_run, rollback_on_failure, endpoint, on_output,
+            prefetch, force, trusted, slots,
+        ),
+        keys=lambda node: [stacks[node]],
+    )
+    final: List[dict] = []
+    for node in graph:
+        res = node_results[node]
+        res.pop("failed_dependency", None)
+        final.append({"intent": node, **res})
+    success_count = sum(1 for r in final if r.get("ok", False))
     return {
-        "ok": success_count == total_count,
-        "results": results,
+        "ok": success_count == len(final),
+        "bundle": name,
+        "dry_run": dry_run,
+        "results": final,
         "summary": {
-            "total": total_count,
+            "total": len(final),
             "success": success_count,
-            "failed": total_count - success_count,
+            "failed": len(final) - success_count,
         },
     }
 
 
-def _execute_single_intent(req: IntentRequest, request: Request, intent: Intent) -> dict:
-    """Extracted single intent execution logic."""
+def _execute_single_intent(
+    req: IntentRequest,
+    request: Request,
+    intent: Intent,
+    on_output: Optional[Callable[[str], None]] = None,
+) -> dict:
+    """Extracted single intent execution logic.
+
+    ``on_output`` receives command output as each step finishes (used by jobs).
+    Phase timings go to the caller's timer (``/run``) or a timer of its own.
+    """
+    with phase_timing(intent.action) as timer:
+        timer.action = intent.action
+        return _execute_single_intent_timed(req, request, intent, timer, on_output)
+
+
+def _execute_single_intent_timed(
+    req: IntentRequest,
+    request: Request,
+    intent: Intent,
+    timer: PhaseTimer,
+    on_output: Optional[Callable[[str], None]] = None,
+) -> dict:
     # Track request
     INTENT_REQUESTS.labels(
         intent_name=req.name,
@@ -918,7 +1702,68 @@ def _execute_single_intent(req: IntentRequest, request: Request, intent: Intent)
         })
         raise HTTPException(403, "Label requirement mismatch")
 
+    if req.dry_run:
+        return _perform_intent(req, request, intent, on_output)
+
+    compose_file = intent.compose or f"/opt/stacks/{intent.stack}/docker-compose.yml"
+    lock_key = f"{intent.stack}:{compose_file}"
+    dedupe_key = (
+        req.name, intent.action, intent.stack, intent.service, intent.replicas,
+        req.prefetch, req.force,
+    )
+    lock_wait: Dict[str, float] = {}
+
+    def locked() -> dict:
+        lock_wait["seconds"] = time.perf_counter() - requested
+        timer.add("lock_wait", lock_wait["seconds"])
+        try:
+            return _perform_intent(req, request, intent, on_output)
+        except Exception as e:
+            if req.rollback_on_failure and not req.prefetch:
+                # Still holding the stack lock, so no queued run can land before
+                # the rollback; joined callers get this exception and its message.
+                with phase("rollback"):
+                    setattr(e, ROLLBACK_ATTR, _attempt_rollback(intent, request))
+            raise
+
+    requested = time.perf_counter()
+    result, info = STACK_LOCKS.run(lock_key, dedupe_key, locked)
+    if "seconds" not in lock_wait:
+        # Joined an identical queued run: the whole wait was for its result
+        timer.add("lock_wait", time.perf_counter() - requested)
+    if info["coalesced"]:
+        logging.info(
+            "intent_coalesced",
+            extra={"intent": req.name, "stack": intent.stack, "lock": lock_key},
+        )
+        audit_log({
+            "event": "intent_coalesced",
+            "intent": req.name,
+            "action": intent.action,
+            "stack": intent.stack,
+        })
+        result = {**result, "coalesced": True}
+    return result
+
+
+def _perform_intent(
+    req: IntentRequest,
+    request: Request,
+    intent: Intent,
+    on_output: Optional[Callable[[str], None]] = None,
+) -> dict:
+    """Run the commands for an intent (caller holds the stack lock unless dry-run)."""
     compose_file = intent.compose or f"/opt/stacks/{intent.stack}/docker-compose.yml"
+    output_meta: Dict[str, Any] = {"truncated": False, "log_files": []}
+    if (req.prefetch or req.force) and intent.action != "rollout":
+        raise HTTPException(400, "prefetch/force are only supported for rollout intents")
+
+    def with_output_meta(result: dict) -> dict:
+        if output_meta["truncated"]:
+            result["stdout_truncated"] = True
+        if output_meta["log_files"]:
+            result["log_files"] = output_meta["log_files"]
+        return result
 
     def run_argv(argv: List[str]):
         client_host = request.client.host if request.client else None
@@ -937,7 +1782,10 @@ def _execute_single_intent(req: IntentRequest, request: Request, intent: Intent)
                     "dry_run": True,
                 },
             )
-            return f"[DRY-RUN] Would execute: {' '.join(argv)}"
+            preview = f"[DRY-RUN] Would execute: {' '.join(argv)}"
+            if on_output:
+                on_output(preview)
+            return preview
         
         logging.info(
             "executing",
@@ -952,8 +1800,12 @@ def _execute_single_intent(req: IntentRequest, request: Request, intent: Intent)
             },
         )
         try:
-            with INTENT_DURATION.labels(intent_name=req.name, action=intent.action).time():
-                res = subprocess.run(argv, check=True, capture_output=True, text=True)
+            with INTENT_DURATION.labels(intent_name=req.name, action=intent.action).time(), \
+                    phase("exec", command_verb(argv)):
+                res = _run_command(argv, req.name, on_output)
+            output_meta["truncated"] = output_meta["truncated"] or res.truncated
+            if res.log_file:
+                output_meta["log_files"].append(res.log_file)
             return res.stdout
         except subprocess.CalledProcessError as e:
             INTENT_FAILURES.labels(
@@ -1006,13 +1858,13 @@ def _execute_single_intent(req: IntentRequest, request: Request, intent: Intent)
             f"{intent.service}={intent.replicas}",
         ]
         out = run_argv(argv)
-        result = {
+        result = with_output_meta({
             "ok": True,
             "dry_run": req.dry_run,
             "stdout": out,
             "intent": req.name,
             "action": intent.action,
-        }
+        })
         audit_log({
             "event": "intent_succeeded",
             "intent": req.name,
@@ -1024,57 +1876,177 @@ def _execute_single_intent(req: IntentRequest, request: Request, intent: Intent)
         })
         return result
     elif intent.action == "rollout":
-        out1 = run_argv(["docker", "compose", "-f", compose_file, "pull"])
-        out2 = run_argv(["docker", "compose", "-f", compose_file, "up", "-d"])
-        result = {
+        pull_argv = ["docker", "compose", "-f", compose_file, "pull"]
+        if req.prefetch:
+            out = run_argv(pull_argv)
+            images = {} if req.dry_run else _record_prefetch(intent.stack, compose_file)
+            result = with_output_meta({
+                "ok": True,
+                "dry_run": req.dry_run,
+                "stdout": out,
+                "intent": req.name,
+                "action": intent.action,
+                "prefetch": True,
+                "images": images,
+            })
+            audit_log({
+                "event": "intent_prefetched",
+                "intent": req.name,
+                "action": intent.action,
+                "stack": intent.stack,
+                "images": len(images),
+                "dry_run": req.dry_run,
+            })
+            return result
+        # A fresh prefetch already pulled these exact images: only swap containers
+        pull_skipped = not req.dry_run and _prefetched(intent.stack, compose_file)
+        if pull_skipped:
+            out1 = "Images already prefetched, skipping pull\n"
+            if on_output:
+                on_output(out1)
+        else:
+            out1 = run_argv(pull_argv)
+        # Running containers already match the (just pulled) spec: leave them alone
+        changed = None if req.dry_run or req.force else _stack_changes(compose_file)
+        noop = changed == []
+        if noop:
+            out2 = "All services match the compose spec, skipping up\n"
+            if on_output:
+                on_output(out2)
+        else:
+            out2 = run_argv(["docker", "compose", "-f", compose_file, "up", "-d"])
+        result = with_output_meta({
             "ok": True,
             "dry_run": req.dry_run,
             "stdout": out1 + out2,
             "intent": req.name,
             "action": intent.action,
-        }
+            "pull_skipped": pull_skipped,
+            "noop": noop,
+        })
+        if changed:
+            result["changed_services"] = changed
         audit_log({
             "event": "intent_succeeded",
             "intent": req.name,
             "action": intent.action,
             "stack": intent.stack,
+            "pull_skipped": pull_skipped,
+            "noop": noop,
             "dry_run": req.dry_run,
         })
         return result
     elif intent.action == "backup":
         # Backup action handler - supports multiple backup types
         backup_stdout = ""
+        backup_meta: Dict[str, Any] = {}
         
         if intent.backup_type == "docker_volumes":
             # Rsync-based Docker volumes backup
             if not intent.source or not intent.destination:
                 raise HTTPException(400, "docker_volumes backup requires source and destination")
             
-            argv = ["rsync", "-av"]
-            if intent.exclude:
-                for pattern in intent.exclude:
-                    argv.extend(["--exclude", pattern])
-            if intent.options:
-                argv.extend(intent.options)
-            argv.extend([intent.source + "/", intent.destination + "/"])
-            
-            backup_stdout = run_argv(argv)
-            
+            name: Optional[str] = None
+            previous: Optional[str] = None
+            target = intent.destination
+            if intent.snapshot:
+                # Point-in-time snapshot: unchanged files are hard links into the
+                # previous snapshot, so each run only stores what changed
+                if is_remote(intent.destination):
+                    raise HTTPException(
+                        400, "snapshot backups need a local or mounted destination"
+                    )
+                name = snapshot_name()
+                previous = previous_snapshot(
+                    intent.destination,
+                    [
+                        b["path"]
+                        for b in _catalog().list(intent=req.name, limit=5)
+                        if b["meta"].get("snapshot")
+                    ],
+                )
+                target = partial_path(intent.destination, name)
+            sharded = bool(intent.parallel and intent.parallel > 1)
+            if not req.dry_run and (name or sharded) and not is_remote(target):
+                # Shards write one level below the target, which rsync won't create
+                os.makedirs(target if sharded else intent.destination, exist_ok=True)
+
+            try:
+                if sharded:
+                    backup_stdout, shard_meta = _sharded_rsync(
+                        req.name, intent, run_argv, intent.source, target, previous, req.dry_run
+                    )
+                    backup_meta.update(shard_meta)
+                else:
+                    argv = _rsync_argv(
+                        intent, intent.exclude or [], intent.source, target, previous
+                    )
+                    backup_stdout = run_argv(argv)
+            except BaseException:
+                if name:
+                    discard_partial(intent.destination, name)
+                raise
+
+            if not req.dry_run:
+                if name:
+                    target = finish_snapshot(intent.destination, name)
+                    backup_meta.update({
+                        "snapshot": target,
+                        "link_dest": previous,
+                        "backup_id": _record_backup(
+                            req, intent, target, meta={"snapshot": True, "link_dest": previous}
+                        ),
+                    })
+                else:
+                    backup_meta["backup_id"] = _record_backup(
+                        req, intent, intent.destination, meta={"mirror": True}
+                    )
+                if intent.verify and not is_remote(target):
+                    source, sample = intent.source, (
+                        None if intent.verify == "full" else VERIFY_SAMPLE_FILES
+                    )
+                    backup_meta["verify_job"] = _queue_verify(
+                        req.name,
+                        backup_meta["backup_id"],
+                        lambda: verify_tree(source, target, sample),
+                    )
+
         elif intent.backup_type == "vm_proxmox":
             # Proxmox VM backup using vzdump
-            if not intent.vm_id:
-                raise HTTPException(400, "vm_proxmox backup requires vm_id")
-            
-            argv = ["vzdump", str(intent.vm_id)]
-            if intent.storage:
-                argv.extend(["--storage", intent.storage])
-            if intent.compress:
-                argv.extend(["--compress", intent.compress])
-            if intent.notes:
-                argv.extend(["--notes-template", intent.notes])
-            
-            backup_stdout = run_argv(argv)
-            
+            if not (intent.vm_id or intent.vm_ids or intent.pool):
+                raise HTTPException(400, "vm_proxmox backup requires vm_id, vm_ids or pool")
+            if PROXMOX_URL:
+                backup_stdout, backup_meta = _proxmox_backup(req, intent, on_output)
+            elif intent.vm_ids or intent.pool:
+                raise HTTPException(
+                    400, "vm_ids and pool need the Proxmox API backend (CHATOPS_PROXMOX_URL)"
+                )
+            else:
+                argv = ["vzdump", str(intent.vm_id)]
+                if intent.storage:
+                    argv.extend(["--storage", intent.storage])
+                if intent.compress:
+                    argv.extend(["--compress", intent.compress])
+                if intent.notes:
+                    argv.extend(["--notes-template", intent.notes])
+                if _retention_policy(intent):
+                    argv.extend(["--prune-backups", VZDUMP_KEEP_ALL])
+
+                backup_stdout = run_argv(argv)
+                if not req.dry_run:
+                    m = VZDUMP_ARCHIVE.search(backup_stdout)
+                    archive = m.group(1) if m else f"vzdump:{intent.vm_id}"
+                    backup_meta["backup_id"] = _record_backup(
+                        req,
+                        intent,
+                        archive,
+                        meta={"vm_id": intent.vm_id, "storage": intent.storage},
+                    )
+                    if intent.verify and os.path.isfile(archive):
+                        backup_meta["verify_job"] = _queue_verify(
+                            req.name, backup_meta["backup_id"], lambda: verify_vzdump(archive)
+                        )
+
         elif intent.database_type == "plex":
             # Plex database backup - copy from container
             if not intent.source_container or not intent.source_path or not intent.destination:
@@ -1085,53 +2057,94 @@ def _execute_single_intent(req: IntentRequest, request: Request, intent: Intent)
             
             # Ensure destination directory exists
             os.makedirs(intent.destination, exist_ok=True)
-            
+            if not req.dry_run:
+                try:
+                    # Bring archives written before the catalog under retention
+                    # (before this run's archive exists, so it is recorded once)
+                    _catalog().import_existing(
+                        req.name, "plex", intent.destination, "plex_db_backup_", intent.stack
+                    )
+                except Exception as e:
+                    logging.warning("Failed to import existing plex backups: %s", e)
+
             # Create backup with timestamp
             timestamp = time.strftime("%Y%m%d_%H%M%S")
-            backup_name = f"plex_db_backup_{timestamp}.tar.gz"
+            try:
+                compression = pick_compression(intent.compress)
+            except ValueError as e:
+                raise HTTPException(500, str(e)) from e
+            backup_name = f"plex_db_backup_{timestamp}{BACKUP_SUFFIXES[compression]}"
             backup_path = os.path.join(intent.destination, backup_name)
-            
-            # Use docker cp to extract from container and tar
-            with tempfile.TemporaryDirectory() as tmpdir:
-                # Copy database directory from container
-                argv1 = ["docker", "cp", f"{intent.source_container}:{intent.source_path}", tmpdir]
-                run_argv(argv1)
-                
-                # Create compressed tar archive
-                argv2 = ["tar", "-czf", backup_path, "-C", tmpdir, "."]
-                backup_stdout = run_argv(argv2)
-                
-                # Clean up old backups if retention_days specified
-                if intent.retention_days:
-                    cutoff_time = time.time() - (intent.retention_days * 86400)
-                    try:
-                        for f in os.listdir(intent.destination):
-                            file_path = os.path.join(intent.destination, f)
-                            if os.path.isfile(file_path) and f.startswith("plex_db_backup_"):
-                                if os.path.getmtime(file_path) < cutoff_time:
-                                    os.remove(file_path)
-                                    logging.info("Deleted old backup: %s", f)
-                    except Exception as e:
-                        logging.warning("Failed to clean up old backups: %s", e)
-            
+
+            # Stream the container's tar archive through the compressor into the
+            # destination: no temp copy of the database, one write to disk
+            argv = ["docker", "cp", f"{intent.source_container}:{intent.source_path}", "-"]
+            if req.dry_run:
+                backup_stdout = run_argv(argv) + f" | {compression} > {backup_path}"
+            else:
+                container, path = intent.source_container, intent.source_path
+
+                def stream_backup(engine: Optional[DockerEngine]) -> dict:
+                    source = (
+                        engine.get_archive(container, path)
+                        if engine is not None
+                        else stream_stdout(argv)
+                    )
+                    return write_compressed(
+                        source, backup_path, compression, threads=BACKUP_THREADS
+                    )
+
+                try:
+                    with phase("exec", "cp"):
+                        info = _with_engine(stream_backup)
+                except subprocess.CalledProcessError as e:
+                    raise HTTPException(500, f"Command failed: {e.stderr}") from e
+                except DockerAPIError as e:
+                    raise HTTPException(500, f"Docker API error: {e}") from e
+                write_checksum_file(backup_path, info["sha256"])
+                backup_meta = {
+                    "backup_path": backup_path,
+                    "sha256": info["sha256"],
+                    "bytes": info["bytes_out"],
+                    "compression": compression,
+                    "backup_id": _record_backup(
+                        req, intent, backup_path, size=info["bytes_out"], sha256=info["sha256"]
+                    ),
+                }
+                if intent.verify:
+                    digest = info["sha256"]
+                    backup_meta["verify_job"] = _queue_verify(
+                        req.name,
+                        backup_meta["backup_id"],
+                        lambda: verify_archive(backup_path, digest),
+                    )
+                backup_stdout = (
+                    f"Wrote {backup_path} ({info['bytes_out']} bytes, {compression}, "
+                    f"sha256 {info['sha256']})\n"
+                )
+                if on_output:
+                    on_output(backup_stdout)
+
         else:
             unknown_type = intent.backup_type or intent.database_type
             raise HTTPException(400, f"Unknown backup type: {unknown_type}")
         
-        result = {
+        result = with_output_meta({
             "ok": True,
             "dry_run": req.dry_run,
             "stdout": backup_stdout,
             "intent": req.name,
             "action": intent.action,
             "backup_type": intent.backup_type or intent.database_type,
-        }
+            **backup_meta,
+        })
         audit_log({
             "event": "intent_succeeded",
             "intent": req.name,
             "action": intent.action,
             "stack": intent.stack,
             "backup_type": intent.backup_type or intent.database_type,
+            "sha256": backup_meta.get("sha256"),
             "dry_run": req.dry_run,
         })
         return result
@@ -1139,23 +2152,78 @@ def _execute_single_intent(req: IntentRequest, request: Request, intent: Intent)
         raise HTTPException(400, "Unsupported action")
 
 
-@app.post("/run")
-@limiter.limit("10/minute")  # Rate limit: 10 requests per minute per IP
-def run_intent(
+@app.post("/run", dependencies=[Depends(_rate_limit("run"))])
+async def run_intent(
     req: IntentRequest,
     request: Request,
     _: str = Depends(get_api_key),
     __: None = Depends(check_client_allowed),
 ):
-    """Execute a single intent."""
+    """Execute a single intent (or every document of an intent bundle).
+
+    The caller waits for the result, but execution happens on the job pool so
+    long commands never occupy the HTTP threadpool.
+    """
+    return await _run_on_job_pool(
+        req.name, lambda job: _run_intent_sync(req, request, "run", job.append_output)
+    )
+
+
+def _run_intent_sync(
+    req: IntentRequest,
+    request: Request,
+    endpoint: str,
+    on_output: Optional[Callable[[str], None]] = None,
+) -> dict:
+    with phase_timing() as timer:
+        result = _run_intent_timed(req, request, endpoint, timer, on_output)
+        return {**result, "timings": timer.breakdown()}
+
+
+def _run_intent_timed(
+    req: IntentRequest,
+    request: Request,
+    endpoint: str,
+    timer: PhaseTimer,
+    on_output: Optional[Callable[[str], None]] = None,
+) -> dict:
+    started = time.perf_counter()
+    bundle = load_intent_bundle(req.name)
+    if bundle is not None:
+        timer.action = "bundle"
+        timer.add("load", time.perf_counter() - started)
+        result = _execute_bundle(
+            req.name, bundle, request, req.dry_run,
+            req.rollback_on_failure and not req.prefetch,
+            endpoint=endpoint, on_output=on_output, prefetch=req.prefetch, force=req.force,
+        )
+        summary = result["summary"]
+        if result["ok"]:
+            send_discord_alert(
+                f"✅ **BUNDLE SUCCESS**: `{req.name}` "
+                f"({summary['success']}/{summary['total']} intents)",
+                color=0x00FF00,
+            )
+        else:
+            send_discord_alert(
+                f"❌ **BUNDLE FAILED**: `{req.name}` ({summary['failed']} failed)",
+                color=0xFF0000,
+            )
+        return result
     intent = load_intent(req.name)
+    timer.action = intent.action
+    timer.add("load", time.perf_counter() - started)
     # RBAC enforcement (optional)
     # Accept standard header casing; Starlette lowercases header keys
     api_key = request.headers.get("x-api-key", "")
-    if not _rbac_allowed(api_key, endpoint="run", action=intent.action, stack=intent.stack):
+    with phase("authz"):
+        allowed = _rbac_allowed(
+            api_key, endpoint=endpoint, action=intent.action, stack=intent.stack
+        )
+    if not allowed:
         raise HTTPException(403, "RBAC: action not permitted")
     try:
-        result = _execute_single_intent(req, request, intent)
+        result = _execute_single_intent(req, request, intent, on_output)
         send_discord_alert(
             f"✅ **SUCCESS**: `{intent.action}` on stack `{intent.stack}` "
             f"(intent: `{req.name}`)",
@@ -1163,9 +2231,6 @@ def run_intent(
         )
         return result
     except Exception as e:
-        rollback_msg = None
-        if req.rollback_on_failure and not req.dry_run:
-            rollback_msg = _attempt_rollback(intent, request)
         audit_log({
             "event": "intent_exception",
             "intent": req.name,
@@ -1174,7 +2239,7 @@ def run_intent(
             "service": intent.service,
             "dry_run": req.dry_run,
             "error": str(e),
-            "rollback": rollback_msg,
+            "rollback": getattr(e, ROLLBACK_ATTR, None),
         })
         if not isinstance(e, HTTPException):
             send_discord_alert(
@@ -1186,6 +2251,315 @@ def run_intent(
         raise HTTPException(500, str(e)) from e
 
 
+def _require_job(job_id: str, request: Request):
+    api_key = request.headers.get("x-api-key", "")
+    if not _rbac_allowed(api_key, endpoint="jobs", action=None, stack=None):
+        raise HTTPException(403, "RBAC: jobs not permitted")
+    job = JOBS.get(job_id) or VERIFY_JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Job not found")
+    return job
+
+
+@app.post("/jobs", status_code=202, dependencies=[Depends(_rate_limit("jobs"))])
+def submit_job(
+    req: IntentRequest,
+    request: Request,
+    _: str = Depends(get_api_key),
+    __: None = Depends(check_client_allowed),
+):
+    """Queue an intent on the job pool and return its id immediately."""
+    try:
+        bundle = load_intent_bundle(req.name)
+        targets = bundle if bundle is not None else [load_intent(req.name)]
+    except FileNotFoundError as e:
+        raise HTTPException(404, f"Intent not found: {req.name}") from e
+    api_key = request.headers.get("x-api-key", "")
+    for intent in targets:
+        if not _rbac_allowed(api_key, endpoint="jobs", action=intent.action, stack=intent.stack):
+            raise HTTPException(403, "RBAC: action not permitted")
+    try:
+        job = JOBS.submit(
+            req.name, lambda job: _run_intent_sync(req, request, "jobs", job.append_output)
+        )
+    except JobQueueFull as e:
+        raise HTTPException(503, "Job queue full, retry later") from e
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events",
+    }
+
+
+@app.get("/jobs")
+def list_jobs(
+    request: Request,
+    _: str = Depends(get_api_key),
+    __: None = Depends(check_client_allowed),
+):
+    api_key = request.headers.get("x-api-key", "")
+    if not _rbac_allowed(api_key, endpoint="jobs", action=None, stack=None):
+        raise HTTPException(403, "RBAC: jobs not permitted")
+    recent = sorted([*JOBS.recent(), *VERIFY_JOBS.recent()], key=lambda j: j.created_at)
+    jobs = [{k: v for k, v in j.to_dict().items() if k != "result"} for j in recent]
+    return {"jobs": jobs, "count": len(jobs), **JOBS.stats(), "verify": VERIFY_JOBS.stats()}
+
+
+@app.get("/jobs/{job_id}")
+def get_job(
+    job_id: str,
+    request: Request,
+    since: int = 0,
+    _: str = Depends(get_api_key),
+    __: None = Depends(check_client_allowed),
+):
+    """Job status, result and output lines after ``since``."""
+    job = _require_job(job_id, request)
+    lines, cursor = job.output_since(since)
+    return {**job.to_dict(), "output": lines, "cursor": cursor}
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(
+    job_id: str,
+    request: Request,
+    since: int = 0,
+    _: str = Depends(get_api_key),
+    __: None = Depends(check_client_allowed),
+):
+    """Server-Sent Events: one ``output`` event per line, then a final ``status`` event."""
+    job = _require_job(job_id, request)
+
+    async def stream():
+        cursor = since
+        while True:
+            done = job.done
+            lines, cursor = job.output_since(cursor)
+            for n, line in enumerate(lines, start=cursor - len(lines) + 1):
+                yield f"event: output\nid: {n}\ndata: {line}\n\n"
+            if done:
+                yield f"event: status\ndata: {json.dumps(job.to_dict(), default=str)}\n\n"
+                return
+            if await request.is_disconnected():
+                return
+            await asyncio.sleep(0.25)
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+@app.get("/state/scale/{stack}/{service}")
+def scale_history(
+    stack: str,
+    service: str,
+    request: Request,
+    limit: int = 20,
+    _: str = Depends(get_api_key),
+    __: None = Depends(check_client_allowed),
+):
+    """Recorded desired-replica changes for a service, newest first."""
+    api_key = request.headers.get("x-api-key", "")
+    if not _rbac_allowed(api_key, endpoint="state", action=None, stack=stack):
+        raise HTTPException(403, "RBAC: state not permitted")
+    history = _state_store().replica_history(stack, service, limit=max(1, min(limit, 1000)))
+    return {
+        "stack": stack,
+        "service": service,
+        "previous_desired": _get_previous_desired(stack, service),
+        "history": history,
+    }
+
+
+@app.get("/backups")
+def list_backups(
+    request: Request,
+    intent: Optional[str] = None,
+    backup_type: Optional[str] = None,
+    limit: int = 100,
+    _: str = Depends(get_api_key),
+    __: None = Depends(check_client_allowed),
+):
+    """Cataloged backup artifacts, newest first."""
+    api_key = request.headers.get("x-api-key", "")
+    if not _rbac_allowed(api_key, endpoint="backups", action=None, stack=None):
+        raise HTTPException(403, "RBAC: backups not permitted")
+    return {
+        "backups": _catalog().list(
+            intent=intent, backup_type=backup_type, limit=max(1, min(limit, 1000))
+        )
+    }
+
+
+@app.get("/backups/{backup_id}")
+def get_backup(
+    backup_id: int,
+    request: Request,
+    _: str = Depends(get_api_key),
+    __: None = Depends(check_client_allowed),
+):
+    """One cataloged backup with its verification result and file manifest."""
+    api_key = request.headers.get("x-api-key", "")
+    if not _rbac_allowed(api_key, endpoint="backups", action=None, stack=None):
+        raise HTTPException(403, "RBAC: backups not permitted")
+    catalog = _catalog()
+    entry = catalog.get(backup_id)
+    if entry is None:
+        raise HTTPException(404, "Backup not found")
+    manifest = catalog.manifest(backup_id)
+    return {
+        **entry,
+        "manifest": [
+            {"path": path, "size": size, "sha256": digest}
+            for path, (size, digest) in manifest.items()
+        ],
+    }
+
+
+@app.post("/backups/prune")
+def prune_backups(
+    request: Request,
+    intent: Optional[str] = None,
+    _: str = Depends(get_api_key),
+    __: None = Depends(check_client_allowed),
+):
+    """Apply retention now to one intent's backups, or to every cataloged intent."""
+    api_key = request.headers.get("x-api-key", "")
+    if not _rbac_allowed(api_key, endpoint="backups", action=None, stack=None):
+        raise HTTPException(403, "RBAC: backups not permitted")
+    results = _prune_backups(intent)
+    audit_log({"event": "backups_pruned", "intent": intent, "results": results})
+    return {"results": results}
+
+
+@app.on_event("shutdown")
+def _shutdown_docker_engine() -> None:
+    if _DOCKER_ENGINE is not None:
+        _DOCKER_ENGINE.close()
+
+
+@app.on_event("shutdown")
+def _shutdown_proxmox() -> None:
+    if _PROXMOX is not None:
+        _PROXMOX.close()
+
+
+@app.on_event("shutdown")
+def _shutdown_state() -> None:
+    with _STATE_STORES_LOCK:
+        stores = list(_STATE_STORES.values())
+        _STATE_STORES.clear()
+        _CATALOGS.clear()
+    for store in stores:
+        store.close()
+
+
+def _parse_time(value: Optional[str], name: str) -> Optional[float]:
+    """Epoch seconds or an ISO 8601 timestamp (naive values are UTC)."""
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError as e:
+        raise HTTPException(400, f"Invalid {name}: {value}") from e
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+@app.get("/audit")
+def query_audit(
+    request: Request,
+    stack: Optional[str] = None,
+    intent: Optional[str] = None,
+    event: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = 1000,
+    _: str = Depends(get_api_key),
+    __: None = Depends(check_client_allowed),
+):
+    """Stream matching audit events as NDJSON, oldest first."""
+    api_key = request.headers.get("x-api-key", "")
+    if not _rbac_allowed(api_key, endpoint="audit", action=None, stack=stack):
+        raise HTTPException(403, "RBAC: audit not permitted")
+    if limit < 1:
+        raise HTTPException(400, "limit must be positive")
+    since_ts = _parse_time(since, "since")
+    until_ts = _parse_time(until, "until")
+    # Make events still sitting in the writer queue visible
+    AUDIT_WRITER.flush(timeout=2.0)
+    path = os.getenv("CHATOPS_AUDIT_LOG_FILE", AUDIT_LOG_FILE)
+
+    def stream():
+        sent = 0
+        for item in audit_query(
+            path, stack=stack, intent=intent, event=event, since=since_ts, until=until_ts
+        ):
+            # Keys scoped to some stacks only see those stacks' events
+            item_stack = item.get("stack")
+            if stack is None and item_stack is not None and not _rbac_allowed(
+                api_key, endpoint="audit", action=None, stack=str(item_stack)
+            ):
+                continue
+            yield json.dumps(item, separators=(",", ":")) + "\n"
+            sent += 1
+            if sent >= limit:
+                return
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.on_event("shutdown")
+def _shutdown_jobs() -> None:
+    JOBS.shutdown(wait=False)
+    VERIFY_JOBS.shutdown(wait=False)
+
+
+def _prefetch_sync(intent_name: str, on_output: Optional[Callable[[str], None]] = None) -> dict:
+    """Pull a rollout intent's images ahead of its maintenance window.
+
+    Started by chatops itself (scheduler, webhooks), so bundles run trusted.
+    """
+    request = _internal_request()
+    bundle = load_intent_bundle(intent_name)
+    if bundle is not None:
+        return _execute_bundle(
+            intent_name, bundle, request, False, rollback_on_failure=False,
+            endpoint="prefetch", on_output=on_output, prefetch=True, trusted=True,
+        )
+    req = IntentRequest(name=intent_name, rollback_on_failure=False, prefetch=True)
+    return _execute_single_intent(req, request, load_intent(intent_name), on_output)
+
+
+def _webhook_prefetch(intents: List[str]) -> List[str]:
+    """Queue prefetch jobs for the rollout intents a webhook named; returns job ids."""
+    if not WEBHOOK_PREFETCH:
+        return []
+    job_ids: List[str] = []
+    for name in dict.fromkeys(intents):
+        try:
+            entry = INTENT_REGISTRY.get(name)
+        except FileNotFoundError:
+            continue
+        if not any(i.action == "rollout" for i in entry.intents):
+            continue
+
+        def run(job: Job, name: str = name) -> dict:
+            return _prefetch_sync(name, job.append_output)
+
+        try:
+            job = JOBS.submit(f"prefetch:{name}", run)
+        except JobQueueFull:
+            logging.warning("webhook_prefetch_queue_full", extra={"intent": name})
+            break
+        job_ids.append(job.id)
+    return job_ids
+
+
 def _extract_intents_from_commits(commits: list[dict]) -> list[str]:
     intents: list[str] = []
     pattern = re.compile(r"\[chatops:intent=([^\]]+)\]")
@@ -1212,7 +2586,12 @@ async def github_webhook(request: Request):
         raise HTTPException(400, "Invalid JSON payload") from e
     commits = payload.get("commits", [])
     intents = _extract_intents_from_commits(commits)
-    return {"ok": True, "count": len(intents), "intents": intents}
+    return {
+        "ok": True,
+        "count": len(intents),
+        "intents": intents,
+        "prefetch_jobs": _webhook_prefetch(intents),
+    }
 
 
 @app.post("/webhook/gitlab")
@@ -1230,4 +2609,4 @@ async def gitlab_webhook(request: Request):
         raise HTTPException(400, "Invalid JSON payload") from e
     commits = payload.get("commits", [])
     intents = _extract_intents_from_commits(commits)
-    return {"ok": True, "results": intents}
+    return {"ok": True, "results": intents, "prefetch_jobs": _webhook_prefetch(intents)}
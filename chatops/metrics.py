@@ -0,0 +1,252 @@
+import fcntl
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest, values
+from prometheus_client.mmap_dict import MmapedDict
+from prometheus_client.multiprocess import MultiProcessCollector, mark_process_dead
+
+# Per-process value files are named <type>_<pid>.db (gauges: gauge_<mode>_<pid>.db)
+_WORKER_FILE = re.compile(r"^(counter|histogram|summary)_(\d+)\.db$")
+_GAUGE_FILE = re.compile(r"^gauge_\w+?_(\d+)\.db$")
+_LOCK_NAME = ".compact.lock"
+
+
+def enable_multiprocess(path: str) -> None:
+    """Back metrics created after this call by mmap files shared under ``path``.
+
+    Equivalent to starting with ``PROMETHEUS_MULTIPROC_DIR`` set; must run
+    before the metrics below are constructed.
+    """
+    os.makedirs(path, exist_ok=True)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+    values.ValueClass = values.get_value_class()
+
+
+MULTIPROC_DIR = os.getenv("CHATOPS_METRICS_DIR") or os.getenv("PROMETHEUS_MULTIPROC_DIR", "")
+if MULTIPROC_DIR:
+    enable_multiprocess(MULTIPROC_DIR)
+
+INTENT_REQUESTS = Counter(
+    "chatops_intent_requests_total",
+    "Total intent execution requests",
+    ["intent_name", "action", "stack", "dry_run"],
+)
+INTENT_FAILURES = Counter(
+    "chatops_intent_failures_total",
+    "Failed intent executions",
+    ["intent_name", "action", "stack", "reason"],
+)
+INTENT_DURATION = Histogram(
+    "chatops_intent_duration_seconds",
+    "Intent execution duration",
+    ["intent_name", "action"],
+)
+AUTH_FAILURES = Counter(
+    "chatops_auth_failures_total", "Authentication failures", ["reason"]
+)
+INTENT_PHASE_DURATION = Histogram(
+    "chatops_intent_phase_seconds",
+    "Time spent per intent execution phase (step: command verb for exec)",
+    ["action", "phase", "step"],
+    buckets=(0.001, 0.005, 0.025, 0.1, 0.5, 1.0, 2.5, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 900.0),
+)
+_DOCKER_OPTS_WITH_VALUE = frozenset(
+    ("-f", "--file", "-p", "--project-name", "--env-file", "--profile", "--project-directory",
+     "-H", "--host", "--context", "-c", "--config", "-l", "--log-level")
+)
+
+
+def command_verb(argv: List[str]) -> str:
+    """Step label for a command: ``docker compose -f x up -d`` → ``up``, ``rsync`` → ``rsync``."""
+    if not argv:
+        return ""
+    base = os.path.basename(argv[0])
+    if base != "docker":
+        return base
+    args = iter(argv[1:])
+    for arg in args:
+        if arg in _DOCKER_OPTS_WITH_VALUE:
+            next(args, None)
+        elif arg.startswith("-"):
+            continue
+        elif arg != "compose":
+            return arg
+    return base
+
+
+class PhaseTimer:
+    """Wall time per phase of one intent run, observed into ``INTENT_PHASE_DURATION``.
+
+    Only the outermost active phase is recorded, so the breakdown adds up
+    (audit writes made while rolling back count as ``rollback``).
+    """
+
+    def __init__(self, action: str = "") -> None:
+        self.action = action
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.steps: Dict[str, float] = {}
+        self._depth = 0
+
+    def add(self, phase: str, seconds: float, step: str = "") -> None:
+        INTENT_PHASE_DURATION.labels(action=self.action, phase=phase, step=step).observe(seconds)
+        if step:
+            self.steps[step] = self.steps.get(step, 0.0) + seconds
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, phase: str, step: str = "") -> Iterator[None]:
+        if self._depth:
+            yield
+            return
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            self.add(phase, time.perf_counter() - start, step)
+
+    def breakdown(self) -> dict:
+        """Seconds per phase plus ``exec`` split by step and the overall ``total``."""
+        out: Dict[str, object] = {k: round(v, 6) for k, v in self.phases.items()}
+        if self.steps:
+            out["steps"] = {k: round(v, 6) for k, v in self.steps.items()}
+        out["total"] = round(time.perf_counter() - self.started, 6)
+        return out
+
+
+_active = threading.local()
+
+
+@contextmanager
+def phase_timing(action: str = "") -> Iterator[PhaseTimer]:
+    """Make a timer current for this thread; nested calls reuse the outer one."""
+    timer = getattr(_active, "timer", None)
+    if timer is not None:
+        yield timer
+        return
+    timer = _active.timer = PhaseTimer(action)
+    try:
+        yield timer
+    finally:
+        _active.timer = None
+
+
+def current_timer() -> Optional[PhaseTimer]:
+    return getattr(_active, "timer", None)
+
+
+@contextmanager
+def phase(name: str, step: str = "") -> Iterator[None]:
+    """Time a block into the current thread's timer (no-op outside an intent run)."""
+    timer = current_timer()
+    if timer is None:
+        yield
+        return
+    with timer.phase(name, step):
+        yield
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+@contextmanager
+def _dir_lock(path: str, exclusive: bool, blocking: bool = True) -> Iterator[bool]:
+    """flock on the metrics dir so compaction never races a collection."""
+    with open(os.path.join(path, _LOCK_NAME), "a") as f:
+        flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        try:
+            fcntl.flock(f, flags if blocking else flags | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def compact_dead_workers(path: str, is_alive: Callable[[int], bool] = _pid_alive) -> int:
+    """Fold files of exited workers into ``<type>_archive.db``; returns files merged.
+
+    Counters and histograms stay cumulative (the archive keeps their totals)
+    while the directory stops growing with every worker restart. Live-gauge
+    files of dead workers are removed. Skipped if another process is compacting.
+    """
+    dead: Dict[str, List[str]] = defaultdict(list)
+    dead_pids = set()
+    for name in os.listdir(path):
+        m = _WORKER_FILE.match(name)
+        gauge = _GAUGE_FILE.match(name)
+        pid = int(m.group(2)) if m else int(gauge.group(1)) if gauge else None
+        if pid is None or pid == os.getpid() or is_alive(pid):
+            continue
+        dead_pids.add(pid)
+        if m:
+            dead[m.group(1)].append(os.path.join(path, name))
+    if not dead_pids:
+        return 0
+    merged = 0
+    with _dir_lock(path, exclusive=True, blocking=False) as locked:
+        if not locked:
+            return 0
+        for pid in dead_pids:
+            mark_process_dead(pid, path)
+        for typ, files in dead.items():
+            archive = os.path.join(path, f"{typ}_archive.db")
+            totals: Dict[str, Tuple[float, float]] = {}
+            for f in ([archive] if os.path.exists(archive) else []) + files:
+                for key, value, ts, _ in MmapedDict.read_all_values_from_file(f):
+                    old_value, old_ts = totals.get(key, (0.0, 0.0))
+                    totals[key] = (old_value + value, max(old_ts, ts))
+            tmp = archive + ".tmp"
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            out = MmapedDict(tmp)
+            try:
+                for key, (value, ts) in totals.items():
+                    out.write_value(key, value, ts)
+            finally:
+                out.close()
+            os.replace(tmp, archive)
+            for f in files:
+                os.remove(f)
+            merged += len(files)
+    return merged
+
+
+_last_compaction = 0.0
+_compaction_lock = threading.Lock()
+
+
+def render_latest(path: Optional[str] = None, compact_every: float = 60.0) -> bytes:
+    """Exposition text; in multiprocess mode aggregated across all workers."""
+    global _last_compaction
+    path = path or MULTIPROC_DIR
+    if not path:
+        return generate_latest()
+    now = time.monotonic()
+    if now - _last_compaction >= compact_every and _compaction_lock.acquire(blocking=False):
+        try:
+            _last_compaction = now
+            compact_dead_workers(path)
+        finally:
+            _compaction_lock.release()
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry, path=path)
+    with _dir_lock(path, exclusive=False):
+        return generate_latest(registry)
@@ -0,0 +1,264 @@
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import httpx
+
+VZDUMP_ARCHIVE = re.compile(r"creating (?:vzdump )?archive '([^']+)'")
+
+
+class ProxmoxAPIError(RuntimeError):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(f"Proxmox API {status}: {message}")
+        self.status = status
+
+
+class Guest:
+    __slots__ = ("vmid", "node", "type")
+
+    def __init__(self, vmid: int, node: str, type: str = "qemu") -> None:
+        self.vmid = vmid
+        self.node = node
+        self.type = type
+
+
+class ProxmoxClient:
+    """Proxmox VE API client on one pooled keep-alive session (API token auth).
+
+    ``url`` is the cluster's web address (``https://pve.lan:8006``); any node
+    can submit and report tasks for every other node.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        token_id: str,
+        token_secret: str,
+        verify_tls: bool = True,
+        timeout: float = 30.0,
+        max_connections: int = 8,
+    ) -> None:
+        self._client = httpx.Client(
+            base_url=url.rstrip("/") + "/api2/json",
+            headers={"Authorization": f"PVEAPIToken={token_id}={token_secret}"},
+            verify=verify_tls,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections, max_keepalive_connections=max_connections
+            ),
+        )
+
+    def _request(self, method: str, path: str, **kwargs: Any) -> Any:
+        r = self._client.request(method, path, **kwargs)
+        if r.status_code >= 400:
+            raise ProxmoxAPIError(r.status_code, r.reason_phrase or r.text)
+        try:
+            body = r.json()
+        except ValueError as e:
+            raise ProxmoxAPIError(r.status_code, f"invalid JSON response: {e}") from e
+        if not isinstance(body, dict):
+            raise ProxmoxAPIError(r.status_code, "unexpected response body")
+        return body.get("data")
+
+    def guests(self) -> Dict[int, Guest]:
+        """Every VM and container in the cluster, by id."""
+        return {
+            int(r["vmid"]): Guest(int(r["vmid"]), r["node"], r.get("type", "qemu"))
+            for r in self._request("GET", "/cluster/resources", params={"type": "vm"})
+        }
+
+    def pool_members(self, pool: str) -> List[int]:
+        data = self._request("GET", f"/pools/{quote(pool, safe='')}")
+        return [
+            int(m["vmid"]) for m in data.get("members", []) if m.get("type") in ("qemu", "lxc")
+        ]
+
+    def vzdump(self, guest: Guest, **options: Any) -> str:
+        """Start a backup task for ``guest``; returns its UPID."""
+        params = {"vmid": guest.vmid, **{k: v for k, v in options.items() if v is not None}}
+        return self._request("POST", f"/nodes/{guest.node}/vzdump", data=params)
+
+    def task_status(self, node: str, upid: str) -> dict:
+        return self._request("GET", f"/nodes/{node}/tasks/{quote(upid, safe='')}/status")
+
+    def task_log(self, node: str, upid: str, limit: int = 500) -> List[str]:
+        rows = self._request(
+            "GET", f"/nodes/{node}/tasks/{quote(upid, safe='')}/log", params={"limit": limit}
+        )
+        return [row.get("t", "") for row in rows]
+
+    def delete_volume(self, node: str, storage: str, volid: str) -> Optional[str]:
+        """Remove a volume (e.g. a backup archive) from ``storage``; returns the task UPID."""
+        return self._request(
+            "DELETE",
+            f"/nodes/{node}/storage/{quote(storage, safe='')}/content/{quote(volid, safe='')}",
+        )
+
+    def stop_task(self, node: str, upid: str) -> None:
+        self._request("DELETE", f"/nodes/{node}/tasks/{quote(upid, safe='')}")
+
+    def close(self) -> None:
+        self._client.close()
+
+
+def resolve_guests(
+    client: ProxmoxClient, vm_ids: Optional[List[int]] = None, pool: Optional[str] = None
+) -> List[Guest]:
+    """Guests for explicit ids and/or a pool's members, with the node each lives on."""
+    wanted = list(vm_ids or [])
+    if pool:
+        wanted.extend(v for v in client.pool_members(pool) if v not in wanted)
+    cluster = client.guests()
+    missing = [v for v in wanted if v not in cluster]
+    if missing:
+        raise ValueError(f"Unknown VM ids: {', '.join(map(str, missing))}")
+    return [cluster[v] for v in wanted]
+
+
+def wait_task(
+    client: ProxmoxClient,
+    node: str,
+    upid: str,
+    poll_interval: float = 1.0,
+    timeout: float = 300.0,
+    sleep: Callable[[float], None] = time.sleep,
+) -> None:
+    """Block until task ``upid`` stops; raises ProxmoxAPIError unless it ended OK."""
+    deadline = time.monotonic() + timeout
+    while True:
+        status = client.task_status(node, upid)
+        if status.get("status") == "stopped":
+            exit_status = status.get("exitstatus") or "unknown"
+            if exit_status != "OK":
+                raise ProxmoxAPIError(500, f"task {upid} failed: {exit_status}")
+            return
+        if time.monotonic() > deadline:
+            raise ProxmoxAPIError(504, f"task {upid} still running after {timeout:.0f}s")
+        sleep(poll_interval)
+
+
+class StorageSlots:
+    """Process-wide cap on concurrent vzdump tasks per storage target."""
+
+    def __init__(self, limit: int) -> None:
+        self.limit = max(1, limit)
+        self._active: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def try_acquire(self, storage: str) -> bool:
+        with self._lock:
+            if self._active.get(storage, 0) >= self.limit:
+                return False
+            self._active[storage] = self._active.get(storage, 0) + 1
+            return True
+
+    def release(self, storage: str) -> None:
+        with self._lock:
+            self._active[storage] = max(0, self._active.get(storage, 0) - 1)
+
+
+def run_backups(
+    client: ProxmoxClient,
+    guests: List[Guest],
+    slots: StorageSlots,
+    storage: Optional[str] = None,
+    options: Optional[Dict[str, Any]] = None,
+    poll_interval: float = 5.0,
+    timeout: float = 4 * 3600,
+    slot_timeout: Optional[float] = None,
+    on_output: Optional[Callable[[str], None]] = None,
+    sleep: Callable[[float], None] = time.sleep,
+) -> List[dict]:
+    """Back up ``guests`` as Proxmox tasks and wait for all of them.
+
+    Tasks are submitted while ``storage`` has a free slot and polled together
+    from this one thread, so a cluster-wide run needs no thread per guest.
+    Guests still waiting for a slot after ``slot_timeout`` (default
+    ``timeout``) fail. Returns one result per guest in completion order;
+    failures are results, not exceptions. Slots held by this run are released
+    even if it is aborted by an exception.
+    """
+    key = storage or ""
+    slot_timeout = timeout if slot_timeout is None else slot_timeout
+    pending: Deque[Guest] = deque(guests)
+    running: Dict[str, Tuple[Guest, float]] = {}
+    results: List[dict] = []
+
+    def finish(
+        guest: Guest,
+        upid: Optional[str],
+        error: str = "",
+        archive: Optional[str] = None,
+    ) -> None:
+        if upid is not None:
+            slots.release(key)
+            running.pop(upid, None)
+        ok = not error
+        results.append({
+            "vmid": guest.vmid,
+            "node": guest.node,
+            "upid": upid,
+            "ok": ok,
+            "error": error,
+            "archive": archive,
+        })
+        if on_output:
+            state = "OK" if ok else f"failed: {error}"
+            on_output(f"vzdump {guest.vmid}@{guest.node}: {state}")
+
+    waiting_since = time.monotonic()
+    try:
+        while pending or running:
+            while pending and slots.try_acquire(key):
+                guest = pending.popleft()
+                waiting_since = time.monotonic()
+                try:
+                    upid = client.vzdump(guest, storage=storage, **(options or {}))
+                except (ProxmoxAPIError, httpx.HTTPError) as e:
+                    slots.release(key)
+                    finish(guest, None, str(e))
+                    continue
+                if not isinstance(upid, str) or not upid:
+                    slots.release(key)
+                    finish(guest, None, f"no task id returned: {upid!r}")
+                    continue
+                running[upid] = (guest, time.monotonic())
+            if pending and time.monotonic() - waiting_since >= slot_timeout:
+                while pending:
+                    finish(
+                        pending.popleft(),
+                        None,
+                        f"no free slot on storage {storage or 'default'} "
+                        f"after {slot_timeout:.0f}s",
+                    )
+            if not (pending or running):
+                break
+            sleep(poll_interval)
+            for upid, (guest, started) in list(running.items()):
+                try:
+                    status = client.task_status(guest.node, upid)
+                except (ProxmoxAPIError, httpx.HTTPError) as e:
+                    status = {"status": "running", "poll_error": str(e)}
+                if status.get("status") == "stopped":
+                    exit_status = status.get("exitstatus") or "unknown"
+                    archive = None
+                    try:
+                        m = VZDUMP_ARCHIVE.search("\n".join(client.task_log(guest.node, upid)))
+                        archive = m.group(1) if m else None
+                    except (ProxmoxAPIError, httpx.HTTPError):
+                        pass
+                    finish(guest, upid, "" if exit_status == "OK" else exit_status, archive)
+                elif time.monotonic() - started > timeout:
+                    try:
+                        client.stop_task(guest.node, upid)
+                    except (ProxmoxAPIError, httpx.HTTPError):
+                        pass
+                    finish(guest, upid, f"timed out after {timeout:.0f}s")
+    finally:
+        for _ in running:
+            slots.release(key)
+        running.clear()
+    return results
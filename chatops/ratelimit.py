@@ -0,0 +1,252 @@
+import importlib
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+_UNITS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+_RATE_RE = re.compile(r"^\s*(\d+)\s*(?:/|per)\s*(\d*)\s*(second|minute|hour|day)s?\s*$")
+
+
+class Rate:
+    """Token bucket of ``capacity`` tokens refilled evenly over ``period`` seconds."""
+
+    __slots__ = ("capacity", "period", "text")
+
+    def __init__(self, capacity: int, period: float, text: str = "") -> None:
+        self.capacity = capacity
+        self.period = period
+        self.text = text or f"{capacity}/{period:g}s"
+
+    @classmethod
+    def parse(cls, text: str) -> "Rate":
+        """``10/minute``, ``10 per minute`` or ``5/30 seconds``."""
+        m = _RATE_RE.match(text.lower())
+        if not m or int(m.group(1)) < 1:
+            raise ValueError(f"Invalid rate limit: {text!r}")
+        period = int(m.group(2) or 1) * _UNITS[m.group(3)]
+        return cls(int(m.group(1)), period, text.strip())
+
+    @property
+    def refill_per_second(self) -> float:
+        return self.capacity / self.period
+
+    def __str__(self) -> str:
+        return self.text
+
+
+def _take(
+    tokens: float, updated: float, rate: Rate, now: float, cost: float
+) -> Tuple[float, bool, float]:
+    """Refill then spend; returns ``(tokens_left, allowed, retry_after_seconds)``."""
+    tokens = min(rate.capacity, tokens + max(0.0, now - updated) * rate.refill_per_second)
+    if tokens >= cost:
+        return tokens - cost, True, 0.0
+    return tokens, False, (cost - tokens) / rate.refill_per_second
+
+
+class MemoryStorage:
+    """Per-process buckets (one worker, or tests)."""
+
+    name = "memory"
+
+    def __init__(self, max_keys: int = 10000) -> None:
+        self.max_keys = max_keys
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: Rate, cost: float = 1.0) -> Tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (rate.capacity, now))
+            tokens, allowed, retry_after = _take(tokens, updated, rate, now, cost)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                # Drop the least recently touched half; they would be near full anyway
+                stale = sorted(self._buckets, key=lambda k: self._buckets[k][1])
+                for k in stale[: len(stale) // 2]:
+                    del self._buckets[k]
+        return allowed, retry_after
+
+    def reset(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteStorage:
+    """Buckets shared by every worker process on one host via an SQLite file."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str, timeout: float = 5.0) -> None:
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._calls = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, rate: Rate, cost: float = 1.0) -> Tuple[bool, float]:
+        conn = self._conn()
+        now = time.time()  # wall clock: shared across processes
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated FROM buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, updated = row if row else (rate.capacity, now)
+            tokens, allowed, retry_after = _take(tokens, updated, rate, now, cost)
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                (key, tokens, now),
+            )
+            self._calls += 1
+            if self._calls % 1000 == 0:
+                conn.execute("DELETE FROM buckets WHERE updated < ?", (now - 86400,))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return allowed, retry_after
+
+    def reset(self) -> None:
+        self._conn().execute("DELETE FROM buckets")
+
+
+# Atomic refill-and-take on the server: KEYS[1]; ARGV = capacity, refill/s, now, cost
+_REDIS_SCRIPT = """
+local b = redis.call('HMGET', KEYS[1], 't', 'u')
+local capacity = tonumber(ARGV[1])
+local refill = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local tokens = tonumber(b[1]) or capacity
+local updated = tonumber(b[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * refill)
+local allowed = 0
+local retry = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+else
+  retry = (cost - tokens) / refill
+end
+redis.call('HSET', KEYS[1], 't', tostring(tokens), 'u', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / refill) + 1)
+return {allowed, tostring(retry)}
+"""
+
+
+class RedisStorage:
+    """Buckets in Redis (or any server speaking its protocol, e.g. Valkey/KeyDB).
+
+    ``client`` needs ``eval(script, numkeys, *keys_and_args)``; ``from_url``
+    builds one with the optional ``redis`` package.
+    """
+
+    name = "redis"
+
+    def __init__(self, client: Any, prefix: str = "chatops:rl:") -> None:
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisStorage":
+        redis = importlib.import_module("redis")
+        return cls(redis.Redis.from_url(url))
+
+    def take(self, key: str, rate: Rate, cost: float = 1.0) -> Tuple[bool, float]:
+        allowed, retry_after = self.client.eval(
+            _REDIS_SCRIPT, 1, self.prefix + key,
+            rate.capacity, rate.refill_per_second, time.time(), cost,
+        )
+        return bool(int(allowed)), float(retry_after)
+
+    def reset(self) -> None:
+        for k in self.client.scan_iter(match=self.prefix + "*"):
+            self.client.delete(k)
+
+
+def storage_from_uri(uri: str, default_sqlite_path: str):
+    """``memory`` (default), ``sqlite`` / ``sqlite:///path`` or ``redis://...``."""
+    uri = (uri or "memory").strip()
+    if uri in ("memory", "memory://"):
+        return MemoryStorage()
+    if uri == "sqlite":
+        return SQLiteStorage(default_sqlite_path)
+    if uri.startswith("sqlite:///"):
+        return SQLiteStorage(uri[len("sqlite:///"):] or default_sqlite_path)
+    if uri.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStorage.from_url(uri)
+    raise ValueError(f"Unsupported rate limit storage: {uri}")
+
+
+def parse_endpoint_rates(text: str) -> Dict[str, Rate]:
+    """``run=10/minute,orchestrate=2/minute`` → per-endpoint rates."""
+    rates: Dict[str, Rate] = {}
+    for item in text.split(","):
+        if not item.strip():
+            continue
+        endpoint, _, rate = item.partition("=")
+        rates[endpoint.strip()] = Rate.parse(rate)
+    return rates
+
+
+class RateLimiter:
+    """Token-bucket limits per endpoint and caller on a pluggable storage.
+
+    A caller is the API key (by digest) when it maps to an RBAC entry, so one
+    key is limited across every worker and client IP, else the client address.
+    Precedence: the key's own ``rate_limit``, then the endpoint, then default.
+    """
+
+    def __init__(
+        self,
+        storage,
+        default: Rate,
+        endpoints: Optional[Dict[str, Rate]] = None,
+        enabled: bool = True,
+    ) -> None:
+        self.storage = storage
+        self.default = default
+        self.endpoints = endpoints or {}
+        self.enabled = enabled
+
+    def rate_for(self, endpoint: str, key_rate: Optional[Rate] = None) -> Rate:
+        return key_rate or self.endpoints.get(endpoint) or self.default
+
+    def hit(self, endpoint: str, caller: str, rate: Rate) -> Tuple[bool, float]:
+        if not self.enabled:
+            return True, 0.0
+        return self.storage.take(f"{endpoint}:{caller}", rate)
+
+    def reset(self) -> None:
+        self.storage.reset()
+
+    def describe(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "storage": self.storage.name,
+            "algorithm": "token_bucket",
+            "default": str(self.default),
+            "endpoints": {k: str(v) for k, v in sorted(self.endpoints.items())},
+        }
+
+
+def retry_after_header(seconds: float) -> Dict[str, str]:
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
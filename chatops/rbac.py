@@ -0,0 +1,163 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from .apikeys import VerificationCache
+from .ratelimit import Rate
+
+
+def key_digest(api_key: str) -> str:
+    """Table key for an API key; plaintext keys are not kept after compiling."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+def _scope(values) -> Optional[FrozenSet[str]]:
+    """``None`` means unrestricted (missing, empty or containing ``*``)."""
+    if not values or "*" in values:
+        return None
+    return frozenset(str(v) for v in values)
+
+
+class KeyPolicy:
+    __slots__ = ("endpoints", "actions", "stacks", "deny_all", "rate_limit")
+
+    def __init__(self, entry: dict) -> None:
+        # An entry without scopes authenticates but permits nothing
+        self.deny_all = not any(k not in ("key_hash", "rate_limit") for k in entry)
+        self.endpoints = _scope(entry.get("endpoints"))
+        self.actions = _scope(entry.get("actions"))
+        self.stacks = _scope(entry.get("stacks"))
+        self.rate_limit: Optional[Rate] = None
+        if entry.get("rate_limit"):
+            try:
+                self.rate_limit = Rate.parse(str(entry["rate_limit"]))
+            except ValueError as e:
+                logging.warning("Ignoring RBAC rate_limit: %s", e)
+
+    def allows(self, endpoint: str, action: Optional[str], stack: Optional[str]) -> bool:
+        if self.deny_all:
+            return False
+        if self.endpoints is not None and endpoint not in self.endpoints:
+            return False
+        if action is not None and self.actions is not None and action not in self.actions:
+            return False
+        if stack is not None and self.stacks is not None and stack not in self.stacks:
+            return False
+        return True
+
+
+class RBACTable:
+    """RBAC config compiled into frozenset scopes keyed by ``key_digest``.
+
+    Entries with a ``key_hash`` (scrypt/PBKDF2/argon2, see ``chatops.apikeys``)
+    are keyed by a label instead of the key itself. Their keys have the form
+    ``<label>.<secret>``: a presented key that misses the digest table is
+    verified, through ``cache``, only against the entry its label names.
+    """
+
+    def __init__(self, config: dict, cache: Optional[VerificationCache] = None) -> None:
+        self.cache = cache or VerificationCache()
+        self.policies: Dict[str, KeyPolicy] = {}
+        self.hashed: Dict[str, Tuple[str, KeyPolicy]] = {}
+        for key, entry in (config.get("keys") or {}).items():
+            entry = entry or {}
+            if entry.get("key_hash"):
+                self.hashed[str(key)] = (str(entry["key_hash"]), KeyPolicy(entry))
+            else:
+                self.policies[key_digest(str(key))] = KeyPolicy(entry)
+
+    def __len__(self) -> int:
+        return len(self.policies) + len(self.hashed)
+
+    def policy(self, api_key: Optional[str], verify: bool = True) -> Optional[KeyPolicy]:
+        """The key's policy; with ``verify=False`` hashed entries resolve only from ``cache``."""
+        if not api_key:
+            return None
+        policy = self.policies.get(key_digest(api_key))
+        if policy is not None:
+            return policy
+        label = api_key.rpartition(".")[0]
+        candidate = self.hashed.get(label) if label else None
+        if candidate is None:
+            return None
+        encoded, hashed_policy = candidate
+        try:
+            if verify and self.cache.verify(encoded, api_key):
+                return hashed_policy
+            if not verify and self.cache.cached(encoded, api_key):
+                return hashed_policy
+        except ValueError as e:
+            logging.warning("Invalid key_hash for RBAC key %s: %s", label, e)
+        return None
+
+    def allowed(
+        self, api_key: str, endpoint: str, action: Optional[str], stack: Optional[str]
+    ) -> bool:
+        policy = self.policy(api_key)
+        return policy is not None and policy.allows(endpoint, action, stack)
+
+
+class RBACSource:
+    """Compiles RBAC from inline JSON or a file, recompiling only on change.
+
+    The env values are compared on each call; the file is stat'ed at most once
+    per ``recheck_seconds``. ``invalidate()`` forces the next call to reload.
+    """
+
+    def __init__(
+        self, recheck_seconds: float = 5.0, cache: Optional[VerificationCache] = None
+    ) -> None:
+        self.recheck_seconds = recheck_seconds
+        self.cache = cache
+        self._lock = threading.Lock()
+        self._key: Optional[Tuple[str, str, float]] = None
+        self._checked_at = 0.0
+        self._table: Optional[RBACTable] = None
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._key = None
+
+    def get(self, cfg_json: str, cfg_file: str) -> Optional[RBACTable]:
+        key = self._key
+        now = time.monotonic()
+        if (
+            key is not None
+            and key[0] == cfg_json
+            and key[1] == cfg_file
+            and (cfg_json or not cfg_file or now - self._checked_at < self.recheck_seconds)
+        ):
+            return self._table
+        with self._lock:
+            file_mtime = 0.0
+            if cfg_file and not cfg_json:
+                try:
+                    file_mtime = os.path.getmtime(cfg_file)
+                except OSError:
+                    file_mtime = 0.0
+            self._checked_at = now
+            new_key = (cfg_json, cfg_file, file_mtime)
+            if new_key != self._key:
+                self._table = self._load(cfg_json, cfg_file, self.cache)
+                self._key = new_key
+            return self._table
+
+    @staticmethod
+    def _load(
+        cfg_json: str, cfg_file: str, cache: Optional[VerificationCache]
+    ) -> Optional[RBACTable]:
+        data: Optional[dict] = None
+        try:
+            if cfg_json:
+                data = json.loads(cfg_json)
+            elif cfg_file and os.path.exists(cfg_file):
+                with open(cfg_file, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+        except Exception as e:
+            logging.warning("Failed to load RBAC config: %s", e)
+            data = None
+        return RBACTable(data, cache) if data else None
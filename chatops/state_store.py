@@ -0,0 +1,204 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List, Optional, Set
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    updated_at INTEGER NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE TABLE IF NOT EXISTS replica_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    stack TEXT NOT NULL,
+    service TEXT NOT NULL,
+    replicas INTEGER NOT NULL,
+    recorded_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS replica_history_service
+    ON replica_history (stack, service, id);
+"""
+
+
+class _ThreadConnection:
+    """Holds a thread's connection in its thread-local; freed when the thread exits."""
+
+    __slots__ = ("conn", "__weakref__")
+
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self.conn = conn
+
+
+def _release(
+    conns: Set[sqlite3.Connection], lock: threading.Lock, conn: sqlite3.Connection
+) -> None:
+    with lock:
+        conns.discard(conn)
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+class StateStore:
+    """Transactional state in SQLite (WAL mode).
+
+    Each thread gets its own connection, closed when the thread exits (pool
+    threads come and go); writes run in ``BEGIN IMMEDIATE`` transactions so
+    concurrent read-modify-write updates never lose each other. Replica changes
+    are kept as per-service history (newest ``history_limit``).
+    """
+
+    def __init__(self, path: str, history_limit: int = 100, timeout: float = 10.0) -> None:
+        self.path = path
+        self.history_limit = history_limit
+        self.timeout = timeout
+        self._local = threading.local()
+        self._conns: Set[sqlite3.Connection] = set()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            conn = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            holder = self._local.holder = _ThreadConnection(conn)
+            with self._lock:
+                self._conns.add(conn)
+            weakref.finalize(holder, _release, self._conns, self._lock, conn)
+        return holder.conn
+
+    def connection(self) -> sqlite3.Connection:
+        """This thread's connection (autocommit), for modules keeping their own tables."""
+        return self._conn()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        row = self._conn().execute(
+            "SELECT value FROM kv WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, namespace: str, key: str, value: Any) -> None:
+        with self.transaction() as conn:
+            self._put(conn, namespace, key, value)
+
+    def update(
+        self, namespace: str, key: str, fn: Callable[[Any], Any], default: Any = None
+    ) -> Any:
+        """Atomically replace the value with ``fn(current)``; returns the new value."""
+        with self.transaction() as conn:
+            row = conn.execute(
+                "SELECT value FROM kv WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            value = fn(json.loads(row[0]) if row else default)
+            self._put(conn, namespace, key, value)
+        return value
+
+    @staticmethod
+    def _put(conn: sqlite3.Connection, namespace: str, key: str, value: Any) -> None:
+        conn.execute(
+            "INSERT INTO kv (namespace, key, value, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (namespace, key) DO UPDATE SET "
+            "value = excluded.value, updated_at = excluded.updated_at",
+            (namespace, key, json.dumps(value), int(time.time())),
+        )
+
+    def record_replicas(
+        self, stack: str, service: str, replicas: int, recorded_at: Optional[int] = None
+    ) -> None:
+        with self.transaction() as conn:
+            self._insert_replicas(conn, stack, service, replicas, recorded_at)
+
+    def _insert_replicas(
+        self,
+        conn: sqlite3.Connection,
+        stack: str,
+        service: str,
+        replicas: int,
+        recorded_at: Optional[int] = None,
+    ) -> None:
+        conn.execute(
+            "INSERT INTO replica_history (stack, service, replicas, recorded_at) "
+            "VALUES (?, ?, ?, ?)",
+            (stack, service, int(replicas), int(recorded_at or time.time())),
+        )
+        if self.history_limit > 0:
+            conn.execute(
+                "DELETE FROM replica_history WHERE stack = ? AND service = ? AND id <= ("
+                "SELECT id FROM replica_history WHERE stack = ? AND service = ? "
+                "ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (stack, service, stack, service, self.history_limit),
+            )
+
+    def previous_replicas(self, stack: str, service: str) -> Optional[int]:
+        """Desired replicas before the most recent change (the rollback target)."""
+        row = self._conn().execute(
+            "SELECT replicas FROM replica_history WHERE stack = ? AND service = ? "
+            "ORDER BY id DESC LIMIT 1 OFFSET 1",
+            (stack, service),
+        ).fetchone()
+        return int(row[0]) if row else None
+
+    def replica_history(self, stack: str, service: str, limit: int = 20) -> List[dict]:
+        """Newest first."""
+        rows = self._conn().execute(
+            "SELECT replicas, recorded_at FROM replica_history "
+            "WHERE stack = ? AND service = ? ORDER BY id DESC LIMIT ?",
+            (stack, service, limit),
+        ).fetchall()
+        return [{"replicas": r, "recorded_at": t} for r, t in rows]
+
+    def import_legacy_json(self, path: str) -> bool:
+        """Load ``scale`` entries from an old ``state.json`` (once per store)."""
+        if not os.path.exists(path) or self.get("meta", "legacy_json_imported"):
+            return False
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except Exception as e:
+            logging.warning("Failed to read legacy state %s: %s", path, e)
+            return False
+        with self.transaction() as conn:
+            for stack, services in (data.get("scale") or {}).items():
+                for service, svc in (services or {}).items():
+                    ts = svc.get("updated_at")
+                    for field in ("previous_desired", "last_desired"):
+                        if svc.get(field) is not None:
+                            self._insert_replicas(conn, stack, service, svc[field], ts)
+            self._put(conn, "meta", "legacy_json_imported", path)
+        return True
+
+    def close(self) -> None:
+        with self._lock:
+            conns = list(self._conns)
+            self._conns.clear()
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._local = threading.local()
@@ -0,0 +1,167 @@
+import gzip
+import os
+import subprocess
+import threading
+from collections import deque
+from typing import IO, Callable, Deque, Iterator, List, Optional
+
+# Longest single read; rsync/compose progress lines without "\n" are split here
+_MAX_LINE = 64 * 1024
+
+
+class TailBuffer:
+    """Keeps only the last ``max_bytes`` of everything appended."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.truncated = False
+        self._chunks: Deque[bytes] = deque()
+        self._size = 0
+
+    def append(self, chunk: bytes) -> None:
+        self.total_bytes += len(chunk)
+        self._chunks.append(chunk)
+        self._size += len(chunk)
+        while self._size > self.max_bytes:
+            self.truncated = True
+            head = self._chunks.popleft()
+            excess = self._size - self.max_bytes
+            if len(head) > excess:
+                # Keep the newest part of the oldest chunk
+                self._chunks.appendleft(head[excess:])
+                self._size -= excess
+            else:
+                self._size -= len(head)
+
+    def getvalue(self) -> str:
+        return b"".join(self._chunks).decode("utf-8", errors="replace")
+
+
+class CommandResult:
+    __slots__ = ("argv", "returncode", "stdout", "stderr", "truncated", "log_file", "bytes_out")
+
+    def __init__(
+        self,
+        argv: List[str],
+        returncode: int,
+        stdout: str,
+        stderr: str,
+        truncated: bool = False,
+        log_file: Optional[str] = None,
+        bytes_out: int = 0,
+    ) -> None:
+        self.argv = argv
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.truncated = truncated
+        self.log_file = log_file
+        self.bytes_out = bytes_out
+
+
+def run_streaming(
+    argv: List[str],
+    on_line: Optional[Callable[[str], None]] = None,
+    max_tail_bytes: int = 64 * 1024,
+    spool_path: Optional[str] = None,
+    check: bool = True,
+) -> CommandResult:
+    """Run ``argv`` reading output incrementally instead of buffering it all.
+
+    Only the last ``max_tail_bytes`` of stdout and stderr are kept in memory.
+    Each stdout line is passed to ``on_line`` as it arrives; with ``spool_path``
+    the complete output (stderr lines prefixed) is written gzip-compressed.
+    Raises ``subprocess.CalledProcessError`` on a non-zero exit when ``check``.
+    """
+    stdout_tail = TailBuffer(max_tail_bytes)
+    stderr_tail = TailBuffer(max_tail_bytes)
+    spool: Optional[gzip.GzipFile] = None
+    spool_lock = threading.Lock()
+    if spool_path:
+        os.makedirs(os.path.dirname(spool_path) or ".", exist_ok=True)
+        spool = gzip.open(spool_path, "wb", compresslevel=6)
+
+    def spool_write(chunk: bytes) -> None:
+        if spool is not None:
+            with spool_lock:
+                spool.write(chunk)
+
+    def drain_stderr(stream: IO[bytes]) -> None:
+        for chunk in iter(lambda: stream.readline(_MAX_LINE), b""):
+            stderr_tail.append(chunk)
+            spool_write(b"[stderr] " + chunk)
+
+    try:
+        proc = subprocess.Popen(
+            argv, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        stdout, stderr = proc.stdout, proc.stderr
+        assert stdout is not None and stderr is not None
+        err_thread = threading.Thread(target=drain_stderr, args=(stderr,), daemon=True)
+        err_thread.start()
+        try:
+            for chunk in iter(lambda: stdout.readline(_MAX_LINE), b""):
+                stdout_tail.append(chunk)
+                spool_write(chunk)
+                if on_line:
+                    on_line(chunk.decode("utf-8", errors="replace").rstrip("\r\n"))
+        except BaseException:
+            proc.kill()
+            raise
+        returncode = proc.wait()
+        err_thread.join()
+        stdout.close()
+        stderr.close()
+    finally:
+        if spool is not None:
+            spool.close()
+
+    result = CommandResult(
+        argv,
+        returncode,
+        stdout_tail.getvalue(),
+        stderr_tail.getvalue(),
+        truncated=stdout_tail.truncated or stderr_tail.truncated,
+        log_file=spool_path,
+        bytes_out=stdout_tail.total_bytes,
+    )
+    if check and returncode != 0:
+        raise subprocess.CalledProcessError(
+            returncode, argv, output=result.stdout, stderr=result.stderr
+        )
+    return result
+
+
+def stream_stdout(argv: List[str], chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+    """Yield a command's raw stdout in chunks (e.g. ``docker cp src -`` tar streams).
+
+    stderr is kept (tail only) for the ``CalledProcessError`` raised after a
+    non-zero exit; closing the generator early kills the process.
+    """
+    stderr_tail = TailBuffer(64 * 1024)
+    proc = subprocess.Popen(
+        argv, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    stdout, stderr = proc.stdout, proc.stderr
+    assert stdout is not None and stderr is not None
+
+    def drain_stderr() -> None:
+        for chunk in iter(lambda: stderr.read(4096), b""):
+            stderr_tail.append(chunk)
+
+    err_thread = threading.Thread(target=drain_stderr, daemon=True)
+    err_thread.start()
+    try:
+        for chunk in iter(lambda: stdout.read(chunk_size), b""):
+            yield chunk
+    except BaseException:
+        proc.kill()
+        raise
+    finally:
+        returncode = proc.wait()
+        err_thread.join()
+        stdout.close()
+        stderr.close()
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, argv, stderr=stderr_tail.getvalue())
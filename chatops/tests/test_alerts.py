@@ -0,0 +1,115 @@
+import json
+import os
+import sys
+import threading
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from chatops.alerts import AlertDispatcher
+
+
+def _dispatcher(handler, **kwargs):
+    posts = []
+
+    def record(request):
+        posts.append(json.loads(request.content))
+        return handler(request, len(posts))
+
+    d = AlertDispatcher(
+        client_factory=lambda: httpx.Client(transport=httpx.MockTransport(record)),
+        **kwargs,
+    )
+    return d, posts
+
+
+def test_send_does_not_wait_for_the_webhook():
+    gate = threading.Event()
+
+    def slow(request, n):
+        gate.wait(5)
+        return httpx.Response(204)
+
+    d, posts = _dispatcher(slow, batch_wait=0)
+    try:
+        start = time.monotonic()
+        assert d.send("https://hook", "first")
+        assert time.monotonic() - start < 0.5
+    finally:
+        gate.set()
+        d.stop()
+    assert len(posts) == 1
+
+
+def test_burst_is_batched_into_messages_of_ten_embeds():
+    d, posts = _dispatcher(lambda request, n: httpx.Response(204), batch_wait=0.3)
+    for i in range(23):
+        d.send("https://hook", f"alert {i}")
+    assert d.flush()
+    d.stop()
+    assert [len(p["embeds"]) for p in posts] == [10, 10, 3]
+    assert d.stats()["sent"] == 23
+
+
+def test_duplicates_within_window_are_suppressed():
+    d, posts = _dispatcher(lambda request, n: httpx.Response(204), batch_wait=0)
+    assert d.send("https://hook", "auth failed")
+    assert not d.send("https://hook", "auth failed")
+    assert d.send("https://hook", "auth failed", color=0xFF0000)
+    d.stop()
+    assert d.suppressed == 1
+    assert sum(len(p["embeds"]) for p in posts) == 2
+
+
+def test_429_waits_retry_after_and_retries():
+    def limited(request, n):
+        if n == 1:
+            return httpx.Response(429, json={"retry_after": 0.2, "global": False})
+        return httpx.Response(204)
+
+    d, posts = _dispatcher(limited, batch_wait=0)
+    start = time.monotonic()
+    d.send("https://hook", "x")
+    assert d.flush()
+    elapsed = time.monotonic() - start
+    d.stop()
+    assert len(posts) == 2
+    assert elapsed >= 0.2
+    assert d.sent == 1
+
+
+def test_429s_do_not_use_up_the_retry_budget():
+    def limited(request, n):
+        if n <= 3:
+            return httpx.Response(429, json={"retry_after": 0.01, "global": False})
+        return httpx.Response(204)
+
+    d, posts = _dispatcher(limited, batch_wait=0, max_retries=1)
+    d.send("https://hook", "x")
+    assert d.flush()
+    d.stop()
+    assert len(posts) == 4
+    assert d.sent == 1
+
+
+def test_stop_timeout_keeps_the_live_worker():
+    gate = threading.Event()
+
+    def slow(request, n):
+        gate.wait(5)
+        return httpx.Response(204)
+
+    d, posts = _dispatcher(slow, batch_wait=0)
+    d.send("https://hook", "first")
+    worker = d._thread
+    d.stop(timeout=0.1)
+    try:
+        assert d.running
+        d.send("https://hook", "second")
+        assert d._thread is worker  # no second worker beside the one still posting
+    finally:
+        gate.set()
+    worker.join(5)
+    d.stop()
+    assert not d.running
@@ -0,0 +1,58 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from chatops.allowlist import AllowList, AllowListSource, load_allowlist_file
+
+
+def test_membership_over_merged_ranges():
+    allow = AllowList(["10.0.0.0/8", "10.1.0.0/16", "192.168.1.5", "2001:db8::/32", "runner"])
+    assert "10.200.3.4" in allow
+    assert "192.168.1.5" in allow
+    assert "192.168.1.6" not in allow
+    assert "11.0.0.0" not in allow
+    assert "2001:db8:ffff::1" in allow
+    assert "2001:db9::1" not in allow
+    assert "::ffff:10.0.0.1" in allow  # IPv4-mapped IPv6
+    assert "runner" in allow
+    assert "not-an-ip" not in allow
+    assert allow.size == 4  # the /16 folds into the /8
+
+
+def test_large_allowlist_matches_boundaries():
+    nets = [f"10.{i}.{j}.0/24" for i in range(0, 256, 2) for j in range(0, 256, 4)]
+    allow = AllowList(nets)
+    assert "10.0.0.0" in allow and "10.0.0.255" in allow
+    assert "10.0.1.0" not in allow
+    assert "10.1.0.1" not in allow
+    assert "10.254.252.9" in allow
+
+
+def test_load_github_meta_and_text_files(tmp_path):
+    meta = tmp_path / "meta.json"
+    meta.write_text(json.dumps({
+        "verifiable_password_authentication": False,
+        "ssh_keys": ["ssh-ed25519 AAAA"],
+        "hooks": ["192.30.252.0/22", "2a0a:a440::/29"],
+        "actions": ["4.148.0.0/16"],
+    }))
+    assert sorted(load_allowlist_file(str(meta))) == [
+        "192.30.252.0/22", "2a0a:a440::/29", "4.148.0.0/16",
+    ]
+    text = tmp_path / "allow.txt"
+    text.write_text("# office\n10.0.0.0/8, 172.16.0.1\n\nbastion  # jump host\n")
+    assert load_allowlist_file(str(text)) == ["10.0.0.0/8", "172.16.0.1", "bastion"]
+
+
+def test_source_recompiles_on_env_or_file_change(tmp_path):
+    path = tmp_path / "allow.txt"
+    path.write_text("10.0.0.0/8\n")
+    source = AllowListSource(recheck_seconds=0)
+    first = source.get("", str(path))
+    assert "10.1.1.1" in first
+    assert source.get("", str(path)) is first  # unchanged → same compiled object
+    path.write_text("172.16.0.0/12\n")
+    os.utime(path, ns=(1, 1))
+    assert "10.1.1.1" not in source.get("", str(path))
+    assert "10.1.1.1" in source.get("10.0.0.0/8", str(path))
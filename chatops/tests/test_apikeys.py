@@ -0,0 +1,62 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from chatops import apikeys
+from chatops.apikeys import VerificationCache, hash_key, verify_key_hash
+
+
+def test_hash_formats_round_trip():
+    for encoded in (hash_key("s3cret"), hash_key("s3cret", "pbkdf2_sha256", iterations=1000)):
+        assert verify_key_hash(encoded, "s3cret")
+        assert not verify_key_hash(encoded, "s3cret!")
+    assert hash_key("a") != hash_key("a")  # salted
+
+
+def test_malformed_hash_raises():
+    with pytest.raises(ValueError):
+        verify_key_hash("md5$abc", "x")
+    with pytest.raises(ValueError):
+        verify_key_hash("pbkdf2_sha256$many$salt$hash", "x")
+
+
+def test_cache_runs_kdf_once_per_key(monkeypatch):
+    calls = []
+    real = apikeys.verify_key_hash
+    monkeypatch.setattr(apikeys, "verify_key_hash", lambda e, k: (calls.append(k), real(e, k))[1])
+    encoded = hash_key("good", "pbkdf2_sha256", iterations=1000)
+    cache = VerificationCache(max_entries=2, ttl=60)
+    assert all(cache.verify(encoded, "good") for _ in range(5))
+    assert not any(cache.verify(encoded, "bad") for _ in range(5))
+    assert calls == ["good", "bad"]
+    assert cache.hits == 8
+    # LRU bound: a third valid key evicts the least recently used one
+    second = hash_key("good", "pbkdf2_sha256", iterations=1000)
+    third = hash_key("good", "pbkdf2_sha256", iterations=1000)
+    cache.verify(second, "good")
+    cache.verify(third, "good")
+    cache.verify(encoded, "good")
+    assert calls == ["good", "bad", "good", "good", "good"]
+
+
+def test_failures_never_evict_valid_keys():
+    encoded = hash_key("good", "pbkdf2_sha256", iterations=1000)
+    cache = VerificationCache(max_entries=1, ttl=60, max_failures=2)
+    assert cache.verify(encoded, "good")
+    for i in range(10):
+        assert not cache.verify(encoded, f"wrong-{i}")
+    misses = cache.misses
+    assert cache.verify(encoded, "good")
+    assert cache.misses == misses
+    assert not cache.verify(encoded, "wrong-0")  # evicted from the failure LRU
+    assert cache.misses == misses + 1
+
+
+def test_cache_entries_expire(monkeypatch):
+    encoded = hash_key("good", "pbkdf2_sha256", iterations=1000)
+    cache = VerificationCache(ttl=0)
+    cache.verify(encoded, "good")
+    cache.verify(encoded, "good")
+    assert cache.misses == 2
@@ -0,0 +1,128 @@
+import json
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from chatops import audit as auditmod
+from chatops.audit import AuditWriter, list_segments, query, rotate_file, seal_segment
+
+
+def test_writer_group_commits_batches(tmp_path, monkeypatch):
+    fsyncs = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: (fsyncs.append(fd), real_fsync(fd)))
+    writer = AuditWriter(batch_size=64)
+    gate = threading.Event()
+    original = writer._write_batch
+    # Hold the worker on its first batch so the rest pile up in the queue
+    monkeypatch.setattr(writer, "_write_batch", lambda b: (gate.wait(5), original(b)))
+    path = str(tmp_path / "sub" / "audit.log")
+    writer.start()
+    try:
+        for i in range(200):
+            writer.write(path, json.dumps({"i": i}))
+        gate.set()
+        assert writer.flush()
+    finally:
+        writer.stop()
+
+    lines = [json.loads(x) for x in open(path).read().splitlines()]
+    assert [e["i"] for e in lines] == list(range(200))
+    # One fsync per batch, not per event
+    assert 1 < len(fsyncs) <= 1 + 200 // 64 + 1
+
+
+def test_writer_drop_policy_counts_overflow(tmp_path, monkeypatch):
+    writer = AuditWriter(max_queue=2, overflow="drop")
+    gate = threading.Event()
+    original = writer._write_batch
+    monkeypatch.setattr(writer, "_write_batch", lambda b: (gate.wait(5), original(b)))
+    path = str(tmp_path / "audit.log")
+    writer.start()
+    try:
+        for i in range(20):
+            writer.write(path, str(i))
+        assert writer.dropped > 0
+    finally:
+        gate.set()
+        writer.stop()
+    written = open(path).read().splitlines()
+    assert len(written) + writer.dropped == 20
+
+
+def test_stop_timeout_keeps_writes_ordered_behind_the_worker(tmp_path, monkeypatch):
+    writer = AuditWriter()
+    gate = threading.Event()
+    original = writer._write_batch
+    monkeypatch.setattr(writer, "_write_batch", lambda b: (gate.wait(5), original(b)))
+    path = tmp_path / "audit.log"
+    writer.start()
+    writer.write(str(path), "first")
+    writer.stop(timeout=0.05)
+    # The worker still owns the file, so later events queue behind it
+    assert writer.running
+    writer.write(str(path), "second")
+    assert not path.exists()
+    gate.set()
+    writer.stop()
+    assert not writer.running
+    assert path.read_text().splitlines() == ["first", "second"]
+
+
+def test_writer_is_synchronous_when_not_started(tmp_path):
+    path = tmp_path / "audit.log"
+    AuditWriter().write(str(path), "{}")
+    assert path.read_text() == "{}\n"
+
+
+def _event(ts, stack, intent="i", event="intent_success"):
+    return json.dumps({"ts": ts, "event": event, "intent": intent, "stack": stack})
+
+
+def test_writer_rotates_and_seals_segments(tmp_path):
+    path = str(tmp_path / "audit.log")
+    writer = AuditWriter(batch_size=1, max_bytes=200)
+    writer.start()
+    try:
+        for i in range(20):
+            writer.write(path, _event(1000 + i, "media"))
+            writer.flush()
+    finally:
+        writer.stop()
+    segments = list_segments(path)
+    assert len(segments) >= 2
+    for name, index in segments:
+        assert name.endswith(".gz")
+        assert index is not None and index.stacks == {"media"}
+    # Nothing lost or duplicated across rotation
+    assert [e["ts"] for e in query(path)] == [1000 + i for i in range(20)]
+
+
+def test_query_skips_segments_ruled_out_by_index(tmp_path, monkeypatch):
+    path = tmp_path / "audit.log"
+    path.write_text(_event(100, "media") + "\n" + _event(110, "media") + "\n")
+    seal_segment(rotate_file(str(path)))
+    path.write_text(_event(200, "nas", intent="backup") + "\n")
+    seal_segment(rotate_file(str(path)), compression="none")
+    path.write_text(_event(300, "media") + "\n")
+
+    opened = []
+    real_open = auditmod._open_text
+    monkeypatch.setattr(auditmod, "_open_text", lambda n: (opened.append(n), real_open(n))[1])
+
+    assert [e["ts"] for e in query(str(path), stack="nas")] == [200]
+    assert len(opened) == 2  # the nas segment and the active file
+    opened.clear()
+    assert [e["ts"] for e in query(str(path), since=105, until=250)] == [110, 200]
+    assert len(opened) == 3
+    opened.clear()
+    assert [e["ts"] for e in query(str(path), stack="media", limit=2)] == [100, 110]
+
+
+def test_query_reads_segment_before_it_is_sealed(tmp_path):
+    path = tmp_path / "audit.log"
+    path.write_text(_event(1, "media") + "\n")
+    segment = rotate_file(str(path))
+    assert list_segments(str(path)) == [(segment, None)]
+    assert [e["ts"] for e in query(str(path), stack="media")] == [1]
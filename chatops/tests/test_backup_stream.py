@@ -0,0 +1,57 @@
+import gzip
+import hashlib
+import os
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from chatops import backup_stream
+from chatops.backup_stream import pick_compression, write_checksum_file, write_compressed
+from chatops.streaming import stream_stdout
+
+
+@pytest.mark.parametrize("pigz", [None, "real"])
+def test_gzip_stream_roundtrip_with_checksum(tmp_path, monkeypatch, pigz):
+    if pigz is None:
+        monkeypatch.setattr(backup_stream, "PIGZ", None)
+    elif not backup_stream.PIGZ:
+        pytest.skip("pigz not installed")
+    chunks = [os.urandom(1000) + b"x" * 100000 for _ in range(5)]
+    dest = tmp_path / "db.tar.gz"
+    info = write_compressed(iter(chunks), str(dest), "gzip")
+    data = dest.read_bytes()
+    assert gzip.decompress(data) == b"".join(chunks)
+    assert info["sha256"] == hashlib.sha256(data).hexdigest()
+    assert (info["bytes_in"], info["bytes_out"]) == (sum(map(len, chunks)), len(data))
+    sidecar = write_checksum_file(str(dest), info["sha256"])
+    assert open(sidecar).read() == f"{info['sha256']}  db.tar.gz\n"
+
+
+def test_failed_stream_leaves_no_file(tmp_path):
+    def broken():
+        yield b"partial"
+        raise subprocess.CalledProcessError(1, ["docker", "cp"], stderr="No such container")
+
+    with pytest.raises(subprocess.CalledProcessError):
+        write_compressed(broken(), str(tmp_path / "db.tar.gz"), "gzip")
+    assert os.listdir(tmp_path) == []
+
+
+def test_pick_compression_refuses_zstd_without_zstandard(monkeypatch):
+    monkeypatch.setattr(backup_stream, "HAVE_ZSTD", False)
+    with pytest.raises(ValueError, match="zstandard"):
+        pick_compression("zstd")
+    assert pick_compression(None) == "gzip"
+    assert pick_compression("none") == "none"
+    monkeypatch.setattr(backup_stream, "HAVE_ZSTD", True)
+    assert pick_compression("ZSTD") == "zstd"
+
+
+def test_stream_stdout_yields_raw_bytes_and_raises_on_failure():
+    assert b"".join(stream_stdout([sys.executable, "-c", "print('a' * 5)"], 2)) == b"aaaaa\n"
+    argv = [sys.executable, "-c", "import sys; print('x'); sys.stderr.write('boom'); sys.exit(3)"]
+    with pytest.raises(subprocess.CalledProcessError) as e:
+        list(stream_stdout(argv))
+    assert e.value.returncode == 3 and e.value.stderr == "boom"
@@ -0,0 +1,117 @@
+import os
+import sys
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from chatops.catalog import BackupCatalog, RetentionPolicy
+from chatops.state_store import StateStore
+
+
+def _ts(day, hour=0):
+    return datetime(2024, 1, day, hour, tzinfo=timezone.utc).timestamp()
+
+
+def _entries(stamps):
+    return [{"id": i, "created_at": t} for i, t in enumerate(stamps)]
+
+
+def test_gfs_keeps_newest_per_bucket():
+    # Two backups a day for the 1st..14th of January 2024 (a Monday)
+    entries = _entries([_ts(d, h) for d in range(1, 15) for h in (1, 13)])
+    policy = RetentionPolicy(keep_daily=3, keep_weekly=2)
+    kept = {e["id"] for e in entries} - {
+        e["id"] for e in policy.select_expired(entries, now=_ts(15))
+    }
+    kept_stamps = sorted(
+        datetime.fromtimestamp(entries[i]["created_at"], timezone.utc).strftime("%d %H")
+        for i in kept
+    )
+    # Daily: 14th, 13th, 12th; weekly: week 2 (14th, already kept) and week 1 (7th)
+    assert kept_stamps == ["07 13", "12 13", "13 13", "14 13"]
+
+
+def test_empty_policy_keeps_everything():
+    entries = _entries([_ts(1), _ts(2)])
+    assert RetentionPolicy().select_expired(entries) == []
+    assert RetentionPolicy(keep_within_days=1.5).select_expired(entries, now=_ts(3)) == [
+        entries[0]
+    ]
+
+
+def test_prune_removes_expired_files_and_keeps_shared_paths(tmp_path):
+    catalog = BackupCatalog(StateStore(str(tmp_path / "state.db")))
+    old = tmp_path / "plex_db_backup_1.tar.gz"
+    old.write_bytes(b"x")
+    (tmp_path / "plex_db_backup_1.tar.gz.sha256").write_text("abc\n")
+    catalog.record("plex", "plex", str(old), created_at=_ts(1))
+    new = tmp_path / "plex_db_backup_2.tar.gz"
+    new.write_bytes(b"y")
+    catalog.record("plex", "plex", str(new), created_at=_ts(2))
+    # A mirror destination recorded by every run stays while any run keeps it
+    mirror = tmp_path / "mirror"
+    mirror.mkdir()
+    catalog.record("volumes", "docker_volumes", str(mirror), created_at=_ts(1))
+    catalog.record("volumes", "docker_volumes", str(mirror), created_at=_ts(2))
+
+    result = catalog.prune("plex", RetentionPolicy(keep_last=1), now=_ts(3))
+    assert result["deleted"] == [str(old)]
+    assert sorted(p for p in os.listdir(tmp_path) if not p.startswith("state.db")) == [
+        "mirror", "plex_db_backup_2.tar.gz"
+    ]
+    assert [e["path"] for e in catalog.list(intent="plex")] == [str(new)]
+    assert len(catalog.list(intent="plex", include_deleted=True)) == 2
+
+    assert catalog.prune("volumes", RetentionPolicy(keep_last=1))["expired"] == 1
+    assert mirror.exists()
+
+
+def test_import_existing_runs_once(tmp_path):
+    catalog = BackupCatalog(StateStore(str(tmp_path / "state.db")))
+    backups = tmp_path / "backups"
+    backups.mkdir()
+    for name in ("plex_db_backup_1.tar.gz", "plex_db_backup_1.tar.gz.sha256", "other.txt"):
+        (backups / name).write_bytes(b"x")
+    assert catalog.import_existing("plex", "plex", str(backups), "plex_db_backup_", None) == 1
+    assert catalog.import_existing("plex", "plex", str(backups), "plex_db_backup_", None) == 0
+    assert [e["size"] for e in catalog.list(intent="plex")] == [1]
+
+
+def test_time_only_policy_keeps_newest_and_never_deletes_mirror(tmp_path):
+    catalog = BackupCatalog(StateStore(str(tmp_path / "state.db")))
+    mirror = tmp_path / "mirror"
+    mirror.mkdir()
+    for day in (1, 5, 9):
+        catalog.record(
+            "volumes", "docker_volumes", str(mirror), created_at=_ts(day), meta={"mirror": True}
+        )
+    # Backups paused: every run is older than the window
+    result = catalog.prune("volumes", RetentionPolicy(keep_within_days=30), now=_ts(9) + 40 * 86400)
+    assert result["expired"] == 2 and result["deleted"] == []
+    assert mirror.exists()
+    assert [e["created_at"] for e in catalog.list(intent="volumes")] == [_ts(9)]
+
+    snapshot = tmp_path / "2024-01-09T000000Z"
+    snapshot.mkdir()
+    catalog.record("snapshots", "docker_volumes", str(snapshot), created_at=_ts(9))
+    catalog.prune("snapshots", RetentionPolicy(keep_within_days=1), now=_ts(9) + 90 * 86400)
+    assert snapshot.exists()
+
+
+def test_prune_keeps_rows_whose_removal_is_not_confirmed(tmp_path):
+    catalog = BackupCatalog(StateStore(str(tmp_path / "state.db")))
+    # Recorded with a path that does not exist on this host
+    catalog.record("vms", "vm_proxmox", "/mnt/pve/nas/dump/vzdump-qemu-100.vma.zst",
+                   created_at=_ts(1))
+    catalog.record("vms", "vm_proxmox", "/mnt/pve/nas/dump/vzdump-qemu-101.vma.zst",
+                   created_at=_ts(2))
+    result = catalog.prune("vms", RetentionPolicy(keep_last=1))
+    assert result["deleted"] == []
+    assert result["missing"] == ["/mnt/pve/nas/dump/vzdump-qemu-100.vma.zst"]
+    assert len(catalog.list(intent="vms")) == 2
+
+    removed = []
+    result = catalog.prune(
+        "vms", RetentionPolicy(keep_last=1), remove=lambda e: removed.append(e["path"]) or True
+    )
+    assert removed == result["deleted"] == ["/mnt/pve/nas/dump/vzdump-qemu-100.vma.zst"]
+    assert len(catalog.list(intent="vms")) == 1
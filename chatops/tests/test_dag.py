@@ -0,0 +1,77 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from chatops.dag import CycleError, DagExecutor, topological_order
+
+
+def test_topological_order_respects_dependencies():
+    graph = {"full": ["content", "media"], "content": [], "media": ["base"], "base": []}
+    order = topological_order(graph)
+    assert order.index("base") < order.index("media") < order.index("full")
+    assert order.index("content") < order.index("full")
+
+
+def test_topological_order_reports_cycle():
+    with pytest.raises(CycleError) as exc:
+        topological_order({"a": ["b"], "b": ["c"], "c": ["a"], "d": []})
+    assert set(exc.value.cycle) == {"a", "b", "c"}
+    assert exc.value.cycle[0] == exc.value.cycle[-1]
+
+
+def test_executor_runs_ready_siblings_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+    ran = []
+
+    def fn(node):
+        if node in ("content", "media"):
+            barrier.wait()
+        ran.append(node)
+        return {"ok": True}
+
+    graph = {"content": [], "media": [], "full": ["content", "media"]}
+    results = DagExecutor(max_parallel=2).run(graph, fn)
+    assert all(r["ok"] for r in results.values())
+    assert ran[-1] == "full"
+
+
+def test_executor_serializes_shared_keys():
+    active = []
+    overlap = []
+    lock = threading.Lock()
+
+    def fn(node):
+        with lock:
+            active.append(node)
+            if len(active) > 1:
+                overlap.append(tuple(active))
+        time.sleep(0.02)
+        with lock:
+            active.remove(node)
+        return {"ok": True}
+
+    graph = {"a": [], "b": [], "c": []}
+    DagExecutor(max_parallel=3).run(graph, fn, keys=lambda n: ["stack-media"])
+    assert overlap == []
+
+
+def test_executor_failure_policies():
+    graph = {"a": [], "b": ["a"], "c": ["b"], "d": []}
+
+    def fn(node):
+        return {"ok": node != "a"}
+
+    blocked = DagExecutor(max_parallel=1, on_failure="block_dependents").run(graph, fn)
+    assert blocked["b"]["error"] == "Dependency failed: a"
+    assert blocked["c"]["error"] == "Dependency failed: b"
+    assert blocked["d"]["ok"] is True
+
+    stopped = DagExecutor(max_parallel=1, on_failure="stop").run(graph, fn)
+    assert stopped["d"]["skipped"] is True
+
+    continued = DagExecutor(max_parallel=1, on_failure="continue").run(graph, fn)
+    assert continued["c"]["ok"] is True
@@ -0,0 +1,133 @@
+import io
+import json
+import os
+import socketserver
+import sys
+import tarfile
+import threading
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from chatops.docker_api import DockerAPIError, DockerEngine, socket_path
+from chatops.images import ComposeSpec, ServiceSpec, changed_services, local_image_ids
+
+CONTAINERS = [
+    {
+        "Id": "c1",
+        "ImageID": "sha256:aaa",
+        "State": "running",
+        "Labels": {
+            "com.docker.compose.project": "media",
+            "com.docker.compose.service": "plex",
+            "com.docker.compose.config-hash": "abc",
+        },
+    },
+]
+
+
+def _tar_bytes():
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w") as tar:
+        data = b"SQLite format 3\0" * 1000
+        info = tarfile.TarInfo("Databases/com.plexapp.plugins.library.db")
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+class _EngineHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/json"):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        self.server.connections.add(id(self.connection))
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path == "/_ping":
+            self._send(200, b"OK", "text/plain")
+        elif url.path == "/containers/json":
+            labels = json.loads(query["filters"][0])["label"]
+            project = labels[0].split("=", 1)[1]
+            self._send(200, [
+                c for c in CONTAINERS if c["Labels"]["com.docker.compose.project"] == project
+            ])
+        elif url.path == "/images/plexinc/pms-docker:latest/json":
+            self._send(200, {"Id": "sha256:aaa"})
+        elif url.path.startswith("/images/"):
+            self._send(404, {"message": "No such image"})
+        elif url.path == "/containers/plex/archive" and query["path"] == ["/config/Databases"]:
+            self._send(200, _tar_bytes(), "application/x-tar")
+        else:
+            self._send(404, {"message": "No such container"})
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+@pytest.fixture
+def engine(tmp_path):
+    sock = str(tmp_path / "docker.sock")
+    server = _UnixHTTPServer(sock, _EngineHandler)
+    server.requests = []
+    server.connections = set()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = DockerEngine(sock)
+    client.server = server
+    yield client
+    client.close()
+    server.shutdown()
+    server.server_close()
+
+
+def test_socket_path_from_docker_host():
+    assert socket_path("unix:///run/user/1000/docker.sock") == "/run/user/1000/docker.sock"
+    assert socket_path("tcp://10.0.0.5:2375") == "/var/run/docker.sock"
+
+
+def test_inspection_reuses_one_connection(engine):
+    assert engine.ping()
+    assert engine.image_id("plexinc/pms-docker:latest") == "sha256:aaa"
+    assert engine.compose_containers("media") == {"plex": [("abc", "sha256:aaa", True)]}
+    with pytest.raises(DockerAPIError) as e:
+        engine.image_id("missing:latest")
+    assert e.value.status == 404
+    assert len(engine.server.connections) == 1
+
+
+def test_change_detection_over_engine(engine):
+    spec = ComposeSpec("media", {"plex": ServiceSpec("abc", "plexinc/pms-docker:latest", 1)})
+
+    def no_cli(argv):
+        raise AssertionError(f"CLI used: {argv}")
+
+    assert changed_services(no_cli, spec, "/opt/stacks/media/docker-compose.yml", engine) == []
+    assert local_image_ids(no_cli, ["plexinc/pms-docker:latest"], engine) == {
+        "plexinc/pms-docker:latest": "sha256:aaa"
+    }
+    spec.services["plex"].config_hash = "changed"
+    assert changed_services(no_cli, spec, "/x.yml", engine) == ["plex"]
+
+
+def test_get_archive_streams_the_container_tar(engine):
+    data = b"".join(engine.get_archive("plex", "/config/Databases"))
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r") as tar:
+        db = tar.extractfile("Databases/com.plexapp.plugins.library.db")
+        assert db is not None and db.read().startswith(b"SQLite format 3")
+    with pytest.raises(DockerAPIError):
+        list(engine.get_archive("nope", "/config"))
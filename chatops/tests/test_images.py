@@ -0,0 +1,119 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from chatops.images import (
+    ComposeSpecCache,
+    changed_services,
+    compose_images,
+    local_image_ids,
+    prefetch_matches,
+    prefetch_record,
+    resolve_spec,
+)
+
+
+def _runner(outputs):
+    calls = []
+
+    def run(argv):
+        calls.append(argv)
+        out = outputs.get(argv[1] + ":" + argv[-1] if argv[1] == "image" else argv[1])
+        if isinstance(out, Exception):
+            raise out
+        return out
+
+    return run, calls
+
+
+def test_compose_images_and_ids():
+    run, calls = _runner({
+        "compose": "ollama/ollama:latest\nghcr.io/open-webui/open-webui:main\n"
+        "ollama/ollama:latest\n",
+        "image:ollama/ollama:latest": "sha256:bbb\nsha256:aaa\n",
+    })
+    refs = compose_images(run, "/opt/stacks/ai/docker-compose.yml")
+    assert refs == ["ghcr.io/open-webui/open-webui:main", "ollama/ollama:latest"]
+    assert local_image_ids(run, refs) == {
+        "ghcr.io/open-webui/open-webui:main": "sha256:bbb",
+        "ollama/ollama:latest": "sha256:aaa",
+    }
+    assert calls[1][:4] == ["docker", "image", "inspect", "--format"]
+
+
+def test_missing_local_image_raises():
+    run, _ = _runner({"image:b": subprocess.CalledProcessError(1, "docker")})
+    with pytest.raises(subprocess.CalledProcessError):
+        local_image_ids(run, ["a", "b"])
+    run, _ = _runner({"image:b": "sha256:aaa\n"})
+    with pytest.raises(ValueError):
+        local_image_ids(run, ["a", "b"])
+
+
+def test_prefetch_matches_requires_same_images_and_fresh_record():
+    record = prefetch_record("/c.yml", {"a": "sha256:1"})
+    now = record["pulled_at"]
+    assert prefetch_matches(record, "/c.yml", {"a": "sha256:1"}, max_age=60, now=now + 10)
+    assert not prefetch_matches(record, "/c.yml", {"a": "sha256:2"}, max_age=60, now=now)
+    assert not prefetch_matches(
+        record, "/c.yml", {"a": "sha256:1", "b": "sha256:3"}, max_age=60, now=now
+    )
+    assert not prefetch_matches(record, "/other.yml", {"a": "sha256:1"}, max_age=60, now=now)
+    assert not prefetch_matches(record, "/c.yml", {"a": "sha256:1"}, max_age=60, now=now + 61)
+    assert not prefetch_matches(None, "/c.yml", {"a": "sha256:1"}, max_age=60)
+
+
+def _compose_runner(containers, image_id="sha256:new", hashes="web abc\n"):
+    calls = []
+
+    def run(argv):
+        calls.append(argv)
+        if "--hash" in argv:
+            return hashes
+        if "--format" in argv and "json" in argv:
+            return json.dumps(
+                {"name": "site", "services": {"web": {"image": "nginx:1", "scale": 2}}}
+            )
+        if "ps" in argv:
+            return "\n".join(f"c{i}" for i in range(len(containers)))
+        if argv[1] == "inspect":
+            return "\n".join(containers)
+        if argv[1:3] == ["image", "inspect"]:
+            return image_id
+        raise AssertionError(argv)
+
+    return run, calls
+
+
+def test_changed_services_detects_noop_and_drift(tmp_path):
+    compose = str(tmp_path / "docker-compose.yml")
+    specs = resolve_spec(_compose_runner([])[0], compose)
+    web = specs.services["web"]
+    assert specs.project == "site"
+    assert (web.config_hash, web.image, web.replicas) == ("abc", "nginx:1", 2)
+    same = ["web abc sha256:new true", "web abc sha256:new true"]
+    assert changed_services(_compose_runner(same)[0], specs, compose) == []
+    for containers in (
+        ["web abc sha256:new true", "web old sha256:new true"],  # config changed
+        ["web abc sha256:new true", "web abc sha256:old true"],  # newer image pulled
+        ["web abc sha256:new true", "web abc sha256:new false"],  # stopped
+        ["web abc sha256:new true"],  # scaled away from the spec
+    ):
+        assert changed_services(_compose_runner(containers)[0], specs, compose) == ["web"]
+
+
+def test_spec_cache_reresolves_on_file_change(tmp_path):
+    compose = tmp_path / "docker-compose.yml"
+    compose.write_text("services: {}\n")
+    run, calls = _compose_runner([])
+    cache = ComposeSpecCache()
+    first = cache.get(run, str(compose))
+    assert cache.get(run, str(compose)) is first
+    assert len(calls) == 2
+    (tmp_path / ".env").write_text("TAG=2\n")
+    assert cache.get(run, str(compose)) is not first
+    assert len(calls) == 4
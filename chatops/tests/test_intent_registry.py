@@ -0,0 +1,79 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+import chatops.main as appmod
+from chatops.intent_registry import IntentRegistry
+
+SCALE_YAML = """# Scale plex
+label_required: approved-by-gemini
+action: scale
+stack: stack-media
+service: plex
+replicas: {replicas}
+"""
+
+
+def _write(path, text, mtime_ns=None):
+    path.write_text(text)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def _registry(tmp_path):
+    return IntentRegistry(str(tmp_path), lambda raw: appmod.Intent(**raw), recheck_seconds=0)
+
+
+def test_registry_parses_once_and_reads_description(tmp_path, monkeypatch):
+    _write(tmp_path / "scale.yaml", SCALE_YAML.format(replicas=2))
+    reg = _registry(tmp_path)
+
+    entry = reg.get("scale")
+    assert entry.description == "Scale plex"
+    assert entry.intent.replicas == 2
+
+    # Unchanged file must be served from cache without re-reading
+    def no_parse(*a, **k):
+        raise AssertionError("intent re-parsed")
+
+    monkeypatch.setattr("chatops.intent_registry.yaml.safe_load_all", no_parse)
+    assert reg.get("scale") is entry
+
+
+def test_registry_invalidates_on_change_and_removal(tmp_path):
+    path = tmp_path / "scale.yaml"
+    _write(path, SCALE_YAML.format(replicas=2), mtime_ns=1_000_000_000)
+    reg = _registry(tmp_path)
+    assert reg.get("scale").intent.replicas == 2
+
+    _write(path, SCALE_YAML.format(replicas=5), mtime_ns=2_000_000_000)
+    assert reg.get("scale").intent.replicas == 5
+
+    path.unlink()
+    with pytest.raises(FileNotFoundError):
+        reg.get("scale")
+
+
+def test_registry_caches_validation_errors(tmp_path):
+    _write(tmp_path / "bad.yaml", "action: explode\nstack: x\n")
+    reg = _registry(tmp_path)
+    entry = reg.get("bad")
+    assert entry.error is not None
+    with pytest.raises(Exception) as exc:
+        _ = entry.intent
+    assert exc.value is entry.error
+
+
+def test_registry_expands_multi_document_bundle(tmp_path):
+    docs = "\n---\n".join(
+        f"label_required: approved-by-gemini\naction: rollout\nstack: {stack}"
+        for stack in ("stack-ai", "stack-media")
+    )
+    _write(tmp_path / "all.yaml", "# All stacks\n" + docs)
+    entry = _registry(tmp_path).get("all")
+    assert entry.is_bundle
+    assert [i.stack for i in entry.intents] == ["stack-ai", "stack-media"]
+    with pytest.raises(ValueError):
+        _ = entry.intent
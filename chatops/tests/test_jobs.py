@@ -0,0 +1,37 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from chatops.jobs import Job, JobManager
+
+
+def test_job_output_cursor_survives_eviction():
+    job = Job("j1", "intent", max_output_lines=3)
+    job.append_output("a\nb")
+    lines, cursor = job.output_since(0)
+    assert (lines, cursor) == (["a", "b"], 2)
+
+    job.append_output("c\nd\ne")
+    lines, cursor = job.output_since(cursor)
+    # "a" and "b" were evicted; only unseen lines are returned
+    assert (lines, cursor) == (["c", "d", "e"], 5)
+
+
+def test_job_manager_records_failure():
+    jobs = JobManager(max_workers=1)
+    try:
+        def boom(job):
+            job.append_output("starting")
+            raise RuntimeError("kaput")
+
+        job = jobs.submit("intent", boom)
+        try:
+            job.future.result(timeout=5)
+        except RuntimeError:
+            pass
+        assert job.status == "failed"
+        assert job.error == "kaput"
+        assert job.status_code == 500
+        assert job.output_since(0)[0] == ["starting"]
+    finally:
+        jobs.shutdown(wait=True)
@@ -0,0 +1,91 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from chatops.locks import StackLockManager
+
+
+def _start(target, *args):
+    t = threading.Thread(target=target, args=args)
+    t.start()
+    return t
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+def test_identical_pending_requests_coalesce():
+    locks = StackLockManager()
+    release = threading.Event()
+    runs = []
+    results = []
+
+    def first():
+        runs.append("first")
+        release.wait(timeout=5)
+        return {"ok": True, "run": 1}
+
+    def rollout():
+        runs.append("rollout")
+        return {"ok": True, "run": 2}
+
+    blocker = _start(lambda: locks.run("stack-media", "other", first))
+    _wait_for(lambda: runs == ["first"])
+
+    # A push storm: five identical rollouts arrive while the stack is busy
+    storm = [
+        _start(lambda: results.append(locks.run("stack-media", "rollout", rollout)))
+        for _ in range(5)
+    ]
+    _wait_for(lambda: locks.snapshot()["stack-media"]["waiters"] == 6)
+    release.set()
+    for t in [blocker, *storm]:
+        t.join(timeout=5)
+
+    assert runs == ["first", "rollout"]
+    assert len(results) == 5
+    assert all(res == {"ok": True, "run": 2} for res, _ in results)
+    assert sum(1 for _, info in results if info["coalesced"]) == 4
+    assert locks.snapshot() == {}
+
+
+def test_different_intents_run_in_fifo_order():
+    locks = StackLockManager()
+    release = threading.Event()
+    order = []
+
+    def job(name):
+        def fn():
+            if name == "a":
+                release.wait(timeout=5)
+            order.append(name)
+        return fn
+
+    threads = [_start(lambda: locks.run("stack-ai", "a", job("a")))]
+    _wait_for(lambda: locks.snapshot().get("stack-ai", {}).get("running"))
+    for name in ("b", "c"):
+        threads.append(_start(lambda n=name: locks.run("stack-ai", n, job(n))))
+        _wait_for(lambda n=name: locks.snapshot()["stack-ai"]["pending"] == ord(n) - ord("a"))
+    release.set()
+    for t in threads:
+        t.join(timeout=5)
+    assert order == ["a", "b", "c"]
+
+
+def test_failure_releases_lock():
+    locks = StackLockManager()
+
+    def boom():
+        raise RuntimeError("compose failed")
+
+    with pytest.raises(RuntimeError):
+        locks.run("stack-media", "x", boom)
+    assert locks.run("stack-media", "x", lambda: 42)[0] == 42
@@ -1,11 +1,19 @@
+import gzip
 import hashlib
 import hmac
+import io
 import json
 import os
+import shutil
 import subprocess
 import sys
+import tarfile
+import threading
+import time
 import types
 
+import pytest
+
 try:
     from fastapi.testclient import TestClient
 except ImportError as e:
@@ -17,12 +25,35 @@ except ImportError as e:
 # Ensure repository root is on sys.path for package imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 import chatops.main as appmod
+from chatops.proxmox import Guest
+from chatops.streaming import CommandResult
 
 
 def make_client():
+    # Rate limit buckets are process-wide; start each test with a fresh window
+    appmod.limiter.reset()
     return TestClient(appmod.app)
 
 
+def _fake_commands(monkeypatch, fake_run):
+    """Route every command through a ``subprocess.run``-style fake.
+
+    Covers both plain ``subprocess.run`` calls and the streaming executor, so
+    fakes keep their simple ``fake_run(argv, check, capture_output, text)`` shape.
+    """
+
+    def fake_streaming(argv, on_line=None, **kwargs):
+        cp = fake_run(argv, check=True, capture_output=True, text=True)
+        out = getattr(cp, "stdout", "") or ""
+        if on_line:
+            for line in out.splitlines():
+                on_line(line)
+        return CommandResult(argv, 0, out, "")
+
+    monkeypatch.setattr(appmod.subprocess, "run", fake_run)
+    monkeypatch.setattr(appmod, "run_streaming", fake_streaming)
+
+
 def test_healthz_ok():
     client = make_client()
     r = client.get("/healthz")
@@ -48,7 +79,7 @@ def test_run_scale_happy_path(monkeypatch):
         cp.stdout = "OK"
         return cp
 
-    monkeypatch.setattr(appmod.subprocess, "run", fake_run)
+    _fake_commands(monkeypatch, fake_run)
 
     client = make_client()
     r = client.post("/run", headers={"x-api-key": "secret"}, json={"name": "scale_stack"})
@@ -57,6 +88,26 @@ def test_run_scale_happy_path(monkeypatch):
     assert "OK" in r.json()["stdout"]
 
 
+
+def test_run_reports_phase_timings(monkeypatch):
+    monkeypatch.setenv("CHATOPS_API_KEY", "secret")
+
+    def fake_run(argv, check=True, capture_output=True, text=True):
+        return types.SimpleNamespace(stdout="OK")
+
+    _fake_commands(monkeypatch, fake_run)
+    client = make_client()
+    r = client.post("/run", headers={"x-api-key": "secret"}, json={"name": "rollout_stack"})
+    assert r.status_code == 200
+    timings = r.json()["timings"]
+    for name in ("load", "authz", "lock_wait", "exec", "audit", "total"):
+        assert timings[name] >= 0
+    assert set(timings["steps"]) == {"pull", "up"}
+
+    text = client.get("/metrics").text
+    assert 'chatops_intent_phase_seconds_count{action="rollout",phase="exec",step="pull"}' in text
+
+
 def test_ip_allowlist_denies(monkeypatch):
     monkeypatch.setenv("CHATOPS_API_KEY", "secret")
     monkeypatch.setenv("CHATOPS_IP_ALLOWLIST", "10.0.0.0/8")
@@ -78,7 +129,7 @@ def test_ip_allowlist_allows(monkeypatch):
         cp.stdout = "OK"
         return cp
 
-    monkeypatch.setattr(appmod.subprocess, "run", fake_run)
+    _fake_commands(monkeypatch, fake_run)
 
     client = make_client()
     headers = {"x-api-key": "secret", "x-forwarded-for": "192.168.1.10"}
@@ -87,7 +138,6 @@ def test_ip_allowlist_allows(monkeypatch):
     assert r.json()["ok"] is True
 
 
-```python
 def test_backup_plex_database(tmp_path, monkeypatch):
     """Test backup action for Plex database with dry_run."""
     monkeypatch.setenv("CHATOPS_API_KEY", "secret")
@@ -104,6 +154,7 @@ def test_backup_plex_database(tmp_path, monkeypatch):
         )
         destination = str(tmp_path / "backups")
         retention_days = 30
+        compress = None
         backup_type = None
         service = None
         replicas = None
@@ -119,7 +170,7 @@ def test_backup_plex_database(tmp_path, monkeypatch):
         cp.stdout = "OK"
         return cp
     
-    monkeypatch.setattr(appmod.subprocess, "run", fake_run)
+    _fake_commands(monkeypatch, fake_run)
     
     client = make_client()
     r = client.post(
@@ -133,6 +184,330 @@ def test_backup_plex_database(tmp_path, monkeypatch):
     assert data["dry_run"] is True
     assert "backup_type" in data or "plex" in data.get("stdout", "")
 
+
+def test_backup_plex_database_streams_into_destination(tmp_path, monkeypatch):
+    monkeypatch.setenv("CHATOPS_API_KEY", "secret")
+    intent = appmod.Intent(
+        action="backup",
+        stack="stack-media",
+        database_type="plex",
+        source_container="plex",
+        source_path="/config/Databases",
+        destination=str(tmp_path / "backups"),
+        keep_last=1,
+    )
+    monkeypatch.setattr(appmod, "load_intent", lambda name: intent)
+    monkeypatch.setattr(appmod, "STATE_DIR", str(tmp_path / "state"))
+    streamed = []
+
+    def fake_stream(argv):
+        streamed.append(argv)
+        yield b"tar-bytes" * 1000
+
+    monkeypatch.setattr(appmod, "stream_stdout", fake_stream)
+    client = make_client()
+    r = client.post("/run", headers={"x-api-key": "secret"}, json={"name": "backup_plex_database"})
+    assert r.status_code == 200
+    data = r.json()
+    assert streamed == [["docker", "cp", "plex:/config/Databases", "-"]]
+    with open(data["backup_path"], "rb") as f:
+        assert gzip.decompress(f.read()) == b"tar-bytes" * 1000
+    assert sorted(os.listdir(tmp_path / "backups")) == sorted(
+        [os.path.basename(data["backup_path"]), os.path.basename(data["backup_path"]) + ".sha256"]
+    )
+
+    listed = client.get("/backups", headers={"x-api-key": "secret"}).json()["backups"]
+    assert [(b["id"], b["path"], b["sha256"]) for b in listed] == [
+        (data["backup_id"], data["backup_path"], data["sha256"])
+    ]
+    # The pre-catalog import must not record this run's archive a second time
+    assert [b["id"] for b in appmod._catalog().list(include_deleted=True)] == [data["backup_id"]]
+
+
+def test_backup_verification_runs_in_background(tmp_path, monkeypatch):
+    monkeypatch.setenv("CHATOPS_API_KEY", "secret")
+    intent = appmod.Intent(
+        action="backup",
+        stack="stack-media",
+        database_type="plex",
+        source_container="plex",
+        source_path="/config/Databases",
+        destination=str(tmp_path / "backups"),
+        verify="full",
+    )
+    monkeypatch.setattr(appmod, "load_intent", lambda name: intent)
+    monkeypatch.setattr(appmod, "STATE_DIR", str(tmp_path / "state"))
+    payload = b"SQLite format 3" * 100
+
+    def fake_stream(argv):
+        buf = io.BytesIO()
+        with tarfile.open(fileobj=buf, mode="w") as tar:
+            info = tarfile.TarInfo("Databases/library.db")
+            info.size = len(payload)
+            tar.addfile(info, io.BytesIO(payload))
+        yield buf.getvalue()
+
+    monkeypatch.setattr(appmod, "stream_stdout", fake_stream)
+    # Every /run worker but the one serving this request is busy; verification
+    # has its own pool, so it still completes
+    jobs = appmod.JobManager(max_workers=2)
+    monkeypatch.setattr(appmod, "JOBS", jobs)
+    release = threading.Event()
+    jobs.submit("busy", lambda job: release.wait(10))
+    client = make_client()
+    headers = {"x-api-key": "secret"}
+    try:
+        data = client.post("/run", headers=headers, json={"name": "backup_plex_database"}).json()
+        assert jobs.get(data["verify_job"]) is None
+        verified = appmod.VERIFY_JOBS.get(data["verify_job"]).future.result(timeout=5)
+    finally:
+        release.set()
+        jobs.shutdown()
+    assert verified["ok"] is True and verified["sha256"] == data["sha256"]
+    assert client.get(f"/jobs/{data['verify_job']}", headers=headers).status_code == 200
+
+    entry = client.get(f"/backups/{data['backup_id']}", headers=headers).json()
+    assert entry["meta"]["verify"]["ok"] is True
+    assert entry["manifest"] == [{
+        "path": "Databases/library.db",
+        "size": len(payload),
+        "sha256": hashlib.sha256(payload).hexdigest(),
+    }]
+    assert client.get("/backups/999", headers=headers).status_code == 404
+
+
+def test_vm_proxmox_api_backend_backs_up_every_guest(tmp_path, monkeypatch):
+    monkeypatch.setenv("CHATOPS_API_KEY", "secret")
+    intent = appmod.Intent(
+        action="backup", stack="infra", backup_type="vm_proxmox", pool="prod", storage="nas",
+        keep_last=1, verify="full",
+    )
+    monkeypatch.setattr(appmod, "load_intent", lambda name: intent)
+    monkeypatch.setattr(appmod, "STATE_DIR", str(tmp_path))
+    monkeypatch.setattr(appmod, "PROXMOX_URL", "https://pve.lan:8006")
+    monkeypatch.setattr(appmod, "PROXMOX_POLL_SECONDS", 0)
+    submitted, deleted = [], []
+
+    class FakeProxmox:
+        def pool_members(self, pool):
+            return [100, 101]
+
+        def guests(self):
+            return {100: Guest(100, "pve1"), 101: Guest(101, "pve2")}
+
+        def vzdump(self, guest, **options):
+            submitted.append(options)
+            return f"UPID:{guest.node}:{guest.vmid}"
+
+        def task_status(self, node, upid):
+            return {"status": "stopped", "exitstatus": "OK"}
+
+        def task_log(self, node, upid):
+            return [f"INFO: creating vzdump archive '/dump/{upid}.vma.zst'"]
+
+        def delete_volume(self, node, storage, volid):
+            deleted.append((node, storage, volid))
+            return f"UPID:{node}:delete"
+
+    monkeypatch.setattr(appmod, "_proxmox_client", lambda: FakeProxmox())
+    # Prune explicitly below instead of on the job pool
+    prune = appmod._prune_backups
+    monkeypatch.setattr(appmod, "_prune_backups", lambda name=None: [])
+    def no_local_vzdump(argv, **kwargs):
+        raise AssertionError(f"local command used: {argv}")
+
+    _fake_commands(monkeypatch, no_local_vzdump)
+    client = make_client()
+    headers = {"x-api-key": "secret"}
+    data = client.post("/run", headers=headers, json={"name": "backup_vms"}).json()
+    assert sorted((t["vmid"], t["archive"]) for t in data["tasks"]) == [
+        (100, "/dump/UPID:pve1:100.vma.zst"), (101, "/dump/UPID:pve2:101.vma.zst")
+    ]
+    assert {t["verify"] for t in data["tasks"]} == {"skipped: remote archive"}
+    # The catalog prunes; the storage's own retention is switched off
+    assert {o["prune-backups"] for o in submitted} == {"keep-all=1"}
+    assert len(appmod._catalog().list(intent="backup_vms")) == 2
+
+    (result,) = prune("backup_vms")
+    (expired,) = result["deleted"]
+    node = "pve1" if "pve1" in expired else "pve2"
+    assert deleted == [(node, "nas", f"nas:backup/{os.path.basename(expired)}")]
+    assert len(appmod._catalog().list(intent="backup_vms")) == 1
+
+    preview = client.post(
+        "/run", headers=headers, json={"name": "backup_vms", "dry_run": True}
+    ).json()
+    assert preview["guests"] == [100, 101]
+
+    monkeypatch.setattr(appmod, "PROXMOX_URL", "")
+    r = client.post("/run", headers=headers, json={"name": "backup_vms"})
+    assert r.status_code == 400
+
+
+def test_docker_volumes_snapshots_link_previous_run(tmp_path, monkeypatch):
+    monkeypatch.setenv("CHATOPS_API_KEY", "secret")
+    dest = tmp_path / "volumes"
+    intent = appmod.Intent(
+        action="backup",
+        stack="infra",
+        backup_type="docker_volumes",
+        source="/var/lib/docker/volumes",
+        destination=str(dest),
+        snapshot=True,
+    )
+    monkeypatch.setattr(appmod, "load_intent", lambda name: intent)
+    monkeypatch.setattr(appmod, "STATE_DIR", str(tmp_path / "state"))
+    names = iter(["2024-01-01T000000Z", "2024-01-02T000000Z"])
+    monkeypatch.setattr(appmod, "snapshot_name", lambda: next(names))
+    calls = []
+
+    def fake_run(argv, check=True, capture_output=True, text=True):
+        calls.append(argv)
+        os.makedirs(argv[-1], exist_ok=True)
+        return types.SimpleNamespace(stdout="sent 10 bytes")
+
+    _fake_commands(monkeypatch, fake_run)
+    client = make_client()
+    headers = {"x-api-key": "secret"}
+    first = client.post("/run", headers=headers, json={"name": "backup_volumes"}).json()
+    second = client.post("/run", headers=headers, json={"name": "backup_volumes"}).json()
+
+    assert not any(a.startswith("--link-dest") for a in calls[0])
+    assert f"--link-dest={first['snapshot']}" in calls[1]
+    assert calls[1][-1] == str(dest / ".2024-01-02T000000Z.partial") + "/"
+    assert sorted(os.listdir(dest)) == ["2024-01-01T000000Z", "2024-01-02T000000Z", "latest"]
+    assert os.readlink(dest / "latest") == "2024-01-02T000000Z"
+    listed = client.get("/backups?intent=backup_volumes", headers=headers).json()["backups"]
+    assert [b["path"] for b in listed] == [second["snapshot"], first["snapshot"]]
+
+    intent.destination = "rsync://nas/backups/docker-volumes"
+    r = client.post("/run", headers=headers, json={"name": "backup_volumes"})
+    assert r.status_code == 400
+
+
+def test_docker_volumes_sharded_rsync(tmp_path, monkeypatch):
+    monkeypatch.setenv("CHATOPS_API_KEY", "secret")
+    source = tmp_path / "volumes"
+    for volume in ("db", "media", "scratch"):
+        (source / volume / "_data").mkdir(parents=True)
+    (source / "metadata.db").write_bytes(b"x")
+    intent = appmod.Intent(
+        action="backup",
+        stack="infra",
+        backup_type="docker_volumes",
+        source=str(source),
+        destination="rsync://nas/backups/docker-volumes",
+        exclude=["/scratch", "_data/cache"],
+        parallel=4,
+    )
+    monkeypatch.setattr(appmod, "load_intent", lambda name: intent)
+    monkeypatch.setattr(appmod, "STATE_DIR", str(tmp_path / "state"))
+    sizes = {"db": 100, "media": 5000, ".": 1}
+    calls = []
+    lock = threading.Lock()
+
+    def fake_run(argv, check=True, capture_output=True, text=True):
+        volume = os.path.relpath(argv[-2].rstrip("/"), source)
+        with lock:
+            calls.append((volume, argv))
+        if volume == "media" and fail:
+            raise subprocess.CalledProcessError(23, argv, "", "some files vanished")
+        return types.SimpleNamespace(
+            stdout=f"Number of files: 2\nTotal file size: {sizes[volume]:,} bytes\n"
+        )
+
+    _fake_commands(monkeypatch, fake_run)
+    client = make_client()
+    headers = {"x-api-key": "secret"}
+    fail = False
+    data = client.post("/run", headers=headers, json={"name": "backup_volumes"}).json()
+    assert data["shards"] == 3 and data["workers"] == 3
+    assert data["skipped"] == ["scratch"]
+    assert data["stats"] == {"files": 6, "total_size": 5101}
+    by_volume = dict(calls)
+    assert by_volume["media"][-1] == "rsync://nas/backups/docker-volumes/media/"
+    assert by_volume["media"].count("--exclude") == 1
+    assert all("--mkpath" in argv for argv in by_volume.values())
+    assert {"/db/", "/media/", "/scratch/"} <= set(by_volume["."])
+
+    # The second run starts the largest volume first
+    calls.clear()
+    with monkeypatch.context() as m:
+        m.setattr(appmod, "BACKUP_MAX_SHARDS", 1)
+        data = client.post("/run", headers=headers, json={"name": "backup_volumes"}).json()
+    assert [volume for volume, _ in calls] == ["media", "db", "."]
+
+    fail = True
+    r = client.post("/run", headers=headers, json={"name": "backup_volumes"})
+    assert r.status_code == 500
+    assert "1 of 3 rsync shards failed: media:" in r.json()["detail"]
+
+    # A volume removed at the source is no longer protected by the root shard
+    fail = False
+    shutil.rmtree(source / "db")
+    calls.clear()
+    client.post("/run", headers=headers, json={"name": "backup_volumes"})
+    root = dict(calls)["."]
+    assert "/media/" in root and "/db/" not in root
+
+
+@pytest.mark.skipif(not shutil.which("rsync"), reason="rsync not installed")
+def test_sharded_rsync_deletes_volumes_removed_at_source(tmp_path, monkeypatch):
+    monkeypatch.setenv("CHATOPS_API_KEY", "secret")
+    source, dest = tmp_path / "volumes", tmp_path / "nas" / "docker-volumes"
+    for volume in ("db", "media"):
+        (source / volume / "_data").mkdir(parents=True)
+        (source / volume / "_data" / "file").write_text(volume)
+    (source / "metadata.db").write_text("meta")
+    intent = appmod.Intent(
+        action="backup",
+        stack="infra",
+        backup_type="docker_volumes",
+        source=str(source),
+        destination=str(dest),
+        options=["--delete"],
+        parallel=2,
+    )
+    monkeypatch.setattr(appmod, "load_intent", lambda name: intent)
+    monkeypatch.setattr(appmod, "STATE_DIR", str(tmp_path / "state"))
+    client = make_client()
+    headers = {"x-api-key": "secret"}
+    assert client.post("/run", headers=headers, json={"name": "vols"}).status_code == 200
+    assert sorted(os.listdir(dest)) == ["db", "media", "metadata.db"]
+    shutil.rmtree(source / "db")
+    assert client.post("/run", headers=headers, json={"name": "vols"}).status_code == 200
+    assert sorted(os.listdir(dest)) == ["media", "metadata.db"]
+    assert (dest / "media" / "_data" / "file").read_text() == "media"
+
+
+def test_backups_prune_applies_stored_policy(tmp_path, monkeypatch):
+    monkeypatch.setenv("CHATOPS_API_KEY", "secret")
+    monkeypatch.setattr(appmod, "STATE_DIR", str(tmp_path))
+    catalog = appmod._catalog()
+    paths = []
+    for day in range(3):
+        path = tmp_path / f"vol-{day}"
+        path.mkdir()
+        paths.append(path)
+        catalog.record("backup_volumes", "docker_volumes", str(path), created_at=day * 86400)
+    catalog.store.set("retention", "backup_volumes", {"keep_last": 2})
+
+    client = make_client()
+    r = client.post("/backups/prune", headers={"x-api-key": "secret"})
+    assert r.status_code == 200
+    assert r.json()["results"] == [
+        {
+            "intent": "backup_volumes",
+            "expired": 1,
+            "deleted": [str(paths[0])],
+            "missing": [],
+            "errors": [],
+        }
+    ]
+    assert [p.exists() for p in paths] == [False, True, True]
+    assert len(catalog.list(intent="backup_volumes")) == 2
+
+
 def test_backup_missing_type_fields(monkeypatch):
     """Test backup intent with both backup_type and database_type as None returns 400."""
     monkeypatch.setenv("CHATOPS_API_KEY", "secret")
@@ -218,7 +593,7 @@ def test_rollout_happy_path(monkeypatch):
         cp.stdout = "OK"
         return cp
 
-    monkeypatch.setattr(appmod.subprocess, "run", fake_run)
+    _fake_commands(monkeypatch, fake_run)
 
     client = make_client()
     r = client.post("/run", headers={"x-api-key": "secret"}, json={"name": "anything"})
@@ -249,7 +624,7 @@ def test_dry_run_mode(monkeypatch):
         cp.stdout = "OK"
         return cp
 
-    monkeypatch.setattr(appmod.subprocess, "run", fake_run)
+    _fake_commands(monkeypatch, fake_run)
 
     client = make_client()
     r = client.post(
@@ -287,6 +662,88 @@ def test_list_intents():
         assert "stack" in intent
 
 
+def test_list_intents_includes_bundle():
+    client = make_client()
+    data = client.get("/intents").json()
+    bundle = next(i for i in data["intents"] if i["name"] == "rollout_all_stacks")
+    assert bundle["bundle"] is True
+    assert bundle["size"] == 3
+    assert bundle["stacks"] == ["stack-ai", "stack-media", "stack-content"]
+
+
+def test_run_bundle_executes_stacks_concurrently(monkeypatch):
+    monkeypatch.setenv("CHATOPS_API_KEY", "secret")
+    monkeypatch.setattr(appmod, "MAX_PARALLEL", 3)
+    # Every stack's "up -d" must be in flight at once for the barrier to release
+    barrier = threading.Barrier(3, timeout=5)
+
+    def fake_run(argv, check=True, capture_output=True, text=True):
+        if "up" in argv:
+            barrier.wait()
+        cp = types.SimpleNamespace()
+        cp.stdout = "OK"
+        return cp
+
+    _fake_commands(monkeypatch, fake_run)
+    client = make_client()
+    r = client.post("/run", headers={"x-api-key": "secret"}, json={"name": "rollout_all_stacks"})
+    assert r.status_code == 200
+    data = r.json()
+    assert data["ok"] is True
+    assert data["bundle"] == "rollout_all_stacks"
+    assert [res["stack"] for res in data["results"]] == ["stack-ai", "stack-media", "stack-content"]
+    assert data["summary"] == {"total": 3, "success": 3, "failed": 0}
+    # Each document reports its own breakdown, like a single-intent /run
+    for res in data["results"]:
+        for name in ("lock_wait", "exec", "total"):
+            assert res["timings"][name] >= 0
+        assert set(res["timings"]["steps"]) == {"pull", "up"}
+    assert {"load", "total"} <= set(data["timings"])
+
+
+def test_scheduled_bundle_runs_without_caller_key(monkeypatch):
+    # RBAC is configured, but scheduled runs carry no API key and are trusted
+    monkeypatch.setenv("CHATOPS_RBAC_JSON", json.dumps({"keys": {"ops": {"endpoints": ["run"]}}}))
+    failing = []
+
+    def fake_run(argv, check=True, capture_output=True, text=True):
+        if "up" in argv and any(stack in " ".join(argv) for stack in failing):
+            raise subprocess.CalledProcessError(1, argv, "", "boom")
+        return types.SimpleNamespace(stdout="OK")
+
+    _fake_commands(monkeypatch, fake_run)
+    alerts = []
+    monkeypatch.setattr(appmod, "send_discord_alert", lambda msg, color=0: alerts.append(msg))
+    result = appmod._run_scheduled("rollout_all_stacks", dry_run=False, prefetch=False)
+    assert result["ok"] is True
+    assert result["summary"] == {"total": 3, "success": 3, "failed": 0}
+    assert alerts == []
+
+    # A bundle that reports failure is a failed scheduled run
+    failing.append("stack-media")
+    result = appmod._run_scheduled("rollout_all_stacks", dry_run=False, prefetch=False)
+    assert result["ok"] is False
+    assert alerts == ["❌ **SCHEDULED RUN FAILED**: `rollout_all_stacks`: "
+                      "failed: rollout_all_stacks[1]"]
+
+
+def test_validate_intent_bundle():
+    client = make_client()
+    yaml_content = """
+label_required: approved-by-gemini
+action: rollout
+stack: stack-ai
+---
+label_required: approved-by-gemini
+action: scale
+stack: stack-media
+"""
+    data = client.post("/validate", json={"yaml_content": yaml_content}).json()
+    assert data["bundle"] is True
+    assert data["valid"] is False
+    assert data["errors"][0].startswith("document 1: ")
+
+
 def test_validate_intent_valid():
     """Test that /validate accepts valid intent YAML."""
     client = make_client()
@@ -349,7 +806,7 @@ def test_orchestrate_multi_stack(monkeypatch):
         cp.stdout = "OK"
         return cp
     
-    monkeypatch.setattr(appmod.subprocess, "run", fake_run)
+    _fake_commands(monkeypatch, fake_run)
     client = make_client()
     
     response = client.post(
@@ -383,7 +840,7 @@ def test_orchestrate_rollback_on_failure(monkeypatch):
         cp.stdout = "OK"
         return cp
 
-    monkeypatch.setattr(appmod.subprocess, "run", failing_run)
+    _fake_commands(monkeypatch, failing_run)
     client = make_client()
 
     r = client.post(
@@ -404,6 +861,188 @@ def test_orchestrate_rollback_on_failure(monkeypatch):
     assert "rollback" in data["results"][0]
 
 
+def test_coalesced_failure_rolls_back_once_under_the_stack_lock(monkeypatch):
+    intent = appmod.Intent(action="rollout", stack="stack-media")
+    lock_key = "stack-media:/opt/stacks/stack-media/docker-compose.yml"
+    release = threading.Event()
+    rollbacks = []
+    errors = []
+
+    def failing_perform(req, request, intent, on_output=None):
+        raise RuntimeError("compose pull failed")
+
+    def fake_rollback(intent, request):
+        rollbacks.append(appmod.STACK_LOCKS.snapshot()[lock_key]["running"])
+        return "Rolled back"
+
+    def caller():
+        req = appmod.IntentRequest(name="rollout_stack_media")
+        try:
+            appmod._execute_single_intent(req, appmod._internal_request(), intent)
+        except RuntimeError as e:
+            errors.append(getattr(e, appmod.ROLLBACK_ATTR, None))
+
+    monkeypatch.setattr(appmod, "_perform_intent", failing_perform)
+    monkeypatch.setattr(appmod, "_attempt_rollback", fake_rollback)
+    blocker = threading.Thread(
+        target=lambda: appmod.STACK_LOCKS.run(lock_key, "busy", lambda: release.wait(5))
+    )
+    blocker.start()
+    callers = [threading.Thread(target=caller) for _ in range(3)]
+    for t in callers:
+        t.start()
+    deadline = time.monotonic() + 5
+    while appmod.STACK_LOCKS.snapshot().get(lock_key, {}).get("waiters") != 4:
+        assert time.monotonic() < deadline, "callers never queued"
+        time.sleep(0.005)
+    release.set()
+    for t in [blocker, *callers]:
+        t.join(timeout=5)
+
+    # One rollback, run by the lock owner while it still held the stack
+    assert rollbacks == [True]
+    assert errors == ["Rolled back"] * 3
+
+
+def _use_intents_dir(monkeypatch, tmp_path, files):
+    from chatops.intent_registry import IntentRegistry
+
+    for name, body in files.items():
+        (tmp_path / f"{name}.yaml").write_text(body)
+    registry = IntentRegistry(str(tmp_path), lambda raw: appmod.Intent(**raw), recheck_seconds=0)
+    monkeypatch.setattr(appmod, "INTENT_REGISTRY", registry)
+
+
+def _rollout_yaml(stack, depends_on=()):
+    deps = "".join(f"\n  - {d}" for d in depends_on)
+    body = f"label_required: approved-by-gemini\naction: rollout\nstack: {stack}\n"
+    return body + (f"depends_on:{deps}\n" if deps else "")
+
+
+def test_orchestrate_runs_independent_dependencies_concurrently(tmp_path, monkeypatch):
+    monkeypatch.setenv("CHATOPS_API_KEY", "secret")
+    monkeypatch.setattr(appmod, "MAX_PARALLEL", 4)
+    _use_intents_dir(monkeypatch, tmp_path, {
+        "content": _rollout_yaml("stack-content"),
+        "media": _rollout_yaml("stack-media"),
+        "full": _rollout_yaml("stack-full", ["content", "media"]),
+    })
+    barrier = threading.Barrier(2, timeout=5)
+    order = []
+
+    def fake_run(argv, check=True, capture_output=True, text=True):
+        stack = argv[3].split("/")[3]
+        if "pull" in argv and stack != "stack-full":
+            barrier.wait()
+        if "up" in argv:
+            order.append(stack)
+        cp = types.SimpleNamespace()
+        cp.stdout = "OK"
+        return cp
+
+    _fake_commands(monkeypatch, fake_run)
+    client = make_client()
+    r = client.post(
+        "/orchestrate",
+        json={"intents": ["full", "media"]},
+        headers={"X-API-Key": "secret"},
+    )
+    assert r.status_code == 200
+    data = r.json()
+    assert data["ok"] is True
+    assert data["summary"]["total"] == 2
+    # media runs once even though it is both requested and a dependency
+    assert order.count("stack-media") == 1
+    assert order[-1] == "stack-full"
+
+
+def test_orchestrate_max_parallel_caps_bundle_members(tmp_path, monkeypatch):
+    monkeypatch.setenv("CHATOPS_API_KEY", "secret")
+    monkeypatch.setattr(appmod, "MAX_PARALLEL", 4)
+    _use_intents_dir(monkeypatch, tmp_path, {
+        "front": _rollout_yaml("stack-a") + "---\n" + _rollout_yaml("stack-b"),
+        "back": _rollout_yaml("stack-c") + "---\n" + _rollout_yaml("stack-d"),
+    })
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def fake_run(argv, check=True, capture_output=True, text=True):
+        if "pull" in argv:
+            with lock:
+                running.append(argv)
+                peak.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.remove(argv)
+        return types.SimpleNamespace(stdout="OK")
+
+    _fake_commands(monkeypatch, fake_run)
+    client = make_client()
+    r = client.post(
+        "/orchestrate",
+        json={"intents": ["front", "back"], "max_parallel": 2},
+        headers={"X-API-Key": "secret"},
+    )
+    assert r.status_code == 200
+    assert r.json()["ok"] is True
+    # Two bundles of two stacks each: four pulls, never more than two at once
+    assert len(peak) == 4
+    assert max(peak) <= 2
+
+
+def test_orchestrate_rejects_dependency_cycle(tmp_path, monkeypatch):
+    monkeypatch.setenv("CHATOPS_API_KEY", "secret")
+    _use_intents_dir(monkeypatch, tmp_path, {
+        "a": _rollout_yaml("stack-a", ["b"]),
+        "b": _rollout_yaml("stack-b", ["a"]),
+    })
+    client = make_client()
+    r = client.post("/orchestrate", json={"intents": ["a"]}, headers={"X-API-Key": "secret"})
+    assert r.status_code == 400
+    assert "cycle" in r.json()["detail"]
+
+
+def test_jobs_submit_returns_id_and_streams_output(monkeypatch):
+    monkeypatch.setenv("CHATOPS_API_KEY", "secret")
+    release = threading.Event()
+
+    def fake_run(argv, check=True, capture_output=True, text=True):
+        release.wait(timeout=5)
+        cp = types.SimpleNamespace()
+        cp.stdout = "Pulled plex\n" if "pull" in argv else "Started plex\n"
+        return cp
+
+    _fake_commands(monkeypatch, fake_run)
+    client = make_client()
+    headers = {"x-api-key": "secret"}
+    r = client.post("/jobs", headers=headers, json={"name": "rollout_stack_media"})
+    # Accepted before the command has even run
+    assert r.status_code == 202
+    job_id = r.json()["job_id"]
+    assert client.get(f"/jobs/{job_id}", headers=headers).json()["status"] in ("queued", "running")
+
+    release.set()
+    appmod.JOBS.get(job_id).future.result(timeout=5)
+    events = client.get(f"/jobs/{job_id}/events", headers=headers).text
+    assert "data: Pulled plex" in events
+    assert "data: Started plex" in events
+    assert "event: status" in events
+
+    data = client.get(f"/jobs/{job_id}", headers=headers, params={"since": 1}).json()
+    assert data["status"] == "succeeded"
+    assert data["result"]["ok"] is True
+    assert data["output"] == ["Started plex"]
+
+
+def test_jobs_unknown_intent_is_404(monkeypatch):
+    monkeypatch.setenv("CHATOPS_API_KEY", "secret")
+    client = make_client()
+    r = client.post("/jobs", headers={"x-api-key": "secret"}, json={"name": "no_such_intent"})
+    assert r.status_code == 404
+    assert client.get("/jobs/deadbeef", headers={"x-api-key": "secret"}).status_code == 404
+
+
 def test_schedules_list_requires_auth(monkeypatch):
     monkeypatch.setenv("CHATOPS_API_KEY", "secret")
     client = make_client()
@@ -447,7 +1086,7 @@ def test_rbac_allows_run_now(monkeypatch):
         cp.stdout = "OK"
         return cp
 
-    monkeypatch.setattr(appmod.subprocess, "run", fake_run)
+    _fake_commands(monkeypatch, fake_run)
     client = make_client()
     r = client.post(
         "/schedules/run_now",
@@ -465,7 +1104,7 @@ def test_run_now_executes_intent(monkeypatch):
         cp.stdout = "OK"
         return cp
 
-    monkeypatch.setattr(appmod.subprocess, "run", fake_run)
+    _fake_commands(monkeypatch, fake_run)
     client = make_client()
     r = client.post(
         "/schedules/run_now",
@@ -510,7 +1149,7 @@ def test_audit_log_on_command_failure(tmp_path, monkeypatch):
     def failing_run(argv, check=True, capture_output=True, text=True):
         raise subprocess.CalledProcessError(returncode=1, cmd="docker compose pull", stderr="oops")
 
-    monkeypatch.setattr(appmod.subprocess, "run", failing_run)
+    _fake_commands(monkeypatch, failing_run)
     client = make_client()
     r = client.post(
         "/run",
@@ -524,6 +1163,26 @@ def test_audit_log_on_command_failure(tmp_path, monkeypatch):
     assert any(e.get("event") == "intent_failed" for e in events)
 
 
+def test_audit_log_background_writer(tmp_path, monkeypatch):
+    monkeypatch.setenv("CHATOPS_API_KEY", "secret")
+    audit_path = tmp_path / "audit3.log"
+    monkeypatch.setenv("CHATOPS_AUDIT_LOG_FILE", str(audit_path))
+
+    # Entering the client runs startup hooks, which start the audit writer
+    with make_client() as client:
+        assert appmod.AUDIT_WRITER.running
+        r = client.post(
+            "/run",
+            headers={"x-api-key": "secret"},
+            json={"name": "scale_stack", "dry_run": True},
+        )
+        assert r.status_code == 200
+        assert appmod.AUDIT_WRITER.flush()
+        kinds = [json.loads(line)["event"] for line in audit_path.read_text().splitlines()]
+        assert kinds == ["intent_started", "intent_succeeded"]
+    assert not appmod.AUDIT_WRITER.running
+
+
 def test_rbac_denies_rollout_not_allowed(monkeypatch):
     """RBAC config that allows only scale should block rollout."""
     # Configure RBAC with limited permissions for key 'secret'
@@ -568,7 +1227,7 @@ def test_rbac_allows_scale(monkeypatch):
         cp.stdout = "OK"
         return cp
 
-    monkeypatch.setattr(appmod.subprocess, "run", fake_run)
+    _fake_commands(monkeypatch, fake_run)
     client = make_client()
     r = client.post(
         "/run",
@@ -593,7 +1252,7 @@ def test_github_webhook_triggers_intent(monkeypatch):
         cp.stdout = "OK"
         return cp
 
-    monkeypatch.setattr(appmod.subprocess, "run", fake_run)
+    _fake_commands(monkeypatch, fake_run)
 
     client = make_client()
     payload = {
@@ -637,7 +1296,7 @@ def test_gitlab_webhook_triggers_intent(monkeypatch):
         cp.stdout = "OK"
         return cp
 
-    monkeypatch.setattr(appmod.subprocess, "run", fake_run)
+    _fake_commands(monkeypatch, fake_run)
     client = make_client()
     payload = {
         "commits": [
@@ -653,3 +1312,341 @@ def test_gitlab_webhook_triggers_intent(monkeypatch):
     assert r.status_code == 200
     data = r.json()
     assert "results" in data
+
+
+def test_audit_query_endpoint(tmp_path, monkeypatch):
+    monkeypatch.setenv("CHATOPS_API_KEY", "k")
+    audit_path = tmp_path / "audit.log"
+    monkeypatch.setenv("CHATOPS_AUDIT_LOG_FILE", str(audit_path))
+    events = [
+        {"ts": 100, "event": "intent_success", "intent": "a", "stack": "media"},
+        {"ts": 200, "event": "intent_failure", "intent": "b", "stack": "nas"},
+        {"ts": 300, "event": "intent_success", "intent": "c", "stack": "media"},
+    ]
+    audit_path.write_text("".join(json.dumps(e) + "\n" for e in events))
+    client = make_client()
+
+    r = client.get("/audit", params={"stack": "media", "since": "150"}, headers={"x-api-key": "k"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(x)["intent"] for x in r.text.splitlines()] == ["c"]
+
+    r = client.get("/audit", params={"until": "1970-01-01T00:03:20Z"}, headers={"x-api-key": "k"})
+    assert [json.loads(x)["ts"] for x in r.text.splitlines()] == [100, 200]
+
+    r = client.get("/audit", params={"since": "soon"}, headers={"x-api-key": "k"})
+    assert r.status_code == 400
+    assert client.get("/audit").status_code == 401
+
+
+def test_audit_query_respects_rbac_stacks(tmp_path, monkeypatch):
+    monkeypatch.setenv("CHATOPS_API_KEY", "k")
+    audit_path = tmp_path / "audit.log"
+    monkeypatch.setenv("CHATOPS_AUDIT_LOG_FILE", str(audit_path))
+    audit_path.write_text(
+        json.dumps({"ts": 1, "event": "x", "stack": "media"}) + "\n"
+        + json.dumps({"ts": 2, "event": "x", "stack": "nas"}) + "\n"
+    )
+    monkeypatch.setenv(
+        "CHATOPS_RBAC_JSON",
+        json.dumps({"keys": {"k": {"endpoints": ["audit"], "stacks": ["media"]}}}),
+    )
+    client = make_client()
+    r = client.get("/audit", headers={"x-api-key": "k"})
+    assert [json.loads(x)["stack"] for x in r.text.splitlines()] == ["media"]
+    r = client.get("/audit", params={"stack": "nas"}, headers={"x-api-key": "k"})
+    assert r.status_code == 403
+
+
+def test_scale_history_endpoint(tmp_path, monkeypatch):
+    monkeypatch.setenv("CHATOPS_API_KEY", "k")
+    monkeypatch.setattr(appmod, "STATE_DIR", str(tmp_path))
+    appmod._record_scale_transition("media", "plex", 1)
+    appmod._record_scale_transition("media", "plex", 3)
+    assert appmod._get_previous_desired("media", "plex") == 1
+
+    client = make_client()
+    r = client.get("/state/scale/media/plex", headers={"x-api-key": "k"})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["previous_desired"] == 1
+    assert [h["replicas"] for h in body["history"]] == [3, 1]
+    assert os.path.exists(tmp_path / "state.db")
+
+
+
+def _fake_docker_images(monkeypatch, image_id):
+    calls = []
+
+    def fake_run(argv, check=True, capture_output=True, text=True):
+        calls.append(argv)
+        if "config" in argv:
+            return types.SimpleNamespace(stdout="ollama/ollama:latest\n")
+        if argv[1:3] == ["image", "inspect"]:
+            return types.SimpleNamespace(stdout=image_id[0] + "\n")
+        return types.SimpleNamespace(stdout="OK")
+
+    _fake_commands(monkeypatch, fake_run)
+    return calls
+
+
+def test_prefetch_then_rollout_skips_pull(tmp_path, monkeypatch):
+    monkeypatch.setenv("CHATOPS_API_KEY", "k")
+    monkeypatch.setattr(appmod, "STATE_DIR", str(tmp_path))
+    image_id = ["sha256:aaa"]
+    calls = _fake_docker_images(monkeypatch, image_id)
+    client = make_client()
+    headers = {"x-api-key": "k"}
+
+    r = client.post("/run", headers=headers, json={"name": "rollout_stack", "prefetch": True})
+    assert r.status_code == 200
+    assert r.json()["images"] == {"ollama/ollama:latest": "sha256:aaa"}
+    assert not any("up" in argv for argv in calls)
+
+    calls.clear()
+    r = client.post("/run", headers=headers, json={"name": "rollout_stack"})
+    assert r.json()["pull_skipped"] is True
+    assert not any(argv[-1] == "pull" for argv in calls)
+    assert any(argv[-2:] == ["up", "-d"] for argv in calls)
+
+    # A newer image than the prefetched one means the spec moved on: pull again
+    image_id[0] = "sha256:bbb"
+    calls.clear()
+    r = client.post("/run", headers=headers, json={"name": "rollout_stack"})
+    assert r.json()["pull_skipped"] is False
+    assert any(argv[-1] == "pull" for argv in calls)
+
+
+
+def test_rollout_noop_when_containers_match_spec(monkeypatch):
+    monkeypatch.setenv("CHATOPS_API_KEY", "k")
+    monkeypatch.setattr(appmod, "COMPOSE_SPECS", appmod.ComposeSpecCache())
+    calls = []
+
+    def fake_run(argv, check=True, capture_output=True, text=True):
+        calls.append(argv)
+        if "--hash" in argv:
+            out = "plex abc\n"
+        elif argv[-2:] == ["--format", "json"]:
+            out = json.dumps({"services": {"plex": {"image": "plex:latest"}}})
+        elif "ps" in argv:
+            out = "c1\n"
+        elif argv[1] == "inspect":
+            out = "plex abc sha256:aaa true\n"
+        elif argv[1:3] == ["image", "inspect"]:
+            out = "sha256:aaa\n"
+        else:
+            out = "OK"
+        return types.SimpleNamespace(stdout=out)
+
+    _fake_commands(monkeypatch, fake_run)
+    client = make_client()
+    headers = {"x-api-key": "k"}
+    r = client.post("/run", headers=headers, json={"name": "rollout_stack"})
+    assert r.status_code == 200
+    assert r.json()["noop"] is True
+    assert not any(argv[-2:] == ["up", "-d"] for argv in calls)
+
+    calls.clear()
+    r = client.post("/run", headers=headers, json={"name": "rollout_stack", "force": True})
+    assert r.json()["noop"] is False
+    assert any(argv[-2:] == ["up", "-d"] for argv in calls)
+
+
+
+def test_docker_api_backend_falls_back_to_cli(tmp_path, monkeypatch):
+    monkeypatch.setattr(appmod, "DOCKER_BACKEND", "api")
+    monkeypatch.setattr(
+        appmod, "_DOCKER_ENGINE", appmod.DockerEngine(str(tmp_path / "missing.sock"))
+    )
+    used = []
+
+    def inspect(engine):
+        used.append(engine)
+        if engine is not None:
+            engine.image_id("plex:latest")  # socket missing: transport error
+        return "cli"
+
+    assert appmod._with_engine(inspect) == "cli"
+    assert used[0] is not None and used[1] is None
+    monkeypatch.setattr(appmod, "DOCKER_BACKEND", "cli")
+    assert appmod._docker_engine() is None
+
+
+def test_prefetch_rejects_non_rollout(monkeypatch):
+    monkeypatch.setenv("CHATOPS_API_KEY", "k")
+    client = make_client()
+    r = client.post(
+        "/run", headers={"x-api-key": "k"}, json={"name": "scale_stack", "prefetch": True}
+    )
+    assert r.status_code == 400
+
+
+def test_webhook_queues_prefetch(tmp_path, monkeypatch):
+    monkeypatch.setenv("GITLAB_WEBHOOK_TOKEN", "gl_token")
+    monkeypatch.setattr(appmod, "STATE_DIR", str(tmp_path))
+    monkeypatch.setattr(appmod, "WEBHOOK_PREFETCH", True)
+    _fake_docker_images(monkeypatch, ["sha256:aaa"])
+    client = make_client()
+    payload = {"commits": [
+        {"message": "deploy [chatops:intent=rollout_stack_media] [chatops:intent=scale_stack]"},
+    ]}
+    r = client.post("/webhook/gitlab", json=payload, headers={"X-Gitlab-Token": "gl_token"})
+    assert r.status_code == 200
+    (job_id,) = r.json()["prefetch_jobs"]
+    result = appmod.JOBS.get(job_id).future.result(timeout=5)
+    assert result["prefetch"] is True
+    assert appmod._state_store().get(
+        "prefetch", "stack-media:/opt/stacks/stack-media/docker-compose.yml"
+    )["images"] == {"ollama/ollama:latest": "sha256:aaa"}
+
+
+def test_webhook_prefetches_every_stack_of_a_bundle(tmp_path, monkeypatch):
+    monkeypatch.setenv("GITLAB_WEBHOOK_TOKEN", "gl_token")
+    monkeypatch.setenv("CHATOPS_RBAC_JSON", json.dumps({"keys": {"ops": {"endpoints": ["run"]}}}))
+    monkeypatch.setattr(appmod, "STATE_DIR", str(tmp_path))
+    monkeypatch.setattr(appmod, "WEBHOOK_PREFETCH", True)
+    _fake_docker_images(monkeypatch, ["sha256:aaa"])
+    client = make_client()
+    payload = {"commits": [{"message": "kernel update [chatops:intent=rollout_all_stacks]"}]}
+    r = client.post("/webhook/gitlab", json=payload, headers={"X-Gitlab-Token": "gl_token"})
+    (job_id,) = r.json()["prefetch_jobs"]
+    result = appmod.JOBS.get(job_id).future.result(timeout=5)
+    assert result["ok"] is True
+    for stack in ("stack-ai", "stack-media", "stack-content"):
+        assert appmod._state_store().get(
+            "prefetch", f"{stack}:/opt/stacks/{stack}/docker-compose.yml"
+        )["images"] == {"ollama/ollama:latest": "sha256:aaa"}
+
+
+def test_auth_failure_alert_is_queued_not_posted(monkeypatch):
+    monkeypatch.setenv("CHATOPS_API_KEY", "secret")
+    monkeypatch.setattr(appmod, "DISCORD_WEBHOOK_URL", "https://discord.invalid/hook")
+    queued = []
+    monkeypatch.setattr(appmod.ALERTS, "send", lambda url, msg, color: queued.append(msg))
+    client = make_client()
+    r = client.post("/run", headers={"x-api-key": "wrong"}, json={"name": "scale_stack"})
+    assert r.status_code == 401
+    assert queued and "AUTH FAILED" in queued[0]
+
+
+def test_ip_allowlist_file_source(tmp_path, monkeypatch):
+    monkeypatch.setenv("CHATOPS_API_KEY", "secret")
+    monkeypatch.delenv("CHATOPS_IP_ALLOWLIST", raising=False)
+    allow_file = tmp_path / "github-meta.json"
+    allow_file.write_text(json.dumps({"hooks": ["192.30.252.0/22"]}))
+    monkeypatch.setenv("CHATOPS_IP_ALLOWLIST_FILE", str(allow_file))
+    client = make_client()
+    body = {"name": "scale_stack", "dry_run": True}
+    headers = {"x-api-key": "secret", "x-forwarded-for": "192.30.253.10"}
+    assert client.post("/run", headers=headers, json=body).status_code == 200
+    headers["x-forwarded-for"] = "8.8.8.8"
+    assert client.post("/run", headers=headers, json=body).status_code == 403
+    # A configured but missing file fails closed
+    monkeypatch.setenv("CHATOPS_IP_ALLOWLIST_FILE", str(tmp_path / "missing.json"))
+    headers["x-forwarded-for"] = "192.30.253.10"
+    assert client.post("/run", headers=headers, json=body).status_code == 403
+
+
+def test_rbac_reload_endpoint(tmp_path, monkeypatch):
+    monkeypatch.delenv("CHATOPS_API_KEY", raising=False)
+    monkeypatch.delenv("CHATOPS_RBAC_JSON", raising=False)
+    rbac_file = tmp_path / "rbac.json"
+    rbac_file.write_text(json.dumps({"keys": {"old": {"endpoints": ["*"]}}}))
+    monkeypatch.setenv("CHATOPS_RBAC_FILE", str(rbac_file))
+    monkeypatch.setattr(appmod, "RBAC", appmod.RBACSource(recheck_seconds=3600))
+    client = make_client()
+    assert client.post("/rbac/reload", headers={"x-api-key": "old"}).json()["keys"] == 1
+
+    rbac_file.write_text(json.dumps({"keys": {"new": {"endpoints": ["*"]}}}))
+    os.utime(rbac_file, ns=(1, 1))
+    # Still the cached table until a reload (or the re-check interval)
+    r = client.post("/rbac/reload", headers={"x-api-key": "old"})
+    assert r.status_code == 200
+    assert client.post("/rbac/reload", headers={"x-api-key": "old"}).status_code == 401
+    assert client.post("/rbac/reload", headers={"x-api-key": "new"}).status_code == 200
+
+
+def test_global_api_key_hash(monkeypatch):
+    from chatops.apikeys import hash_key
+
+    monkeypatch.delenv("CHATOPS_API_KEY", raising=False)
+    monkeypatch.delenv("CHATOPS_RBAC_JSON", raising=False)
+    monkeypatch.delenv("CHATOPS_RBAC_FILE", raising=False)
+    monkeypatch.setenv("CHATOPS_API_KEY_HASH", hash_key("hunter2"))
+    client = make_client()
+    body = {"name": "scale_stack", "dry_run": True}
+    assert client.post("/run", headers={"x-api-key": "hunter2"}, json=body).status_code == 200
+    assert client.post("/run", headers={"x-api-key": "hunter3"}, json=body).status_code == 401
+
+
+def test_rate_limit_per_rbac_key(monkeypatch):
+    monkeypatch.delenv("CHATOPS_API_KEY", raising=False)
+    monkeypatch.setenv(
+        "CHATOPS_RBAC_JSON",
+        json.dumps({"keys": {
+            "bulk": {"endpoints": ["*"], "rate_limit": "3/minute"},
+            "normal": {"endpoints": ["*"]},
+        }}),
+    )
+    client = make_client()
+    body = {"name": "scale_stack", "dry_run": True}
+    codes = [
+        client.post("/run", headers={"x-api-key": "bulk"}, json=body).status_code
+        for _ in range(4)
+    ]
+    assert codes == [200, 200, 200, 429]
+    r = client.post("/run", headers={"x-api-key": "bulk"}, json=body)
+    assert int(r.headers["retry-after"]) >= 1
+    # A different key has its own bucket with the default limit
+    assert client.post("/run", headers={"x-api-key": "normal"}, json=body).status_code == 200
+
+
+def test_rate_limit_runs_no_kdf_for_unverified_keys(monkeypatch):
+    from chatops import apikeys
+    from chatops.ratelimit import MemoryStorage, Rate, RateLimiter
+
+    monkeypatch.delenv("CHATOPS_API_KEY", raising=False)
+    encoded = apikeys.hash_key("ci.s3cret", "pbkdf2_sha256", iterations=1000)
+    monkeypatch.setenv(
+        "CHATOPS_RBAC_JSON",
+        json.dumps({"keys": {
+            "ci": {"key_hash": encoded, "endpoints": ["*"], "rate_limit": "2/minute"},
+        }}),
+    )
+    monkeypatch.setattr(
+        appmod, "limiter", RateLimiter(MemoryStorage(), Rate.parse("5/minute"))
+    )
+    calls = []
+    real = apikeys.verify_key_hash
+    monkeypatch.setattr(apikeys, "verify_key_hash", lambda e, k: (calls.append(k), real(e, k))[1])
+    client = make_client()
+    body = {"name": "scale_stack", "dry_run": True}
+    # First request shares the IP bucket; once verified, the key has its own
+    codes = [
+        client.post("/run", headers={"x-api-key": "ci.s3cret"}, json=body).status_code
+        for _ in range(4)
+    ]
+    assert codes == [200, 200, 200, 429]
+    assert calls == ["ci.s3cret"]
+    codes = [
+        client.post("/run", headers={"x-api-key": f"ci.guess{i}"}, json=body).status_code
+        for i in range(5)
+    ]
+    assert codes == [401, 401, 401, 401, 429]
+    assert len(calls) == 5  # the throttled guess never reached the KDF
+
+
+def test_rate_limit_applies_before_auth(monkeypatch):
+    monkeypatch.setenv("CHATOPS_API_KEY", "secret")
+    from chatops.ratelimit import MemoryStorage, Rate, RateLimiter
+
+    monkeypatch.setattr(
+        appmod, "limiter", RateLimiter(MemoryStorage(), Rate.parse("2/minute"))
+    )
+    client = make_client()
+    codes = [
+        client.post("/run", headers={"x-api-key": "guess"}, json={"name": "x"}).status_code
+        for _ in range(3)
+    ]
+    assert codes == [401, 401, 429]
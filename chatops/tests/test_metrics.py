@@ -0,0 +1,106 @@
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from chatops import metrics
+from chatops.metrics import (
+    PhaseTimer,
+    command_verb,
+    compact_dead_workers,
+    phase,
+    phase_timing,
+    render_latest,
+)
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+# Each worker is a real process importing chatops.metrics in multiprocess mode
+_WORKER = """
+import sys
+sys.path.insert(0, {root!r})
+from chatops.metrics import AUTH_FAILURES, INTENT_DURATION
+AUTH_FAILURES.labels(reason="invalid_key").inc({n})
+INTENT_DURATION.labels(intent_name="scale_stack", action="scale").observe(0.2)
+"""
+
+
+def _run_worker(path, n):
+    env = {**os.environ, "CHATOPS_METRICS_DIR": str(path)}
+    env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+    subprocess.run(
+        [sys.executable, "-c", _WORKER.format(root=ROOT, n=n)], env=env, check=True
+    )
+
+
+def _sample(text, prefix):
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+def test_render_aggregates_workers_and_survives_compaction(tmp_path, monkeypatch):
+    # Render without the periodic compaction (first call compacts once uptime > interval)
+    monkeypatch.setattr(metrics, "_last_compaction", time.monotonic())
+    _run_worker(tmp_path, 2)
+    _run_worker(tmp_path, 3)
+    assert len([f for f in os.listdir(tmp_path) if f.startswith("counter_")]) == 2
+
+    text = render_latest(str(tmp_path), compact_every=3600).decode()
+    assert _sample(text, 'chatops_auth_failures_total{reason="invalid_key"}') == 5
+    count = 'chatops_intent_duration_seconds_count{action="scale",intent_name="scale_stack"}'
+    assert _sample(text, count) == 2
+
+    # Both workers have exited: their files fold into one archive per type
+    assert compact_dead_workers(str(tmp_path)) == 4
+    names = sorted(f for f in os.listdir(tmp_path) if f.endswith(".db"))
+    assert names == ["counter_archive.db", "histogram_archive.db"]
+
+    _run_worker(tmp_path, 1)
+    compact_dead_workers(str(tmp_path))
+    text = render_latest(str(tmp_path), compact_every=3600).decode()
+    assert _sample(text, 'chatops_auth_failures_total{reason="invalid_key"}') == 6
+    assert _sample(text, count) == 3
+
+
+def test_live_workers_are_not_compacted(tmp_path):
+    _run_worker(tmp_path, 1)
+    assert compact_dead_workers(str(tmp_path), is_alive=lambda pid: True) == 0
+    assert any(f.startswith("counter_") and f != "counter_archive.db" for f in os.listdir(tmp_path))
+
+
+def test_command_verb_labels_subprocess_steps():
+    assert command_verb(["docker", "compose", "-f", "/x.yml", "pull"]) == "pull"
+    assert command_verb(["docker", "compose", "-f", "/x.yml", "up", "-d"]) == "up"
+    assert command_verb(["docker", "cp", "plex:/db", "/tmp"]) == "cp"
+    assert command_verb(["/usr/bin/rsync", "-av", "a/", "b/"]) == "rsync"
+    assert command_verb([]) == ""
+
+
+def test_phase_timer_counts_outermost_phase_only():
+    timer = PhaseTimer("rollout")
+    with timer.phase("exec", "pull"):
+        pass
+    with timer.phase("rollback"):
+        with timer.phase("audit"):
+            pass
+    timer.add("lock_wait", 0.5)
+    out = timer.breakdown()
+    assert set(out) == {"exec", "rollback", "lock_wait", "steps", "total"}
+    assert out["steps"] == {"pull": out["exec"]}
+    assert out["lock_wait"] == 0.5
+
+
+def test_phase_timing_is_shared_by_nested_callers():
+    with phase("audit"):
+        pass  # no active timer: nothing recorded, nothing raised
+    with phase_timing("scale") as outer:
+        with phase_timing() as inner:
+            assert inner is outer
+            with phase("notify"):
+                pass
+    assert "notify" in outer.breakdown()
+    with phase_timing() as fresh:
+        assert fresh is not outer
@@ -0,0 +1,215 @@
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from chatops.proxmox import (
+    Guest,
+    ProxmoxAPIError,
+    ProxmoxClient,
+    StorageSlots,
+    resolve_guests,
+    run_backups,
+    wait_task,
+)
+
+GUESTS = {100: "pve1", 101: "pve2", 102: "pve1", 103: "pve2"}
+
+
+class _ProxmoxHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, data):
+        body = json.dumps({"data": data}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        state = self.server.state
+        state["auth"].add(self.headers.get("Authorization"))
+        path = unquote(urlparse(self.path).path).removeprefix("/api2/json")
+        parts = path.strip("/").split("/")
+        if path == "/cluster/resources":
+            self._send(200, [
+                {"vmid": v, "node": n, "type": "qemu", "status": "running"}
+                for v, n in GUESTS.items()
+            ])
+        elif path == "/pools/prod":
+            self._send(200, {"members": [
+                {"vmid": v, "type": "qemu"} for v in (101, 102, 103)
+            ] + [{"id": "storage/pve1/local", "type": "storage"}]})
+        elif parts[-1] == "status":
+            with state["lock"]:
+                task = state["tasks"][parts[3]]
+                task["polls"] -= 1
+                if task["polls"] <= 0 and task["status"] == "running":
+                    task["status"] = "stopped"
+                    state["running"] -= 1
+                self._send(200, {
+                    "status": task["status"],
+                    "exitstatus": "job errors" if task["vmid"] == 103 else "OK",
+                })
+        elif parts[-1] == "log":
+            vmid = state["tasks"][parts[3]]["vmid"]
+            self._send(200, [
+                {"n": 1, "t": f"INFO: starting new backup job: vzdump {vmid}"},
+                {"n": 2, "t": f"INFO: creating vzdump archive "
+                              f"'/mnt/pve/nas/dump/vzdump-qemu-{vmid}.vma.zst'"},
+            ])
+        else:
+            self._send(404, None)
+
+    def do_POST(self):
+        state = self.server.state
+        length = int(self.headers.get("Content-Length", 0))
+        form = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode()).items()}
+        node = self.path.split("/")[4]
+        vmid = int(form["vmid"])
+        assert GUESTS[vmid] == node
+        upid = f"UPID:{node}:0000{vmid}:vzdump:{vmid}:root@pam:"
+        with state["lock"]:
+            state["submitted"].append(form)
+            state["running"] += 1
+            state["max_running"] = max(state["max_running"], state["running"])
+            state["tasks"][upid] = {"vmid": vmid, "polls": 2, "status": "running"}
+        self._send(200, upid)
+
+    def do_DELETE(self):
+        state = self.server.state
+        parts = [unquote(p) for p in urlparse(self.path).path.strip("/").split("/")]
+        upid = f"UPID:{parts[3]}:delete:{len(state['deleted'])}"
+        with state["lock"]:
+            state["deleted"].append((parts[3], parts[5], parts[7]))
+            state["tasks"][upid] = {"vmid": 0, "polls": 2, "status": "running"}
+            state["running"] += 1
+        self._send(200, upid)
+
+
+@pytest.fixture
+def proxmox():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ProxmoxHandler)
+    server.daemon_threads = True
+    server.state = {
+        "lock": threading.Lock(),
+        "tasks": {},
+        "submitted": [],
+        "running": 0,
+        "max_running": 0,
+        "auth": set(),
+        "deleted": [],
+    }
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    client = ProxmoxClient(
+        f"http://127.0.0.1:{server.server_address[1]}", "chatops@pve!backup", "s3cret"
+    )
+    client.server = server
+    yield client
+    client.close()
+    server.shutdown()
+    server.server_close()
+
+
+def test_pool_backup_polls_tasks_within_storage_cap(proxmox):
+    guests = resolve_guests(proxmox, [100], "prod")
+    assert [(g.vmid, g.node) for g in guests] == [
+        (100, "pve1"), (101, "pve2"), (102, "pve1"), (103, "pve2")
+    ]
+    output = []
+    results = run_backups(
+        proxmox,
+        guests,
+        StorageSlots(2),
+        storage="nas",
+        options={"compress": "zstd", "notes-template": None},
+        sleep=lambda s: None,
+        on_output=output.append,
+    )
+    state = proxmox.server.state
+    assert state["max_running"] == 2
+    assert state["auth"] == {"PVEAPIToken=chatops@pve!backup=s3cret"}
+    assert all(f["storage"] == "nas" and f["compress"] == "zstd" for f in state["submitted"])
+    assert not any("notes-template" in f for f in state["submitted"])
+    by_vmid = {r["vmid"]: r for r in results}
+    assert sorted(by_vmid) == [100, 101, 102, 103]
+    assert by_vmid[100]["archive"] == "/mnt/pve/nas/dump/vzdump-qemu-100.vma.zst"
+    assert [r["vmid"] for r in results if not r["ok"]] == [103]
+    assert by_vmid[103]["error"] == "job errors"
+    assert len(output) == 4
+
+
+def test_unknown_guest_is_rejected(proxmox):
+    with pytest.raises(ValueError, match="Unknown VM ids: 999"):
+        resolve_guests(proxmox, [100, 999])
+
+
+def test_storage_slots_are_shared():
+    slots = StorageSlots(1)
+    assert slots.try_acquire("nas")
+    assert not slots.try_acquire("nas")
+    assert slots.try_acquire("local")
+    slots.release("nas")
+    assert slots.try_acquire("nas")
+
+
+def test_aborted_run_releases_its_slots(proxmox):
+    slots = StorageSlots(2)
+
+    def on_output(line):
+        raise RuntimeError("client went away")
+
+    guests = resolve_guests(proxmox, [100, 101])
+    with pytest.raises(RuntimeError):
+        run_backups(proxmox, guests, slots, storage="nas", sleep=lambda s: None,
+                    on_output=on_output)
+    assert slots.try_acquire("nas") and slots.try_acquire("nas")
+
+
+def test_invalid_json_fails_the_guest(proxmox):
+    proxmox._client = httpx.Client(
+        base_url="http://pve.invalid/api2/json",
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, text="<html>")),
+    )
+    slots = StorageSlots(1)
+    results = run_backups(proxmox, [Guest(100, "pve1")], slots, sleep=lambda s: None)
+    assert not results[0]["ok"] and "invalid JSON" in results[0]["error"]
+    assert slots.try_acquire("")
+
+
+def test_waiting_for_a_slot_is_bounded(proxmox):
+    slots = StorageSlots(1)
+    assert slots.try_acquire("nas")  # held by another run
+    results = run_backups(
+        proxmox, [Guest(100, "pve1")], slots, storage="nas", slot_timeout=0,
+        sleep=lambda s: None,
+    )
+    assert [(r["vmid"], r["ok"]) for r in results] == [(100, False)]
+    assert "no free slot on storage nas" in results[0]["error"]
+    assert proxmox.server.state["submitted"] == []
+
+
+def test_delete_volume_and_wait_for_its_task(proxmox):
+    upid = proxmox.delete_volume("pve1", "nas", "nas:backup/vzdump-qemu-100.vma.zst")
+    wait_task(proxmox, "pve1", upid, sleep=lambda s: None)
+    assert proxmox.server.state["deleted"] == [
+        ("pve1", "nas", "nas:backup/vzdump-qemu-100.vma.zst")
+    ]
+
+    class Failed:
+        def task_status(self, node, upid):
+            return {"status": "stopped", "exitstatus": "volume is protected"}
+
+    with pytest.raises(ProxmoxAPIError, match="volume is protected"):
+        wait_task(Failed(), "pve1", "UPID:x")
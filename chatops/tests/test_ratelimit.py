@@ -0,0 +1,63 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from chatops import ratelimit
+from chatops.ratelimit import (
+    MemoryStorage,
+    Rate,
+    RateLimiter,
+    SQLiteStorage,
+    parse_endpoint_rates,
+    storage_from_uri,
+)
+
+
+def test_parse_rates():
+    assert (Rate.parse("10/minute").capacity, Rate.parse("10/minute").period) == (10, 60)
+    assert Rate.parse("5 per 30 seconds").period == 30
+    assert Rate.parse("100/hour").refill_per_second == pytest.approx(100 / 3600)
+    assert str(Rate.parse("10/minute")) == "10/minute"
+    with pytest.raises(ValueError):
+        Rate.parse("lots")
+    assert set(parse_endpoint_rates("run=5/minute, orchestrate=1/minute")) == {"run", "orchestrate"}
+
+
+def test_token_bucket_bursts_then_refills(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now[0])
+    storage = MemoryStorage()
+    rate = Rate.parse("3/minute")
+    assert [storage.take("k", rate)[0] for _ in range(4)] == [True, True, True, False]
+    allowed, retry_after = storage.take("k", rate)
+    assert not allowed and retry_after == pytest.approx(20)
+    now[0] += 20  # one token back
+    assert storage.take("k", rate)[0]
+    assert not storage.take("k", rate)[0]
+    assert storage.take("other", rate)[0]
+
+
+def test_sqlite_buckets_are_shared_between_workers(tmp_path):
+    path = str(tmp_path / "rl.db")
+    worker_a, worker_b = SQLiteStorage(path), SQLiteStorage(path)
+    rate = Rate.parse("4/hour")
+    results = [w.take("run:ip:1.2.3.4", rate)[0] for w in (worker_a, worker_b) * 3]
+    assert results == [True, True, True, True, False, False]
+    worker_a.reset()
+    assert worker_b.take("run:ip:1.2.3.4", rate)[0]
+
+
+def test_limiter_precedence_and_storage_uri(tmp_path):
+    limiter = RateLimiter(
+        MemoryStorage(), Rate.parse("10/minute"), parse_endpoint_rates("orchestrate=2/minute")
+    )
+    assert str(limiter.rate_for("run")) == "10/minute"
+    assert str(limiter.rate_for("orchestrate")) == "2/minute"
+    assert str(limiter.rate_for("orchestrate", Rate.parse("100/minute"))) == "100/minute"
+    assert storage_from_uri("memory", "").name == "memory"
+    assert storage_from_uri("sqlite", str(tmp_path / "a.db")).name == "sqlite"
+    assert storage_from_uri(f"sqlite:///{tmp_path}/b.db", "").path == f"{tmp_path}/b.db"
+    with pytest.raises(ValueError):
+        storage_from_uri("memcached://x", "")
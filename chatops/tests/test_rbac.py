@@ -0,0 +1,77 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from chatops.rbac import RBACSource, RBACTable, key_digest
+
+
+def test_table_is_keyed_by_digest_and_matches_scopes():
+    table = RBACTable({
+        "keys": {
+            "ops": {"endpoints": ["run", "orchestrate"], "actions": ["scale"], "stacks": ["media"]},
+            "admin": {"endpoints": ["*"]},
+            "empty": {},
+        }
+    })
+    assert "ops" not in table.policies
+    assert key_digest("ops") in table.policies
+    assert table.allowed("ops", "run", "scale", "media")
+    assert not table.allowed("ops", "run", "rollout", "media")
+    assert not table.allowed("ops", "run", "scale", "nas")
+    assert not table.allowed("ops", "jobs", None, None)
+    assert table.allowed("ops", "orchestrate", None, None)  # unspecified action/stack
+    assert table.allowed("admin", "anything", "backup", "nas")
+    assert table.policy("empty") is not None
+    assert not table.allowed("empty", "run", None, None)
+    assert not table.allowed("nobody", "run", None, None)
+
+
+def test_source_rechecks_file_only_after_interval(tmp_path):
+    path = tmp_path / "rbac.json"
+    path.write_text(json.dumps({"keys": {"a": {}}}))
+    source = RBACSource(recheck_seconds=3600)
+    table = source.get("", str(path))
+    assert table is not None and table.policy("a") is not None
+    path.write_text(json.dumps({"keys": {"b": {}}}))
+    os.utime(path, ns=(1, 1))
+    assert source.get("", str(path)) is table  # not re-stat'ed yet
+    source.invalidate()
+    assert source.get("", str(path)).policy("b") is not None
+
+
+def test_source_follows_inline_json_immediately():
+    source = RBACSource()
+    assert source.get("", "") is None
+    first = source.get(json.dumps({"keys": {"a": {}}}), "")
+    assert source.get(json.dumps({"keys": {"a": {}}}), "") is first
+    assert source.get(json.dumps({"keys": {"b": {}}}), "").policy("b") is not None
+
+
+def test_hashed_entries_verify_through_cache():
+    from chatops.apikeys import VerificationCache, hash_key
+
+    cache = VerificationCache()
+    table = RBACTable({
+        "keys": {
+            "ci": {"key_hash": hash_key("ci.s3cret", "pbkdf2_sha256", iterations=1000),
+                   "endpoints": ["run"]},
+            "deploy": {"key_hash": hash_key("deploy.s3cret", "pbkdf2_sha256", iterations=1000),
+                       "endpoints": ["*"]},
+            "plain": {"endpoints": ["*"]},
+        }
+    }, cache)
+    assert len(table) == 3
+    assert table.allowed("ci.s3cret", "run", None, None)
+    assert not table.allowed("ci.s3cret", "jobs", None, None)
+    assert not table.allowed("ci", "run", None, None)  # the label is not a key
+    assert table.allowed("plain", "jobs", None, None)
+    assert cache.misses == 1 and cache.hits == 1
+    # Keys without a known label prefix never reach the KDF
+    assert table.policy("s3cret") is None
+    assert table.policy("nobody.s3cret") is None
+    assert cache.misses == 1
+    # A labelled key is checked against its own entry only
+    assert table.policy("deploy.s3cret") is table.hashed["deploy"][1]
+    assert table.policy("ci.wrong") is None
+    assert cache.misses == 3
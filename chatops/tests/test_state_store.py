@@ -0,0 +1,72 @@
+import gc
+import json
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from chatops.state_store import StateStore
+
+
+def test_previous_replicas_follows_history(tmp_path):
+    store = StateStore(str(tmp_path / "state.db"))
+    assert store.previous_replicas("media", "plex") is None
+    store.record_replicas("media", "plex", 1)
+    assert store.previous_replicas("media", "plex") is None
+    store.record_replicas("media", "plex", 3)
+    store.record_replicas("media", "plex", 2)
+    assert store.previous_replicas("media", "plex") == 3
+    assert [h["replicas"] for h in store.replica_history("media", "plex")] == [2, 3, 1]
+    assert store.previous_replicas("media", "sonarr") is None
+
+
+def test_history_is_pruned_per_service(tmp_path):
+    store = StateStore(str(tmp_path / "state.db"), history_limit=3)
+    for n in range(10):
+        store.record_replicas("media", "plex", n)
+    store.record_replicas("media", "sonarr", 1)
+    assert [h["replicas"] for h in store.replica_history("media", "plex")] == [9, 8, 7]
+    assert len(store.replica_history("media", "sonarr")) == 1
+
+
+def test_concurrent_updates_are_not_lost(tmp_path):
+    store = StateStore(str(tmp_path / "state.db"))
+
+    def bump():
+        for _ in range(25):
+            store.update("counters", "n", lambda v: v + 1, default=0)
+
+    threads = [threading.Thread(target=bump) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert store.get("counters", "n") == 200
+    store.close()
+    # Reopening sees committed data
+    assert StateStore(str(tmp_path / "state.db")).get("counters", "n") == 200
+
+
+def test_connections_close_when_their_threads_exit(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    store = StateStore(str(tmp_path / "state.db"))
+    # A fresh pool per run, like DagExecutor and sharded rsync
+    for n in range(50):
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            list(pool.map(lambda i, n=n: store.set("runs", str(i), n), range(3)))
+    gc.collect()
+    assert len(store._conns) <= 4
+    assert store.get("runs", "2") == 49
+
+
+def test_imports_legacy_json_once(tmp_path):
+    legacy = tmp_path / "state.json"
+    legacy.write_text(json.dumps({
+        "scale": {"media": {"plex": {"last_desired": 4, "previous_desired": 2, "updated_at": 1}}}
+    }))
+    store = StateStore(str(tmp_path / "state.db"))
+    assert store.import_legacy_json(str(legacy))
+    assert not store.import_legacy_json(str(legacy))
+    assert store.previous_replicas("media", "plex") == 2
+    assert [h["replicas"] for h in store.replica_history("media", "plex")] == [4, 2]
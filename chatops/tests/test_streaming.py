@@ -0,0 +1,49 @@
+import gzip
+import os
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from chatops.streaming import TailBuffer, run_streaming
+
+CHATTY = "import sys\nfor i in range(5000): print(f'line {i:05d}')\nsys.stderr.write('done\\n')"
+
+
+def test_tail_buffer_keeps_newest_bytes():
+    buf = TailBuffer(max_bytes=8)
+    buf.append(b"abcdef\n")
+    buf.append(b"ghij\n")
+    assert buf.getvalue() == "ef\nghij\n"
+    assert buf.truncated is True
+    assert buf.total_bytes == 12
+
+
+def test_run_streaming_bounds_memory_and_spools_everything(tmp_path):
+    seen = []
+    spool = tmp_path / "logs" / "chatty.log.gz"
+    res = run_streaming(
+        [sys.executable, "-c", CHATTY],
+        on_line=seen.append,
+        max_tail_bytes=1024,
+        spool_path=str(spool),
+    )
+    assert res.returncode == 0
+    assert len(seen) == 5000 and seen[0] == "line 00000"
+    assert res.truncated is True
+    assert len(res.stdout.encode()) <= 1024
+    assert res.stdout.endswith("line 04999\n")
+    assert res.stderr == "done\n"
+
+    with gzip.open(spool, "rt") as f:
+        logged = f.read().splitlines()
+    assert logged.count("[stderr] done") == 1
+    assert sum(1 for line in logged if line.startswith("line ")) == 5000
+
+
+def test_run_streaming_raises_with_stderr_tail():
+    with pytest.raises(subprocess.CalledProcessError) as exc:
+        run_streaming([sys.executable, "-c", "import sys; sys.stderr.write('boom'); sys.exit(3)"])
+    assert exc.value.returncode == 3
+    assert exc.value.stderr == "boom"
@@ -0,0 +1,75 @@
+import hashlib
+import io
+import os
+import struct
+import sys
+import tarfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from chatops.backup_stream import write_compressed
+from chatops.verify import read_vma_header, verify_archive, verify_tree, verify_vzdump
+
+
+def _tar_chunks():
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w") as tar:
+        files = (("Databases/library.db", b"SQLite" * 5000), ("Databases/blobs.db", b"b"))
+        for name, data in files:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    raw = buf.getvalue()
+    return [raw[i:i + 4096] for i in range(0, len(raw), 4096)]
+
+
+def _vma_header(size=4096):
+    head = struct.pack(">4sI16sq16xIII", b"VMA\0", 1, b"u" * 16, 1700000000, 0, 0, size)
+    body = head + b"\0" * (size - len(head))
+    md5 = hashlib.md5(body).digest()
+    return body[:32] + md5 + body[48:]
+
+
+def test_archive_manifest_and_corruption(tmp_path):
+    path = str(tmp_path / "plex.tar.gz")
+    info = write_compressed(iter(_tar_chunks()), path, "gzip")
+    result, manifest = verify_archive(path, info["sha256"])
+    assert result["ok"] and result["checked"] == 2
+    assert manifest["Databases/library.db"] == (
+        30000, hashlib.sha256(b"SQLite" * 5000).hexdigest()
+    )
+
+    data = bytearray(open(path, "rb").read())
+    data[len(data) // 2] ^= 0xFF
+    open(path, "wb").write(bytes(data))
+    result, _ = verify_archive(path, info["sha256"])
+    assert not result["ok"]
+
+
+def test_tree_compare_reports_corruption_not_changes(tmp_path):
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    for root in (src, dst):
+        (root / "vol" / "_data").mkdir(parents=True)
+    for name, src_data, dst_data in (
+        ("same", b"a", b"a"), ("rotted", b"abc", b"abd"), ("edited", b"1", b"22")
+    ):
+        (src / "vol" / "_data" / name).write_bytes(src_data)
+        (dst / "vol" / "_data" / name).write_bytes(dst_data)
+        os.utime(dst / "vol" / "_data" / name, (1000, 1000))
+        os.utime(src / "vol" / "_data" / name, (1000, 1000))
+
+    result, manifest = verify_tree(str(src), str(dst))
+    assert result["mode"] == "full" and result["changed"] == 1
+    assert result["errors"] == ["vol/_data/rotted: content differs from source"]
+    assert len(manifest) == 3
+
+    result, manifest = verify_tree(str(src), str(dst), sample=1, seed=3)
+    assert result["mode"] == "sample" and result["files"] == 3 and len(manifest) == 1
+
+
+def test_vma_header_checksum(tmp_path):
+    header = _vma_header()
+    assert read_vma_header(io.BytesIO(header + b"data"))["header_size"] == 4096
+    path = tmp_path / "vzdump-qemu-100-2024_01_01-00_00_00.vma"
+    path.write_bytes(header[:100] + b"X" + header[101:])
+    result, _ = verify_vzdump(str(path))
+    assert result["errors"] == [f"{path}: VMA header checksum mismatch"]
@@ -0,0 +1,53 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from chatops.volume_backup import (
+    is_remote,
+    order_shards,
+    parse_rsync_stats,
+    shard_excludes,
+)
+
+STATS = """
+Number of files: 1,204 (reg: 1,100, dir: 104)
+Number of regular files transferred: 3
+Total file size: 2,048,000 bytes
+Total transferred file size: 4,096 bytes
+Total bytes sent: 5,120
+Total bytes received: 88
+"""
+
+
+def test_shard_excludes_rebase_anchored_patterns():
+    patterns = ["_data/cache", "/media/_data/transcode", "/scratch", "*.tmp", "tmp_*/"]
+    assert shard_excludes(patterns, "media") == [
+        "_data/cache", "/_data/transcode", "*.tmp", "tmp_*/"
+    ]
+    assert shard_excludes(patterns, "db") == ["_data/cache", "*.tmp", "tmp_*/"]
+    assert shard_excludes(patterns, "scratch") is None
+    assert shard_excludes(patterns, "tmp_build") is None
+
+
+def test_order_shards_unknown_then_largest_first():
+    sizes = {"small": 10, "big": 10_000, "mid": 500, "gone": 99_999}
+    assert order_shards(["small", "new", "big", "mid"], sizes) == ["new", "big", "mid", "small"]
+
+
+def test_parse_rsync_stats():
+    assert parse_rsync_stats(STATS) == {
+        "files": 1204,
+        "files_transferred": 3,
+        "total_size": 2048000,
+        "transferred_size": 4096,
+        "bytes_sent": 5120,
+        "bytes_received": 88,
+    }
+    assert parse_rsync_stats("[DRY-RUN] Would execute: rsync") == {}
+
+
+def test_is_remote():
+    assert is_remote("rsync://nas/backups")
+    assert is_remote("nas::backups")
+    assert is_remote("backup@nas:/volume1/backups")
+    assert not is_remote("/mnt/nas/backups")
@@ -0,0 +1,187 @@
+import gzip
+import hashlib
+import importlib
+import os
+import random
+import stat
+import struct
+import tarfile
+import time
+from typing import IO, Any, Dict, List, Optional, Tuple
+
+from .backup_stream import HAVE_ZSTD
+
+CHUNK = 1024 * 1024
+# Manifest: relative path -> (size, sha256)
+Manifest = Dict[str, Tuple[int, str]]
+
+
+class _HashingReader:
+    """Read-only wrapper hashing the raw (still compressed) bytes as they are read."""
+
+    def __init__(self, f: IO[bytes]) -> None:
+        self.f = f
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.f.read(size)
+        self.sha256.update(data)
+        return data
+
+    def readable(self) -> bool:
+        return True
+
+
+def _decompressed(f: Any, path: str) -> Any:
+    if path.endswith((".gz", ".tgz")):
+        return gzip.GzipFile(fileobj=f, mode="rb")
+    if path.endswith(".zst"):
+        if not HAVE_ZSTD:
+            raise RuntimeError("zstandard package is required to read .zst archives")
+        return importlib.import_module("zstandard").ZstdDecompressor().stream_reader(f)
+    return f
+
+
+def _sha256(f: IO[bytes]) -> str:
+    h = hashlib.sha256()
+    for block in iter(lambda: f.read(CHUNK), b""):
+        h.update(block)
+    return h.hexdigest()
+
+
+def _file_sha256(path: str) -> str:
+    with open(path, "rb") as f:
+        return _sha256(f)
+
+
+def _result(mode: str, checked: int, errors: List[str], **extra: Any) -> dict:
+    return {
+        "ok": not errors,
+        "mode": mode,
+        "checked": checked,
+        "errors": errors[:20],
+        "verified_at": time.time(),
+        **extra,
+    }
+
+
+def tar_manifest(path: str) -> Tuple[str, Manifest]:
+    """Read an archive once: sha256 of the file on disk plus a manifest of its members.
+
+    Reading to the end also checks the gzip/zstd framing and CRCs.
+    """
+    manifest: Manifest = {}
+    with open(path, "rb") as raw:
+        reader = _HashingReader(raw)
+        stream = _decompressed(reader, path)
+        with tarfile.open(fileobj=stream, mode="r|") as tar:
+            for member in tar:
+                if not member.isfile():
+                    continue
+                f = tar.extractfile(member)
+                if f is not None:
+                    manifest[member.name] = (member.size, _sha256(f))
+        # Drain trailing padding so the digest covers the whole file
+        while reader.read(CHUNK):
+            pass
+    return reader.sha256.hexdigest(), manifest
+
+
+def verify_archive(path: str, sha256: Optional[str] = None) -> Tuple[dict, Manifest]:
+    """Stream a tar archive, build its manifest and check it against the recorded digest."""
+    try:
+        digest, manifest = tar_manifest(path)
+    except (OSError, EOFError, tarfile.TarError, RuntimeError) as e:
+        return _result("archive", 0, [f"{path}: {e}"]), {}
+    errors = []
+    if sha256 and digest != sha256:
+        errors.append(f"{path}: sha256 {digest} != recorded {sha256}")
+    return _result("archive", len(manifest), errors, sha256=digest), manifest
+
+
+def verify_tree(
+    source: str, target: str, sample: Optional[int] = None, seed: Optional[int] = None
+) -> Tuple[dict, Manifest]:
+    """Compare files of an rsync target with the source by content.
+
+    Every target file is listed (metadata only); all of them, or a random
+    ``sample``, are hashed on both sides. Files modified at the source since
+    the copy (size or mtime differ) are counted as ``changed``, not errors.
+    """
+    files = []
+    for root, _, names in os.walk(target):
+        for name in names:
+            files.append(os.path.relpath(os.path.join(root, name), target))
+    total = len(files)
+    if sample is not None and sample < total:
+        files = random.Random(seed).sample(files, sample)
+    manifest: Manifest = {}
+    errors: List[str] = []
+    changed = 0
+    for rel in sorted(files):
+        dst = os.path.join(target, rel)
+        src = os.path.join(source, rel)
+        try:
+            st_dst = os.lstat(dst)
+            if not stat.S_ISREG(st_dst.st_mode):
+                continue
+            digest = _file_sha256(dst)
+            manifest[rel] = (st_dst.st_size, digest)
+            try:
+                st_src = os.stat(src)
+            except FileNotFoundError:
+                changed += 1
+                continue
+            if (st_src.st_size, int(st_src.st_mtime)) != (st_dst.st_size, int(st_dst.st_mtime)):
+                changed += 1
+            elif _file_sha256(src) != digest:
+                errors.append(f"{rel}: content differs from source")
+        except OSError as e:
+            errors.append(f"{rel}: {e}")
+    mode = "full" if sample is None or sample >= total else "sample"
+    return _result(mode, len(manifest), errors, files=total, changed=changed), manifest
+
+
+_VMA_MAGIC = b"VMA\0"
+_VMA_HEADER = struct.Struct(">4sI16sq16sIII")
+
+
+def read_vma_header(f: IO[bytes]) -> dict:
+    """Parse and checksum the header of a Proxmox VMA image (``vzdump`` VM backup).
+
+    The header's md5 covers ``header_size`` bytes with the md5 field zeroed.
+    """
+    head = f.read(_VMA_HEADER.size)
+    if len(head) < _VMA_HEADER.size:
+        raise ValueError("truncated VMA header")
+    magic, version, uuid, ctime, md5sum, _, _, header_size = _VMA_HEADER.unpack(head)
+    if magic != _VMA_MAGIC:
+        raise ValueError("not a VMA archive")
+    if version != 1:
+        raise ValueError(f"unsupported VMA version {version}")
+    if header_size < len(head):
+        raise ValueError(f"invalid VMA header size {header_size}")
+    rest = f.read(header_size - len(head))
+    if len(rest) != header_size - len(head):
+        raise ValueError("truncated VMA header")
+    zeroed = head[:32] + b"\0" * 16 + head[48:]
+    if hashlib.md5(zeroed + rest, usedforsecurity=False).digest() != md5sum:
+        raise ValueError("VMA header checksum mismatch")
+    return {"uuid": uuid.hex(), "ctime": ctime, "header_size": header_size}
+
+
+def verify_vzdump(path: str) -> Tuple[dict, Manifest]:
+    """Read back a vzdump archive: the VMA header of VM images, the full tar of CT backups."""
+    name = os.path.basename(path)
+    if ".tar" in name:
+        return verify_archive(path)
+    if ".vma" not in name:
+        return _result("header", 0, [f"{path}: unknown vzdump archive type"]), {}
+    if name.endswith(".lzo"):
+        return _result("header", 0, [], skipped="lzo archives are not read back"), {}
+    try:
+        with open(path, "rb") as raw:
+            header = read_vma_header(_decompressed(raw, path))
+    except (OSError, EOFError, ValueError, RuntimeError) as e:
+        return _result("header", 0, [f"{path}: {e}"]), {}
+    return _result("header", 1, [], vma=header), {}
@@ -0,0 +1,115 @@
+import fnmatch
+import os
+import re
+import shutil
+import time
+from typing import Dict, Iterable, List, Optional
+
+LATEST = "latest"
+# Shard for files directly under the source (e.g. Docker's metadata.db)
+ROOT_SHARD = "."
+
+
+def is_remote(destination: str) -> bool:
+    """rsync daemon (``rsync://``, ``host::module``) or remote-shell (``host:path``) target."""
+    if "://" in destination:
+        return True
+    head = destination.split("/", 1)[0]
+    return ":" in head
+
+
+def snapshot_name(now: Optional[float] = None) -> str:
+    """Sortable UTC name of a point-in-time snapshot directory."""
+    return time.strftime("%Y-%m-%dT%H%M%SZ", time.gmtime(time.time() if now is None else now))
+
+
+def partial_path(destination: str, name: str) -> str:
+    return os.path.join(destination, f".{name}.partial")
+
+
+def previous_snapshot(destination: str, candidates: Iterable[str] = ()) -> Optional[str]:
+    """Newest complete snapshot to hard-link unchanged files against.
+
+    ``candidates`` are cataloged snapshot paths, newest first; the ``latest``
+    symlink covers snapshots taken before the catalog knew about them.
+    """
+    for path in candidates:
+        if os.path.isdir(path):
+            return path
+    latest = os.path.join(destination, LATEST)
+    if os.path.islink(latest) and os.path.isdir(latest):
+        return os.path.realpath(latest)
+    return None
+
+
+def finish_snapshot(destination: str, name: str) -> str:
+    """Publish a completed partial snapshot and repoint ``latest`` at it."""
+    final = os.path.join(destination, name)
+    os.replace(partial_path(destination, name), final)
+    link = os.path.join(destination, f".{LATEST}.tmp")
+    if os.path.lexists(link):
+        os.remove(link)
+    os.symlink(name, link)
+    os.replace(link, os.path.join(destination, LATEST))
+    return final
+
+
+def discard_partial(destination: str, name: str) -> None:
+    shutil.rmtree(partial_path(destination, name), ignore_errors=True)
+
+
+def list_volumes(source: str) -> List[str]:
+    """Top-level directories of ``source``; each becomes one rsync shard."""
+    return sorted(
+        e.name for e in os.scandir(source) if e.is_dir(follow_symlinks=False)
+    )
+
+
+def shard_excludes(patterns: List[str], volume: str) -> Optional[List[str]]:
+    """Rewrite tree-wide ``--exclude`` patterns for a shard rooted at ``volume``.
+
+    Anchored patterns (``/vol/...``) move to the shard's own root and are
+    dropped for other volumes. None means the whole volume is excluded.
+    """
+    out = []
+    for pattern in patterns:
+        if pattern.startswith("/"):
+            head, _, rest = pattern[1:].partition("/")
+            if not fnmatch.fnmatchcase(volume, head):
+                continue
+            if not rest.strip("/"):
+                return None
+            out.append("/" + rest)
+        elif "/" not in pattern.rstrip("/") and fnmatch.fnmatchcase(volume, pattern.rstrip("/")):
+            return None
+        else:
+            out.append(pattern)
+    return out
+
+
+def order_shards(volumes: List[str], sizes: Dict[str, int]) -> List[str]:
+    """Longest-processing-time order: unknown sizes first, then largest first.
+
+    Handing shards to a pool of K workers in this order gives each the
+    least-loaded worker, so one huge volume never starts last.
+    """
+    return sorted(volumes, key=lambda v: (v in sizes, -sizes.get(v, 0), v))
+
+
+_RSYNC_STATS = {
+    "Number of files": "files",
+    "Number of regular files transferred": "files_transferred",
+    "Total file size": "total_size",
+    "Total transferred file size": "transferred_size",
+    "Total bytes sent": "bytes_sent",
+    "Total bytes received": "bytes_received",
+}
+_RSYNC_STAT_LINE = re.compile(r"^(%s): ([\d,]+)" % "|".join(_RSYNC_STATS), re.MULTILINE)
+
+
+def parse_rsync_stats(output: str) -> Dict[str, int]:
+    """Counters from ``rsync --stats`` output (missing on dry runs)."""
+    return {
+        _RSYNC_STATS[m.group(1)]: int(m.group(2).replace(",", ""))
+        for m in _RSYNC_STAT_LINE.finditer(output)
+    }